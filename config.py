@@ -4,6 +4,7 @@ import os
 
 
 REQUIRED_DIRS = ["sessions"]
+SESSIONS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "sessions"))
 
 _DEFAULTS = {
     "WHISPER_MODEL": "base.en",
@@ -20,6 +21,7 @@ _DEFAULTS = {
     "COMPUTER": "macmini",
     "AUDIO_INPUT_NAME": "Scarlett Solo",
     "TTS_VOICE": "Joelle (Enhanced)",
+    "TTS_BACKEND": "say",
     "UQ_PY3_API_BASE": "http://localhost:5001",
     "CONVERSE_MODEL": "gesturizer4",
     "CONVERSE_INTERLOCUTOR": None,
@@ -36,6 +38,42 @@ _DEFAULTS = {
     "OPERATOR_REPLY_DELAY_CPM": 240.0,
     "OPERATOR_REPLY_DELAY_MIN_SEC": 1.0,
     "OPERATOR_REPLY_DELAY_MAX_SEC": 12.0,
+    "JOURNAL_DURABILITY": "record",
+    "JOURNAL_FLUSH_MS": 200.0,
+    "ASR_WORKERS": 1,
+    "SESSION_ARCHIVE_AFTER_DAYS": None,
+    "BRIDGE_SYNC_STOP": False,
+    "ROBOT_QUEUE_BACKEND": "files",
+    "ROBOT_QUEUE_EXPORT_FILES": True,
+    "ROBOT_QUEUE_VISIBILITY_SEC": 30.0,
+    "BRIDGE_SERVER": "waitress",
+    "BRIDGE_WORKERS": 8,
+    "BRIDGE_MAX_QUEUE": 16,
+    "BRIDGE_QUEUE_TIMEOUT_SEC": 5.0,
+    "BRIDGE_REQUEST_TIMEOUT_SEC": 30.0,
+    "BRIDGE_DRAIN_TIMEOUT_SEC": 15.0,
+    "BRIDGE_UPLOAD_MAX_SEC": 120.0,
+    "BRIDGE_MAX_STREAMS": 16,
+    "BRIDGE_MAX_LONG_POLLS": 32,
+    "BRIDGE_UPLOAD_PARTIAL_EVERY_SEC": 2.0,
+    "BRIDGE_UPLOAD_IDLE_TTL_SEC": 60.0,
+    "BRIDGE_MAX_UPLOADS_PER_ROBOT": 4,
+    "BRIDGE_AUDIO_SOURCE": "recorder",
+    "BRIDGE_MAX_ROBOTS": 16,
+    "PIPELINE_QUEUE_SIZE": 4,
+    "TURN_DEADLINE_SEC": None,
+    "TURN_DEADLINE_SHARES": {"asr": 0.3, "converse": 0.7},
+    "TURN_DEADLINE_GRACE_SEC": 5.0,
+    "HOLDING_PHRASES": ["Hmm, let me think about that.", "Give me a moment.", "That's a good question."],
+    "FALLBACK_REPLY": "Sorry, I lost my train of thought. Could you say that again?",
+    "LOG_LEVEL": "info",
+    "LOG_JSON_PATH": None,
+    "LOG_JSON_MAX_BYTES": 5 * 1024 * 1024,
+    "LOG_JSON_BACKUPS": 3,
+    "LOG_QUEUE_MAX": 10000,
+    "PROFILE_ENABLED": False,
+    "PROFILE_SAMPLE_RATIO": 1.0,
+    "PROFILE_ALLOC_TOP": 25,
 }
 
 
@@ -85,6 +123,16 @@ def _parse_chat_pipeline(value, default=None):
     return default
 
 
+def _parse_journal_durability(value, default=None):
+    if value is None:
+        return default
+
+    norm = str(value).strip().lower()
+    if norm in ("record", "interval", "turn"):
+        return norm
+    return default
+
+
 def _delay_cfg_value(key, default_key, cast=None, local_key=None):
     cfg = _LOCAL_CFG.get("operator_reply_delay")
     if not isinstance(cfg, dict):
@@ -248,6 +296,9 @@ ROBOT_INBOX_DIRNAME = _pick(
     env_key="VOICE_LLM_CHAT_ROBOT_INBOX_DIRNAME",
     default_key="ROBOT_INBOX_DIRNAME",
 )
+# Written into each session directory by the process that opened it, so
+# retention can tell sessions still in use by a running GUI or bridge.
+SESSION_OWNER_FILENAME = "session_owner.json"
 WAIT_FOR_ROBOT_DONE = _pick(
     "wait_for_robot_done",
     env_key="VOICE_LLM_CHAT_WAIT_FOR_ROBOT_DONE",
@@ -288,6 +339,7 @@ AUDIO_INPUT_NAME = _pick(
     default_key="AUDIO_INPUT_NAME",
 )
 TTS_VOICE = _pick("tts_voice", env_key="VOICE_LLM_CHAT_TTS_VOICE", default_key="TTS_VOICE")
+TTS_BACKEND = _pick("tts_backend", env_key="VOICE_LLM_CHAT_TTS_BACKEND", default_key="TTS_BACKEND")
 REQUIRE_ENTER_BEFORE_SPEAK = bool(
     _parse_bool(
         os.getenv("VOICE_LLM_CHAT_REQUIRE_ENTER_BEFORE_SPEAK"),
@@ -379,12 +431,237 @@ OPERATOR_REPLY_DELAY_MAX_SEC = float(
     or _delay_cfg_value("max_sec", "OPERATOR_REPLY_DELAY_MAX_SEC")
 )
 
+JOURNAL_DURABILITY = _pick(
+    "journal_durability",
+    env_key="VOICE_LLM_CHAT_JOURNAL_DURABILITY",
+    default_key="JOURNAL_DURABILITY",
+    cast=lambda v: _parse_journal_durability(v, _DEFAULTS["JOURNAL_DURABILITY"]),
+)
+JOURNAL_FLUSH_MS = _pick(
+    "journal_flush_ms",
+    env_key="VOICE_LLM_CHAT_JOURNAL_FLUSH_MS",
+    default_key="JOURNAL_FLUSH_MS",
+    cast=float,
+)
+ASR_WORKERS = _pick("asr_workers", env_key="VOICE_LLM_CHAT_ASR_WORKERS", default_key="ASR_WORKERS", cast=int)
+
+SESSION_ARCHIVE_AFTER_DAYS = _pick(
+    "session_archive_after_days",
+    env_key="VOICE_LLM_CHAT_SESSION_ARCHIVE_AFTER_DAYS",
+    default_key="SESSION_ARCHIVE_AFTER_DAYS",
+    cast=lambda v: None if v in (None, "") else float(v),
+)
+
+PROFILE_ENABLED = _pick(
+    "profile_enabled",
+    env_key="VOICE_LLM_CHAT_PROFILE",
+    default_key="PROFILE_ENABLED",
+    cast=lambda v: _parse_bool(v, _DEFAULTS["PROFILE_ENABLED"]),
+)
+PROFILE_SAMPLE_RATIO = _pick(
+    "profile_sample_ratio",
+    env_key="VOICE_LLM_CHAT_PROFILE_SAMPLE_RATIO",
+    default_key="PROFILE_SAMPLE_RATIO",
+    cast=lambda v: min(1.0, max(0.0, float(v))),
+)
+PROFILE_ALLOC_TOP = _pick(
+    "profile_alloc_top",
+    env_key="VOICE_LLM_CHAT_PROFILE_ALLOC_TOP",
+    default_key="PROFILE_ALLOC_TOP",
+    cast=int,
+)
+
+# Robot job handoff: "files" (turn_NNNN_input.json / _output.json only) or
+# "sqlite" (per-session queue with claim/ack/complete; still exports the
+# files unless ROBOT_QUEUE_EXPORT_FILES is off).
+ROBOT_QUEUE_BACKEND = _pick(
+    "robot_queue_backend",
+    env_key="VOICE_LLM_CHAT_ROBOT_QUEUE",
+    default_key="ROBOT_QUEUE_BACKEND",
+    cast=lambda v: "sqlite" if str(v).strip().lower() == "sqlite" else "files",
+)
+ROBOT_QUEUE_EXPORT_FILES = _pick(
+    "robot_queue_export_files",
+    env_key="VOICE_LLM_CHAT_ROBOT_QUEUE_EXPORT_FILES",
+    default_key="ROBOT_QUEUE_EXPORT_FILES",
+    cast=lambda v: _parse_bool(v, _DEFAULTS["ROBOT_QUEUE_EXPORT_FILES"]),
+)
+ROBOT_QUEUE_VISIBILITY_SEC = _pick(
+    "robot_queue_visibility_sec",
+    env_key="VOICE_LLM_CHAT_ROBOT_QUEUE_VISIBILITY_SEC",
+    default_key="ROBOT_QUEUE_VISIBILITY_SEC",
+    cast=float,
+)
+
+# When true, /stop transcribes inside the request and returns the transcript
+# (the pre-job-API behaviour) instead of returning a turn id to poll.
+BRIDGE_SYNC_STOP = _pick(
+    "bridge_sync_stop",
+    env_key="VOICE_LLM_CHAT_BRIDGE_SYNC_STOP",
+    default_key="BRIDGE_SYNC_STOP",
+    cast=lambda v: _parse_bool(v, _DEFAULTS["BRIDGE_SYNC_STOP"]),
+)
+
+# Bridge serving: "waitress" (production WSGI server) or "dev" (Flask's
+# built-in server). BRIDGE_WORKERS requests run at once and up to
+# BRIDGE_MAX_QUEUE more wait BRIDGE_QUEUE_TIMEOUT_SEC for a slot.
+BRIDGE_SERVER = _pick(
+    "bridge_server",
+    env_key="VOICE_LLM_CHAT_BRIDGE_SERVER",
+    default_key="BRIDGE_SERVER",
+    cast=lambda v: "dev" if str(v).strip().lower() == "dev" else "waitress",
+)
+BRIDGE_WORKERS = _pick("bridge_workers", env_key="VOICE_LLM_CHAT_BRIDGE_WORKERS", default_key="BRIDGE_WORKERS", cast=int)
+BRIDGE_MAX_QUEUE = _pick(
+    "bridge_max_queue",
+    env_key="VOICE_LLM_CHAT_BRIDGE_MAX_QUEUE",
+    default_key="BRIDGE_MAX_QUEUE",
+    cast=int,
+)
+BRIDGE_QUEUE_TIMEOUT_SEC = _pick(
+    "bridge_queue_timeout_sec",
+    env_key="VOICE_LLM_CHAT_BRIDGE_QUEUE_TIMEOUT_SEC",
+    default_key="BRIDGE_QUEUE_TIMEOUT_SEC",
+    cast=float,
+)
+BRIDGE_REQUEST_TIMEOUT_SEC = _pick(
+    "bridge_request_timeout_sec",
+    env_key="VOICE_LLM_CHAT_BRIDGE_REQUEST_TIMEOUT_SEC",
+    default_key="BRIDGE_REQUEST_TIMEOUT_SEC",
+    cast=float,
+)
+BRIDGE_MAX_STREAMS = _pick(
+    "bridge_max_streams",
+    env_key="VOICE_LLM_CHAT_BRIDGE_MAX_STREAMS",
+    default_key="BRIDGE_MAX_STREAMS",
+    cast=int,
+)
+# Turn-result and job-claim long-polls (?wait=N) wait in their own pool of
+# this many slots instead of holding one of the BRIDGE_WORKERS slots.
+BRIDGE_MAX_LONG_POLLS = _pick(
+    "bridge_max_long_polls",
+    env_key="VOICE_LLM_CHAT_BRIDGE_MAX_LONG_POLLS",
+    default_key="BRIDGE_MAX_LONG_POLLS",
+    cast=int,
+)
+BRIDGE_DRAIN_TIMEOUT_SEC = _pick(
+    "bridge_drain_timeout_sec",
+    env_key="VOICE_LLM_CHAT_BRIDGE_DRAIN_TIMEOUT_SEC",
+    default_key="BRIDGE_DRAIN_TIMEOUT_SEC",
+    cast=float,
+)
+
+# Robot-recorded audio uploads: longest accepted utterance, and how much new
+# audio triggers another preview decode when partial transcripts are on.
+BRIDGE_UPLOAD_MAX_SEC = _pick(
+    "bridge_upload_max_sec",
+    env_key="VOICE_LLM_CHAT_BRIDGE_UPLOAD_MAX_SEC",
+    default_key="BRIDGE_UPLOAD_MAX_SEC",
+    cast=float,
+)
+BRIDGE_UPLOAD_PARTIAL_EVERY_SEC = _pick(
+    "bridge_upload_partial_every_sec",
+    env_key="VOICE_LLM_CHAT_BRIDGE_UPLOAD_PARTIAL_EVERY_SEC",
+    default_key="BRIDGE_UPLOAD_PARTIAL_EVERY_SEC",
+    cast=float,
+)
+# Uploads that receive nothing for this long are dropped, and a robot may have
+# at most this many open at once.
+BRIDGE_UPLOAD_IDLE_TTL_SEC = _pick(
+    "bridge_upload_idle_ttl_sec",
+    env_key="VOICE_LLM_CHAT_BRIDGE_UPLOAD_IDLE_TTL_SEC",
+    default_key="BRIDGE_UPLOAD_IDLE_TTL_SEC",
+    cast=float,
+)
+BRIDGE_MAX_UPLOADS_PER_ROBOT = _pick(
+    "bridge_max_uploads_per_robot",
+    env_key="VOICE_LLM_CHAT_BRIDGE_MAX_UPLOADS_PER_ROBOT",
+    default_key="BRIDGE_MAX_UPLOADS_PER_ROBOT",
+    cast=int,
+)
+# What /start–/stop capture from: "recorder" (the host microphone), or for load
+# tests "synthetic", "dir:<path>" or "wav:<a.wav>,<b.wav>" (see src.audio_sources).
+BRIDGE_AUDIO_SOURCE = _pick(
+    "bridge_audio_source",
+    env_key="VOICE_LLM_CHAT_BRIDGE_AUDIO_SOURCE",
+    default_key="BRIDGE_AUDIO_SOURCE",
+)
+
+# Optional per-robot capture device for the multi-robot bridge, e.g.
+# {"meta": "Scarlett Solo", "nova": "USB Audio"} in local_config.json.
+BRIDGE_ROBOT_AUDIO_INPUTS = _LOCAL_CFG.get("robot_audio_inputs") or _ROBOT_CHAT_CFG.get("robot_audio_inputs") or {}
+
+# Robots the bridge opens sessions for: these, the robot_audio_inputs names
+# and the configured robot name. With none configured any name is accepted,
+# up to BRIDGE_MAX_ROBOTS sessions.
+BRIDGE_ROBOTS = [
+    name.strip()
+    for name in (
+        os.getenv("VOICE_LLM_CHAT_BRIDGE_ROBOTS", "").split(",")
+        if os.getenv("VOICE_LLM_CHAT_BRIDGE_ROBOTS")
+        else _LOCAL_CFG.get("bridge_robots") or _ROBOT_CHAT_CFG.get("bridge_robots") or []
+    )
+    if name and name.strip()
+]
+BRIDGE_MAX_ROBOTS = _pick(
+    "bridge_max_robots",
+    env_key="VOICE_LLM_CHAT_BRIDGE_MAX_ROBOTS",
+    default_key="BRIDGE_MAX_ROBOTS",
+    cast=int,
+)
+
+# GUI turn pipeline: queue bound per stage, and optional worker counts per
+# stage, e.g. {"render": 2} in local_config.json. Stages with more than one
+# worker no longer keep turns in order.
+PIPELINE_QUEUE_SIZE = _pick(
+    "pipeline_queue_size",
+    env_key="VOICE_LLM_CHAT_PIPELINE_QUEUE_SIZE",
+    default_key="PIPELINE_QUEUE_SIZE",
+    cast=int,
+)
+PIPELINE_STAGE_WORKERS = _LOCAL_CFG.get("pipeline_stage_workers") or {}
+
+# Per-turn latency budget from button release, split across stages by
+# TURN_DEADLINE_SHARES (fractions of the budget, in stage order). None disables it.
+TURN_DEADLINE_SEC = _pick(
+    "turn_deadline_sec",
+    env_key="VOICE_LLM_CHAT_TURN_DEADLINE_SEC",
+    default_key="TURN_DEADLINE_SEC",
+    cast=lambda v: None if v in (None, "", 0, "0") else float(v),
+)
+TURN_DEADLINE_SHARES = _LOCAL_CFG.get("turn_deadline_shares") or _DEFAULTS["TURN_DEADLINE_SHARES"]
+# How long past the end of the budget a late /converse is still waited for
+# before the turn gives up on it and answers with FALLBACK_REPLY.
+TURN_DEADLINE_GRACE_SEC = _pick(
+    "turn_deadline_grace_sec",
+    env_key="VOICE_LLM_CHAT_TURN_DEADLINE_GRACE_SEC",
+    default_key="TURN_DEADLINE_GRACE_SEC",
+    cast=float,
+)
+HOLDING_PHRASES = _LOCAL_CFG.get("holding_phrases") or _DEFAULTS["HOLDING_PHRASES"]
+FALLBACK_REPLY = _pick("fallback_reply", env_key="VOICE_LLM_CHAT_FALLBACK_REPLY", default_key="FALLBACK_REPLY")
+
+# Console log level (debug, info or error); src.logger.set_level changes it at runtime.
+LOG_LEVEL = _pick("log_level", env_key="VOICE_LLM_CHAT_LOG_LEVEL", default_key="LOG_LEVEL", cast=lambda v: str(v).lower())
+# Optional JSON-lines copy of the log, rotated at LOG_JSON_MAX_BYTES keeping LOG_JSON_BACKUPS files.
+LOG_JSON_PATH = _pick("log_json_path", env_key="VOICE_LLM_CHAT_LOG_JSON_PATH", default_key="LOG_JSON_PATH")
+LOG_JSON_MAX_BYTES = _pick(
+    "log_json_max_bytes",
+    env_key="VOICE_LLM_CHAT_LOG_JSON_MAX_BYTES",
+    default_key="LOG_JSON_MAX_BYTES",
+    cast=int,
+)
+LOG_JSON_BACKUPS = _pick("log_json_backups", env_key="VOICE_LLM_CHAT_LOG_JSON_BACKUPS", default_key="LOG_JSON_BACKUPS",
+                         cast=int)
+# Messages waiting for the background writer; beyond this they are dropped, never waited on.
+LOG_QUEUE_MAX = _pick("log_queue_max", env_key="VOICE_LLM_CHAT_LOG_QUEUE_MAX", default_key="LOG_QUEUE_MAX", cast=int)
+
 
-def validate_mode_settings(robot_enabled=None):
+def validate_mode_settings(robot_enabled=None, robot_name=None):
     if robot_enabled is None:
         robot_enabled = ROBOT_CHAT_ENABLED
 
-    if robot_enabled and not ROBOT_CONFIGURED:
+    if robot_enabled and not (robot_name or ROBOT_CONFIGURED):
         raise RuntimeError(
             "Robot mode is enabled but no robot name is configured. "
             "Set VOICE_LLM_CHAT_ROBOT_NAME, add robot_name to local_config.json, "
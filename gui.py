@@ -1,40 +1,39 @@
 import threading
+import time
 import tkinter as tk
 import os
-from datetime import datetime
-
-from src.conversation import ConversationManager
-from src.audio_io import Recorder
-from src.audio_io import get_audio_duration
-from src.display import place_on_target_display
-from src.response_modes import LocalResponseAdapter, RobotResponseAdapter
-from src.tts_engine import speak
-from config import (
-    ensure_directories_exist,
-    REQUIRE_ENTER_BEFORE_SPEAK,
-    REQUIRE_ENTER_FOR_WATCHDOG,
-    ROBOT_CHAT_ENABLED,
-    WAIT_FOR_ROBOT_DONE,
-    WATCHDOG_ENABLED,
-    WATCHDOG_ACTIVATE_AFTER_TURN,
-    WATCHDOG_INTERVAL_SEC,
-    WATCHDOG_MAX_CONSECUTIVE_WITHOUT_USER,
-    WATCHDOG_EPHEMERAL_SYSTEM_PROMPT,
-    OPERATOR_REPLY_DELAY_ENABLED,
-    OPERATOR_REPLY_DELAY_CPM,
-    OPERATOR_REPLY_DELAY_MIN_SEC,
-    OPERATOR_REPLY_DELAY_MAX_SEC,
-    validate_mode_settings,
-)
+from concurrent.futures import ThreadPoolExecutor
 
-from src.logger import debug, exc
+from src.startup_trace import get_startup_trace
+
+_startup = get_startup_trace()
+
+with _startup.phase("config"):
+    from config import (
+        ensure_directories_exist,
+        ROBOT_CHAT_ENABLED,
+        WAIT_FOR_ROBOT_DONE,
+        SESSION_ARCHIVE_AFTER_DAYS,
+        validate_mode_settings,
+    )
 
-ensure_directories_exist()
+    ensure_directories_exist()
+
+# Heavy modules (numpy, requests, faster_whisper, sounddevice) are imported
+# by the startup workers below, not here, so the window can appear first.
+from src.display import find_target_display, place_on_target_display
+from src.journal import get_journal
+from src import logger
+from src.logger import debug, exc
+from src.pipeline import STATUS_CANCELLED, STATUS_DONE, PipelineFull
+from src.tracing import start_trace
+from src.turn_flow import GATE_MANUAL, LocalWatchdog, build_turn_pipeline, operator_gate
 
 TAG_UI = "UI"
 TAG_WORKER = "WORKER"
 WINDOWED_FALLBACK_GEOMETRY = "1280x800+80+80"
 FULLSCREEN_AFTER_PLACEMENT_DELAY_MS = 500
+STARTUP_POLL_MS = 20
 
 APP_BACKGROUND = "#F4F7FB"
 BUTTON_BACKGROUND = "#A65300"
@@ -56,55 +55,92 @@ def _env_bool(name, default):
     return raw_value.strip().lower() in ("1", "true", "yes", "on")
 
 
-def _operator_reply_delay_sec(text):
-    if not OPERATOR_REPLY_DELAY_ENABLED:
-        return None
-    try:
-        cpm = float(OPERATOR_REPLY_DELAY_CPM)
-    except Exception:
-        cpm = 0.0
-    if cpm <= 0:
-        return None
+# --------------------------------------
+# Startup workers (run concurrently with window construction)
+# --------------------------------------
+def _init_session():
+    with _startup.phase("session"):
+        from src.conversation import ConversationManager
+        from src.response_modes import LocalResponseAdapter, RobotResponseAdapter
 
-    char_count = len(str(text or "").strip())
-    if char_count <= 0:
-        return 0.0
+        convo = ConversationManager(robot_enabled=ROBOT_CHAT_ENABLED)
+        response_adapter = (
+            RobotResponseAdapter(wait_for_done=WAIT_FOR_ROBOT_DONE)
+            if ROBOT_CHAT_ENABLED
+            else LocalResponseAdapter()
+        )
+    return convo, response_adapter
 
-    delay = (float(char_count) / cpm) * 60.0
-    delay = max(float(OPERATOR_REPLY_DELAY_MIN_SEC), delay)
-    delay = min(float(OPERATOR_REPLY_DELAY_MAX_SEC), delay)
-    return max(0.0, delay)
 
+def _init_recorder():
+    with _startup.phase("recorder"):
+        from src.audio_io import Recorder
+
+        return Recorder()
+
+
+def _find_display():
+    with _startup.phase("display_discovery"):
+        return find_target_display()
 
-def gui():
-    validate_mode_settings(robot_enabled=ROBOT_CHAT_ENABLED)
-    convo = ConversationManager(robot_enabled=ROBOT_CHAT_ENABLED)
-    response_adapter = (
-        RobotResponseAdapter(wait_for_done=WAIT_FOR_ROBOT_DONE)
-        if ROBOT_CHAT_ENABLED
-        else LocalResponseAdapter()
-    )
-    rec = Recorder()
 
-    root = tk.Tk()
-    root.title("Voice Chat")
-    root.configure(bg=APP_BACKGROUND)
+def _warm_asr():
+    with _startup.phase("asr_warm"):
+        from src import asr_whisper
 
+        asr_whisper.warm()
+
+
+def _preload_modules():
+    # Not needed for the window; imported now so the first turn doesn't pay for them.
+    with _startup.phase("preload"):
+        import requests  # noqa: F401
+        from src import profiling, tts_engine  # noqa: F401
+
+
+def _run_retention():
+    from src.session_archive import apply_retention
+
+    apply_retention()
+
+
+def gui():
+    validate_mode_settings(robot_enabled=ROBOT_CHAT_ENABLED)
+    logger.start()
+
+    # The model loads behind the window and is not waited for; a turn that
+    # arrives first simply blocks on the model lock inside transcribe().
+    threading.Thread(target=_warm_asr, name="asr-warm", daemon=True).start()
+    startup_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="startup")
+    session_future = startup_pool.submit(_init_session)
+    recorder_future = startup_pool.submit(_init_recorder)
+    startup_pool.submit(_preload_modules)
     place_on_display = _env_bool("VOICE_LLM_CHAT_PLACE_ON_TARGET_DISPLAY", True)
-    if place_on_display:
-        display_positioned = place_on_target_display(root, WINDOWED_FALLBACK_GEOMETRY)
-    else:
+    display_future = startup_pool.submit(_find_display) if place_on_display else None
+    startup_pool.shutdown(wait=False)
+    if SESSION_ARCHIVE_AFTER_DAYS is not None:
+        threading.Thread(target=_run_retention, name="session-retention", daemon=True).start()
+
+    # Filled in by finish_startup() once the workers are done.
+    convo = None
+    response_adapter = None
+    rec = None
+    turn_pipeline = None
+    startup_ready = False
+
+    with _startup.phase("tk_root"):
+        root = tk.Tk()
+        root.title("Voice Chat")
+        root.configure(bg=APP_BACKGROUND)
         root.geometry(WINDOWED_FALLBACK_GEOMETRY)
-        display_positioned = False
+
+    display_positioned = False
     start_fullscreen = _env_bool("VOICE_LLM_CHAT_START_FULLSCREEN", True)
 
     def enter_fullscreen():
         if display_positioned and start_fullscreen:
             root.attributes("-fullscreen", True)
 
-    if start_fullscreen:
-        root.after(FULLSCREEN_AFTER_PLACEMENT_DELAY_MS, enter_fullscreen)
-
     def on_escape(event=None):
         root.attributes("-fullscreen", False)
 
@@ -130,8 +166,8 @@ def gui():
     # --------------------------------------
     status = tk.Label(
         container,
-        text="Ready",
-        fg="green",
+        text="Starting…",
+        fg="gray",
         bg=APP_BACKGROUND,
         font=STATUS_FONT,
     )
@@ -174,18 +210,13 @@ def gui():
     # --------------------------------------
     turn_in_flight = False
     is_listening = False
-    recording_started_at = None
+    turn_trace = None
     local_watchdog_after_id = None
-    local_watchdog_in_flight = False
-    local_watchdog_total = 0
-    local_watchdog_consecutive_without_user = 0
+    watchdog = LocalWatchdog(robot_enabled=ROBOT_CHAT_ENABLED)
     operator_gate_active = False
     operator_gate_callback = None
     ui_closing = False
 
-    def local_watchdog_active():
-        return bool((not ROBOT_CHAT_ENABLED) and WATCHDOG_ENABLED)
-
     def release_operator_gate(event=None):
         nonlocal operator_gate_active, operator_gate_callback
         if not operator_gate_active:
@@ -200,25 +231,19 @@ def gui():
 
     def wait_for_operator_release(callback, reply_text=None, source_label="turn_reply"):
         nonlocal operator_gate_active, operator_gate_callback
-        if source_label == "watchdog":
-            should_wait = REQUIRE_ENTER_FOR_WATCHDOG
-        else:
-            should_wait = REQUIRE_ENTER_BEFORE_SPEAK
-
-        if not should_wait:
+        gate = operator_gate(source_label, reply_text)
+        if gate is None:
             callback()
             return
 
-        if source_label == "turn_reply":
-            delay_sec = _operator_reply_delay_sec(reply_text)
-            if delay_sec is not None:
-                set_status("Processing…", "blue")
-                print(
-                    "[operator_gate] Reply is ready. Auto-releasing normal reply "
-                    "after {:.3f}s typing delay.".format(delay_sec)
-                )
-                root.after(max(1, int(delay_sec * 1000)), callback)
-                return
+        if gate != GATE_MANUAL:
+            set_status("Processing…", "blue")
+            print(
+                "[operator_gate] Reply is ready. Auto-releasing normal reply "
+                "after {:.3f}s typing delay.".format(gate)
+            )
+            root.after(max(1, int(gate * 1000)), callback)
+            return
 
         operator_gate_active = True
         operator_gate_callback = callback
@@ -251,131 +276,129 @@ def gui():
 
     def schedule_local_watchdog():
         nonlocal local_watchdog_after_id
-        if not local_watchdog_active():
-            return
-        if convo.turn < WATCHDOG_ACTIVATE_AFTER_TURN:
-            return
-        if local_watchdog_consecutive_without_user >= WATCHDOG_MAX_CONSECUTIVE_WITHOUT_USER:
+        if not watchdog.can_fire(convo.turn):
             return
         cancel_local_watchdog()
         local_watchdog_after_id = root.after(
-            max(1, int(WATCHDOG_INTERVAL_SEC * 1000)),
+            max(1, int(watchdog.interval_sec * 1000)),
             fire_local_watchdog,
         )
         debug(
             TAG_UI,
             "Scheduled local watchdog in {:.3f}s after turn {}".format(
-                WATCHDOG_INTERVAL_SEC, convo.turn
+                watchdog.interval_sec, convo.turn
             ),
         )
 
     def finish_local_watchdog(should_reschedule):
-        nonlocal local_watchdog_in_flight
         if ui_closing:
             return
-        local_watchdog_in_flight = False
+        watchdog.in_flight = False
         set_status("Ready", "green")
         set_turn_in_flight(False)
         if should_reschedule:
             schedule_local_watchdog()
 
-    def run_local_watchdog_audio(reply, output_path):
-        nonlocal local_watchdog_total, local_watchdog_consecutive_without_user
+    def fire_local_watchdog():
+        nonlocal local_watchdog_after_id
+        local_watchdog_after_id = None
+
+        if not watchdog.enabled:
+            return
+        if watchdog.in_flight or turn_in_flight or is_listening:
+            schedule_local_watchdog()
+            return
+        if not watchdog.can_fire(convo.turn):
+            return
+
+        watchdog.in_flight = True
+        set_turn_in_flight(True)
+        set_status("Processing…", "blue")
         try:
-            speak(reply, output_path)
-
-            try:
-                ai_duration = get_audio_duration(output_path)
-                if ai_duration is not None:
-                    debug(TAG_WORKER, f"Local watchdog audio duration: {ai_duration:.3f} sec")
-            except Exception as e:
-                exc(TAG_WORKER, e, msg="Could not get local watchdog audio duration")
-
-            local_watchdog_total += 1
-            local_watchdog_consecutive_without_user += 1
-            debug(
-                TAG_WORKER,
-                "Local watchdog fired (total={}, consecutive={})".format(
-                    local_watchdog_total,
-                    local_watchdog_consecutive_without_user,
-                ),
+            turn_pipeline.submit(
+                {"watchdog_index": watchdog.total + 1}, kind="watchdog", start="reply"
             )
-            if not ui_closing:
-                root.after(0, lambda: finish_local_watchdog(True))
-        except Exception as e:
-            exc(TAG_WORKER, e, msg="Local watchdog audio worker failed")
-            if not ui_closing:
-                root.after(0, lambda: finish_local_watchdog(True))
+        except PipelineFull as e:
+            exc(TAG_WORKER, e, msg="Local watchdog could not be queued")
+            finish_local_watchdog(True)
 
-    def handle_local_watchdog_reply(reply, output_path):
-        if ui_closing:
+    # --------------------------------------
+    # Turn pipeline callbacks (see src.turn_flow); they run on the Tk thread.
+    # --------------------------------------
+    def release_held_reply(item):
+        if item.finished_at is not None:
+            # Rendering failed while the gate was open; the turn is already finalized.
             return
-        if not reply:
-            debug(TAG_WORKER, "Local watchdog generated empty reply")
-            finish_local_watchdog(True)
+        if ui_closing:
+            turn_pipeline.cancel(item.key)
             return
+        if item.kind == "turn":
+            convo.mark_stage(item.data["turn_id"], "gate_end")
+        set_status("Speaking…", "purple")
+        turn_pipeline.resume(item.key)
 
-        def start_local_watchdog_audio():
-            if ui_closing:
-                finish_local_watchdog(False)
-                return
-            set_status("Speaking…", "purple")
-            threading.Thread(
-                target=run_local_watchdog_audio,
-                args=(reply, output_path),
-                daemon=True,
-            ).start()
-
-        wait_for_operator_release(
-            start_local_watchdog_audio,
-            reply_text=reply,
-            source_label="watchdog",
-        )
+    def on_pipeline_progress(item, stage):
+        if ui_closing or item.failed:
+            return
+        d = item.data
 
-    def fire_local_watchdog():
-        nonlocal local_watchdog_after_id, local_watchdog_in_flight
-        local_watchdog_after_id = None
+        if stage == "asr":
+            text = d["text"]
+            watchdog.note_participant(text)
+            show_user(text if text else "(no speech detected)")
+            return
 
-        if not local_watchdog_active():
+        if stage != "reply":
             return
-        if local_watchdog_in_flight or turn_in_flight or is_listening:
-            schedule_local_watchdog()
+        if item.kind == "watchdog":
+            if not d["reply"]:
+                debug(TAG_WORKER, "Local watchdog generated empty reply")
+                return
+            wait_for_operator_release(
+                lambda: release_held_reply(item),
+                reply_text=d["reply"],
+                source_label="watchdog",
+            )
             return
-        if convo.turn < WATCHDOG_ACTIVATE_AFTER_TURN:
+
+        show_ai(d["reply"])
+        if d["outpath"]:
+            wait_for_operator_release(
+                lambda: release_held_reply(item),
+                reply_text=d["reply"],
+                source_label="turn_reply",
+            )
+        else:
+            set_status("Completing…", "blue")
+
+    def on_pipeline_complete(item):
+        if ui_closing or item.kind == "holding":
             return
-        if local_watchdog_consecutive_without_user >= WATCHDOG_MAX_CONSECUTIVE_WITHOUT_USER:
+
+        if item.kind == "watchdog":
+            if item.status == STATUS_DONE and item.data.get("reply"):
+                watchdog.note_fired()
+            finish_local_watchdog(item.status != STATUS_CANCELLED)
             return
 
-        local_watchdog_in_flight = True
-        set_turn_in_flight(True)
-        set_status("Processing…", "blue")
+        set_status("Ready", "green")
+        set_turn_in_flight(False)
+        if item.data.get("outpath") and watchdog.enabled:
+            schedule_local_watchdog()
 
-        def watchdog_worker():
-            try:
-                reply = convo.generate_watchdog_reply(
-                    ephemeral_system=WATCHDOG_EPHEMERAL_SYSTEM_PROMPT
-                )
-                output_path = os.path.join(
-                    convo.session_dir,
-                    "watchdog_{:03d}_{:03d}.aiff".format(
-                        int(convo.turn or 0),
-                        int(local_watchdog_total + 1),
-                    ),
-                )
-                if not ui_closing:
-                    root.after(0, lambda: handle_local_watchdog_reply(reply, output_path))
-            except Exception as e:
-                exc(TAG_WORKER, e, msg="Local watchdog worker failed")
-                if not ui_closing:
-                    root.after(0, lambda: finish_local_watchdog(True))
-
-        threading.Thread(target=watchdog_worker, daemon=True).start()
+    def dispatch_to_ui(fn):
+        if not ui_closing:
+            root.after(0, fn)
 
     # --------------------------------------
     # Recording logic
     # --------------------------------------
     def on_press(event):
-        nonlocal is_listening, recording_started_at
+        nonlocal is_listening, turn_trace
+
+        if not startup_ready:
+            debug(TAG_UI, "Ignoring press: still starting up")
+            return
 
         if turn_in_flight:
             debug(TAG_UI, "Ignoring press: turn already in flight")
@@ -383,13 +406,13 @@ def gui():
 
         cancel_local_watchdog()
         is_listening = True
-        recording_started_at = datetime.now().isoformat(timespec="milliseconds")
+        turn_trace = start_trace()
         set_button_style(BUTTON_ACTIVE_BACKGROUND, BUTTON_FOREGROUND, BUTTON_ACTIVE_BACKGROUND)
         set_status("Listening…", "red")
         rec.start()
 
     def on_release(event):
-        nonlocal is_listening, recording_started_at
+        nonlocal is_listening, turn_trace
 
         # Ignore releases that happen when we never started listening
         if not is_listening:
@@ -405,60 +428,22 @@ def gui():
         set_turn_in_flight(True)
         set_status("Processing…", "blue")
 
+        released_at = time.monotonic()
         audio = rec.stop()
-        started_at = recording_started_at
-        recording_started_at = None
-
-        def worker():
-            nonlocal local_watchdog_consecutive_without_user
-            try:
-                turn_id, text = convo.transcribe_only(audio, recording_started_at=started_at)
-                if (text or "").strip():
-                    local_watchdog_consecutive_without_user = 0
-                    debug(TAG_WORKER, "Reset local watchdog consecutive count after participant speech")
-                display_text = text if text else "(no speech detected)"
-                root.after(0, lambda: show_user(display_text))
-                reply, outpath = response_adapter.prepare_reply(convo, turn_id, text)
-                root.after(0, lambda: handle_ai_reply(turn_id, reply, outpath))
-
-            except Exception as e:
-                exc(TAG_WORKER, e, msg="Worker thread failed")
-                root.after(0, lambda: set_status("Ready", "green"))
-                root.after(0, lambda: set_turn_in_flight(False))
-
-        threading.Thread(target=worker, daemon=True).start()
-
-    def handle_ai_reply(turn_id, reply, outpath):
-        show_ai(reply)
-
-        def completion_worker():
-            try:
-                response_adapter.complete_turn(convo, turn_id, reply, outpath)
-            except Exception as e:
-                exc(TAG_WORKER, e, msg="Turn completion failed")
-            root.after(0, lambda: set_status("Ready", "green"))
-            root.after(0, lambda: set_turn_in_flight(False))
-            if outpath and local_watchdog_active():
-                root.after(0, schedule_local_watchdog)
-
-        def start_completion():
-            if ui_closing:
-                set_turn_in_flight(False)
-                return
-            if outpath:
-                set_status("Speaking…", "purple")
-            else:
-                set_status("Completing…", "blue")
-            threading.Thread(target=completion_worker, daemon=True).start()
+        trace = turn_trace
+        turn_trace = None
 
-        if outpath:
-            wait_for_operator_release(
-                start_completion,
-                reply_text=reply,
-                source_label="turn_reply",
-            )
-        else:
-            start_completion()
+        try:
+            turn_pipeline.submit({
+                "audio": audio,
+                "recording_started_at": trace.started_at,
+                "released_at": released_at,
+                "trace": trace,
+            })
+        except PipelineFull as e:
+            exc(TAG_WORKER, e, msg="Turn could not be queued")
+            set_status("Ready", "green")
+            set_turn_in_flight(False)
 
     # Bind button events
     button.bind("<ButtonPress-1>", on_press)
@@ -474,15 +459,76 @@ def gui():
         operator_gate_active = False
         operator_gate_callback = None
         cancel_local_watchdog()
-        rec.shutdown()
+        if turn_pipeline is not None:
+            turn_pipeline.close(wait=False)
+        if rec is not None:
+            rec.shutdown()
+        get_journal().flush()
         root.destroy()
 
     root.protocol("WM_DELETE_WINDOW", on_closing)
 
+    # --------------------------------------
+    # Startup: place the window, then enable the button once the session
+    # and recorder workers have finished
+    # --------------------------------------
+    if display_future is not None:
+        with _startup.phase("display_place"):
+            display_positioned = place_on_target_display(
+                root, WINDOWED_FALLBACK_GEOMETRY, display=display_future.result()
+            )
+    if start_fullscreen:
+        root.after(FULLSCREEN_AFTER_PLACEMENT_DELAY_MS, enter_fullscreen)
+
+    set_turn_in_flight(True)
+    _startup.mark("window_built")
+    root.after(0, lambda: _startup.mark("window_visible"))
+
+    def finish_startup():
+        nonlocal convo, response_adapter, rec, turn_pipeline, startup_ready
+        if ui_closing:
+            return
+        if not (session_future.done() and recorder_future.done()):
+            root.after(STARTUP_POLL_MS, finish_startup)
+            return
+        try:
+            convo, response_adapter = session_future.result()
+            rec = recorder_future.result()
+            turn_pipeline = build_turn_pipeline(
+                convo,
+                response_adapter,
+                on_progress=on_pipeline_progress,
+                on_complete=on_pipeline_complete,
+                dispatch=dispatch_to_ui,
+            )
+        except Exception as e:
+            exc(TAG_UI, e, msg="Startup failed")
+            set_status("Startup failed", "red")
+            return
+
+        startup_ready = True
+        set_turn_in_flight(False)
+        set_status("Ready", "green")
+        _startup.mark("ready")
+        _startup.log_summary()
+        trace_path = os.getenv("VOICE_LLM_CHAT_STARTUP_TRACE") or os.path.join(
+            convo.session_dir, "startup_trace.json"
+        )
+        try:
+            _startup.write(trace_path)
+        except Exception as e:
+            exc(TAG_UI, e, msg="Could not write startup trace")
+        if _env_bool("VOICE_LLM_CHAT_EXIT_AFTER_STARTUP", False):
+            root.after(0, on_closing)
+
+    root.after(0, finish_startup)
+
     try:
         root.mainloop()
     finally:
-        rec.shutdown()
+        if rec is not None:
+            rec.shutdown()
+        get_journal().close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+import itertools
+import queue
+import threading
+import time
+
+from config import ASR_WORKERS
+from src import asr_whisper
+from src.logger import exc
+
+TAG = "ASRQ"
+
+# Lower runs first: finished turns always go ahead of upload previews.
+PRIORITY_FINAL = 0
+PRIORITY_PREVIEW = 1
+
+
+class TranscriptionCancelled(Exception):
+    pass
+
+
+class TranscriptionRequest:
+    def __init__(self, audio, robot, priority=PRIORITY_FINAL, on_done=None):
+        self.audio = audio
+        self.robot = robot or "default"
+        self.priority = int(priority)
+        self.on_done = on_done
+        self.cancelled = False
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.text = None
+        self.error = None
+        self._done = threading.Event()
+
+    @property
+    def wait_sec(self):
+        if self.started_at is None:
+            return None
+        return self.started_at - self.enqueued_at
+
+    @property
+    def decode_sec(self):
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def cancel(self):
+        """Skip this request if no worker has picked it up yet."""
+        self.cancelled = True
+
+    def result(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("transcription did not finish within {}s".format(timeout))
+        if self.error is not None:
+            raise self.error
+        return self.text
+
+
+class TranscriptionQueue:
+    """
+    Single warm ASR engine shared by every bridge session.
+
+    Requests from all robots go through one queue. Each of the `workers`
+    threads takes one request at a time and decodes it on the shared model,
+    so concurrent turns never load a second model and an idle worker always
+    picks up the next waiting request. Finished turns are taken before
+    upload previews (PRIORITY_PREVIEW), and a request given `on_done` is
+    completed by calling it on the worker instead of needing a waiter.
+    """
+
+    def __init__(self, transcribe_fn=None, workers=None):
+        self.transcribe_fn = transcribe_fn or asr_whisper.transcribe
+        self.workers = max(1, int(ASR_WORKERS if workers is None else workers))
+
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._robot_stats = {}
+        self._waiting = {PRIORITY_FINAL: 0, PRIORITY_PREVIEW: 0}
+        self._previews = {"done": 0, "failed": 0, "cancelled": 0, "decode_total": 0.0}
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name="asr-worker-{}".format(i), daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, audio, robot=None, priority=PRIORITY_FINAL, on_done=None):
+        self.start()
+        req = TranscriptionRequest(audio, robot, priority=priority, on_done=on_done)
+        with self._stats_lock:
+            self._waiting[req.priority] = self._waiting.get(req.priority, 0) + 1
+        self._queue.put((req.priority, next(self._seq), req))
+        return req
+
+    def transcribe(self, audio, robot=None):
+        return self.submit(audio, robot=robot).result()
+
+    def depth(self, priority=None):
+        if priority is None:
+            return self._queue.qsize()
+        with self._stats_lock:
+            return self._waiting.get(priority, 0)
+
+    def stats(self):
+        with self._stats_lock:
+            robots = {}
+            for robot, s in self._robot_stats.items():
+                n = s["requests"]
+                robots[robot] = {
+                    "requests": n,
+                    "wait_sec_last": s["wait_last"],
+                    "wait_sec_avg": (s["wait_total"] / n) if n else None,
+                    "wait_sec_max": s["wait_max"],
+                    "decode_sec_avg": (s["decode_total"] / n) if n else None,
+                }
+            p = self._previews
+            n_decoded = p["done"] + p["failed"]
+            return {
+                "queue_depth": self._queue.qsize(),
+                "previews_waiting": self._waiting.get(PRIORITY_PREVIEW, 0),
+                "workers": self.workers,
+                "robots": robots,
+                "previews": {
+                    "done": p["done"],
+                    "failed": p["failed"],
+                    "cancelled": p["cancelled"],
+                    "decode_sec_avg": (p["decode_total"] / n_decoded) if n_decoded else None,
+                },
+            }
+
+    def _run(self):
+        while True:
+            _, _, req = self._queue.get()
+            with self._stats_lock:
+                self._waiting[req.priority] -= 1
+            if req.cancelled:
+                req.error = TranscriptionCancelled("transcription was cancelled")
+            else:
+                req.started_at = time.monotonic()
+                try:
+                    req.text = self.transcribe_fn(req.audio)
+                except Exception as e:
+                    exc(TAG, e, "Transcription failed for robot {}".format(req.robot))
+                    req.error = e
+                req.finished_at = time.monotonic()
+            req.audio = None
+            self._record(req)
+            req._done.set()
+            if req.on_done is not None:
+                try:
+                    req.on_done(req)
+                except Exception as e:
+                    exc(TAG, e, "Completion callback failed for robot {}".format(req.robot))
+
+    def _record(self, req):
+        wait = req.wait_sec or 0.0
+        decode = req.decode_sec or 0.0
+        with self._stats_lock:
+            if req.priority == PRIORITY_PREVIEW:
+                # Previews are counted apart so turn wait stats stay about turns.
+                if req.cancelled:
+                    self._previews["cancelled"] += 1
+                    return
+                self._previews["failed" if req.error is not None else "done"] += 1
+                self._previews["decode_total"] += decode
+                return
+            s = self._robot_stats.setdefault(
+                req.robot,
+                {"requests": 0, "wait_last": None, "wait_total": 0.0, "wait_max": 0.0, "decode_total": 0.0},
+            )
+            s["requests"] += 1
+            s["wait_last"] = wait
+            s["wait_total"] += wait
+            s["wait_max"] = max(s["wait_max"], wait)
+            s["decode_total"] += decode
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_asr_queue():
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = TranscriptionQueue()
+    return _shared
+
+
+def configure(transcribe_fn=None):
+    """Swap the shared queue's transcriber, e.g. for a stand-in in benchmarks."""
+    get_asr_queue().transcribe_fn = transcribe_fn or asr_whisper.transcribe
@@ -1,16 +1,40 @@
-from faster_whisper import WhisperModel
-from config import WHISPER_MODEL
+import threading
+
+from config import WHISPER_MODEL, ASR_WORKERS
 from src.logger import debug
 
 TAG = "ASR"
 
 
-model = WhisperModel(WHISPER_MODEL, device="cpu", compute_type="float32")
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """Load the Whisper model once per process; later callers share the warm instance."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from faster_whisper import WhisperModel
+
+                debug(TAG, f"Loading Whisper model {WHISPER_MODEL} (num_workers={ASR_WORKERS})")
+                _model = WhisperModel(
+                    WHISPER_MODEL,
+                    device="cpu",
+                    compute_type="float32",
+                    num_workers=max(1, int(ASR_WORKERS)),
+                )
+    return _model
+
+
+def warm():
+    get_model()
 
 
 def transcribe(audio_array):
     debug(TAG, "Starting transcription")
-    segments, _ = model.transcribe(audio_array, language="en")
+    segments, _ = get_model().transcribe(audio_array, language="en")
     text = " ".join(s.text.strip() for s in segments)
     debug(TAG, f"Transcription complete ({len(text)} chars)")
     return text
@@ -1,16 +1,20 @@
 import numpy as np
 import wave
 from config import SAMPLE_RATE, COMPUTER, AUDIO_INPUT_NAME
-import sounddevice as sd
 import subprocess
 
+from src import logger
 from src.logger import debug, error
 
 TAG = "REC"
 
 
 class Recorder:
-    def __init__(self):
+    def __init__(self, input_name=None):
+        # Imported here so headless tools can use save_wav without PortAudio installed.
+        import sounddevice as sd
+
+        self.input_name = input_name or AUDIO_INPUT_NAME
         self.frames = []
         self.is_recording = False
         self.stream = None
@@ -18,7 +22,8 @@ class Recorder:
 
         def callback(indata, _frames, _time, status):
             if status:
-                error(TAG, f"WARNING: {status}")
+                # Realtime audio thread: queue only, never print here.
+                logger.nowait(TAG, "WARNING: {}", status)
             if self.is_recording:
                 # Mac mini Scarlett Solo 4th Gen: mic is on channel 2 (index 1)
                 if COMPUTER == "macmini" and self.input_channels >= 2 and indata.ndim == 2 and indata.shape[1] >= 2:
@@ -26,13 +31,15 @@ class Recorder:
                 else:
                     self.frames.append(indata.copy())
 
+        # The callback's warnings need the background writer to reach the console.
+        logger.start()
         debug(TAG, "Initialising input stream (open once, keep open)")
 
         device_index = None
         if COMPUTER == "macmini":
             for i, d in enumerate(sd.query_devices()):
                 name = d["name"]
-                if AUDIO_INPUT_NAME.lower() in name.lower():
+                if self.input_name.lower() in name.lower():
                     device_index = i
                     debug(TAG, f"Matched input device: {name} (index {i})")
                     break
@@ -0,0 +1,185 @@
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+
+from config import SAMPLE_RATE
+from src.audio_upload import decode_wav_bytes
+from src.logger import debug
+
+TAG = "SOURCE"
+
+# Same order of size as a sounddevice callback block.
+DEFAULT_BLOCK_SEC = 0.02
+
+
+def synthetic_utterance(duration_sec, seed=0):
+    """Voiced-ish test signal: a few harmonics plus noise, well above the silence threshold."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration_sec * SAMPLE_RATE), dtype=np.float32) / SAMPLE_RATE
+    f0 = 110.0 + 40.0 * rng.random()
+    audio = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in (1, 2, 3))
+    audio = 0.2 * audio + 0.01 * rng.standard_normal(t.size)
+    return audio.astype(np.float32)
+
+
+def read_wav(path):
+    """16-bit PCM WAV -> float32 mono at SAMPLE_RATE."""
+    with open(path, "rb") as f:
+        return decode_wav_bytes(f.read())
+
+
+class Utterance:
+    """One participant turn: float32 mono audio at SAMPLE_RATE, then `gap_sec` of silence."""
+
+    __slots__ = ("name", "audio", "gap_sec")
+
+    def __init__(self, name, audio, gap_sec=0.0):
+        self.name = name
+        self.audio = audio
+        self.gap_sec = float(gap_sec)
+
+    @property
+    def duration_sec(self):
+        return self.audio.size / float(SAMPLE_RATE)
+
+    def blocks(self, block_sec=DEFAULT_BLOCK_SEC):
+        step = max(1, int(block_sec * SAMPLE_RATE))
+        for start in range(0, self.audio.size, step):
+            yield self.audio[start:start + step]
+
+
+def deliver(utterance, speed=1.0, block_sec=DEFAULT_BLOCK_SEC, on_block=None):
+    """
+    Play an utterance in like a microphone would: blocks arrive at `speed`
+    times real time (0 = as fast as possible). Returns the captured audio,
+    as Recorder.stop() would.
+    """
+    frames = []
+    t0 = time.monotonic()
+    delivered = 0
+    for block in utterance.blocks(block_sec):
+        if speed > 0:
+            delivered += block.size
+            due = t0 + delivered / float(SAMPLE_RATE) / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        frames.append(block)
+        if on_block is not None:
+            on_block(block)
+    if not frames:
+        return np.zeros((0,), dtype=np.float32)
+    return np.concatenate(frames)
+
+
+class AudioSource:
+    """Yields Utterances in conversation order."""
+
+    def utterances(self):
+        raise NotImplementedError
+
+    def __iter__(self):
+        return iter(self.utterances())
+
+
+class WavSource(AudioSource):
+    def __init__(self, paths, gap_sec=0.0, loop=1):
+        self.paths = list(paths)
+        self.gap_sec = float(gap_sec)
+        self.loop = max(1, int(loop))
+
+    def utterances(self):
+        cache = {}
+        for _ in range(self.loop):
+            for path in self.paths:
+                if path not in cache:
+                    cache[path] = read_wav(path)
+                    debug(TAG, "Loaded {} ({:.2f}s)".format(path, cache[path].size / float(SAMPLE_RATE)))
+                yield Utterance(os.path.basename(path), cache[path], self.gap_sec)
+
+
+class DirectorySource(WavSource):
+    """Every matching WAV in a directory, in name order (e.g. a session's input_turn_NNN.wav files)."""
+
+    def __init__(self, directory, pattern="*.wav", gap_sec=0.0, loop=1):
+        paths = sorted(glob.glob(os.path.join(directory, pattern)))
+        if not paths:
+            raise ValueError("no {} files in {}".format(pattern, directory))
+        super().__init__(paths, gap_sec=gap_sec, loop=loop)
+
+
+class SyntheticSource(AudioSource):
+    def __init__(self, count=10, duration_sec=2.0, gap_sec=0.0, seed=0):
+        self.count = int(count)
+        self.duration_sec = float(duration_sec)
+        self.gap_sec = float(gap_sec)
+        self.seed = int(seed)
+
+    def utterances(self):
+        # A handful of distinct clips is enough; reuse them instead of regenerating.
+        clips = [synthetic_utterance(self.duration_sec, seed=self.seed + i) for i in range(min(self.count, 8))]
+        for i in range(self.count):
+            yield Utterance("synthetic_{:03d}".format(i + 1), clips[i % len(clips)], self.gap_sec)
+
+
+class SourceRecorder:
+    """
+    Stands in for audio_io.Recorder: each start()/stop() returns as much of
+    the source's next utterance as the hold lasted (padded with silence if
+    the hold outlasts it), so a bridge can be driven without a microphone.
+    The source is cycled when it runs out.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.is_recording = False
+        self._utterances = None
+        self._started = None
+        self._lock = threading.Lock()
+
+    def _next_utterance(self):
+        for _ in range(2):
+            if self._utterances is None:
+                self._utterances = iter(self.source)
+            try:
+                return next(self._utterances)
+            except StopIteration:
+                self._utterances = None
+        raise ValueError("audio source yielded no utterances")
+
+    def start(self):
+        with self._lock:
+            self._started = time.monotonic()
+            self.is_recording = True
+
+    def stop(self):
+        with self._lock:
+            if not self.is_recording:
+                return np.zeros((0,), dtype=np.float32)
+            self.is_recording = False
+            held = int((time.monotonic() - self._started) * SAMPLE_RATE)
+            audio = self._next_utterance().audio
+        if held <= audio.size:
+            return audio[:held]
+        return np.concatenate([audio, np.zeros(held - audio.size, dtype=np.float32)])
+
+    def shutdown(self):
+        self.is_recording = False
+
+
+def source_from_spec(spec, utterance_sec=2.0, seed=0):
+    """
+    "synthetic" -> SyntheticSource; "dir:<path>" -> DirectorySource of its
+    WAVs (e.g. a session's input_turn_*.wav); "wav:<a.wav>,<b.wav>" -> WavSource.
+    """
+    kind, _, arg = str(spec or "").partition(":")
+    if kind == "synthetic":
+        return SyntheticSource(count=8, duration_sec=utterance_sec, seed=seed)
+    if kind == "dir" and arg:
+        return DirectorySource(arg)
+    if kind == "wav" and arg:
+        return WavSource(arg.split(","))
+    raise ValueError("unknown audio source {!r}; expected synthetic, dir:<path> or wav:<files>".format(spec))
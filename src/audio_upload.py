@@ -0,0 +1,223 @@
+import io
+import threading
+import time
+import wave
+
+import numpy as np
+
+from config import SAMPLE_RATE
+from src.logger import debug
+
+TAG = "UPLOAD"
+
+PCM_FORMATS = ("s16le", "f32le")
+# Containers parsed with the stdlib; anything else goes through faster_whisper.decode_audio.
+WAV_FORMATS = ("wav",)
+COMPRESSED_FORMATS = ("ogg", "opus", "mp3", "flac", "m4a", "aac", "webm")
+FORMATS = PCM_FORMATS + WAV_FORMATS + COMPRESSED_FORMATS
+
+_PCM_WIDTH = {"s16le": 2, "f32le": 4}
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadDiscarded(Exception):
+    """finish() on an upload that was deleted or expired in the meantime."""
+
+
+class ChunkOffsetMismatch(ValueError):
+    """A chunk's byte offset isn't where the upload ends, e.g. a retried POST."""
+
+    def __init__(self, offset, expected):
+        super().__init__("chunk starts at byte {} but the upload has {} bytes".format(offset, expected))
+        self.offset = offset
+        self.expected = expected
+
+
+def resample(audio, src_rate, dst_rate=SAMPLE_RATE):
+    if int(src_rate) == int(dst_rate) or audio.size == 0:
+        return audio
+    n_out = int(round(audio.size * float(dst_rate) / float(src_rate)))
+    x_out = np.linspace(0.0, audio.size - 1, n_out, dtype=np.float64)
+    return np.interp(x_out, np.arange(audio.size), audio).astype(np.float32)
+
+
+def decode_wav_bytes(data):
+    with wave.open(io.BytesIO(data), "rb") as wf:
+        width, channels, rate = wf.getsampwidth(), wf.getnchannels(), wf.getframerate()
+        raw = wf.readframes(wf.getnframes())
+    if width != 2:
+        raise ValueError("only 16-bit PCM WAV is supported (got {}-byte samples)".format(width))
+    audio = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1).astype(np.float32)
+    return resample(audio, rate)
+
+
+def decode_compressed_bytes(data):
+    # Imported lazily: PyAV comes in with faster-whisper, which the bridge already needs.
+    from faster_whisper import decode_audio
+
+    return decode_audio(io.BytesIO(data), sampling_rate=SAMPLE_RATE).astype(np.float32, copy=False)
+
+
+class AudioUpload:
+    """
+    One robot-recorded turn arriving in chunks.
+
+    Raw PCM is converted straight into a preallocated float32 buffer that
+    grows by doubling, so appending is amortised O(chunk) with no per-chunk
+    concatenation. Container/compressed formats are buffered as bytes and
+    decoded once on finish().
+    """
+
+    def __init__(self, upload_id, fmt="s16le", sample_rate=SAMPLE_RATE, max_sec=120.0, initial_sec=10.0,
+                 partial=False, recording_started_at=None, trace=None):
+        if fmt not in FORMATS:
+            raise ValueError("unsupported format {!r}; expected one of {}".format(fmt, ", ".join(FORMATS)))
+        self.upload_id = upload_id
+        self.format = fmt
+        self.sample_rate = int(sample_rate)
+        self.max_samples = int(max_sec * self.sample_rate)
+        self.created_at = time.monotonic()
+        self.last_activity_at = self.created_at
+        self.bytes_received = 0
+        self.chunks_received = 0
+        self.finished = False
+        self.discarded = False
+        self.recording_started_at = recording_started_at
+        self.trace = trace
+        self.partial_text = None
+        self.partial_samples = 0
+        self.partial_in_flight = False
+        self.partial_request = None
+
+        self._lock = threading.Lock()
+        self._n = 0
+        self._carry = b""
+        if fmt in PCM_FORMATS:
+            self._buf = np.empty(max(1, int(initial_sec * self.sample_rate)), dtype=np.float32)
+            self._raw = None
+        else:
+            self._buf = None
+            self._raw = bytearray()
+        # Preview decodes need the PCM buffer; containers are only decodable once complete.
+        self.partial = bool(partial) and self.is_pcm
+
+    @property
+    def is_pcm(self):
+        return self._buf is not None
+
+    @property
+    def samples(self):
+        return self._n
+
+    def _reserve(self, n_new):
+        need = self._n + n_new
+        if need > self.max_samples:
+            raise UploadTooLarge("upload exceeds {:.0f}s of audio".format(self.max_samples / self.sample_rate))
+        if need <= self._buf.size:
+            return
+        size = self._buf.size
+        while size < need:
+            size *= 2
+        grown = np.empty(min(size, self.max_samples), dtype=np.float32)
+        grown[:self._n] = self._buf[:self._n]
+        self._buf = grown
+
+    def idle_sec(self, now=None):
+        return (time.monotonic() if now is None else now) - self.last_activity_at
+
+    def append(self, chunk, offset=None):
+        """
+        Append raw bytes from the request body. Chunks may split samples.
+        With `offset`, the chunk must start exactly where the upload ends;
+        otherwise ChunkOffsetMismatch is raised and nothing is appended.
+        """
+        if not chunk:
+            return
+        with self._lock:
+            if self.finished:
+                raise ValueError("upload already finished")
+            if offset is not None and int(offset) != self.bytes_received:
+                raise ChunkOffsetMismatch(int(offset), self.bytes_received)
+            self.last_activity_at = time.monotonic()
+            self.bytes_received += len(chunk)
+            self.chunks_received += 1
+            if not self.is_pcm:
+                if len(self._raw) + len(chunk) > self.max_samples * 4:
+                    raise UploadTooLarge("upload exceeds size limit")
+                self._raw += chunk
+                return
+
+            width = _PCM_WIDTH[self.format]
+            if self._carry:
+                chunk = self._carry + chunk
+            usable = len(chunk) - (len(chunk) % width)
+            self._carry = bytes(chunk[usable:])
+            if usable == 0:
+                return
+
+            dtype = "<i2" if self.format == "s16le" else "<f4"
+            src = np.frombuffer(chunk, dtype=dtype, count=usable // width)
+            self._reserve(src.size)
+            dst = self._buf[self._n:self._n + src.size]
+            if self.format == "s16le":
+                np.multiply(src, 1.0 / 32768.0, out=dst, casting="unsafe")
+            else:
+                dst[:] = src
+            self._n += src.size
+
+    def discard(self):
+        """Abandon the upload: free its buffers and drop any queued preview."""
+        with self._lock:
+            self.finished = True
+            self.discarded = True
+            self._raw = None
+            if self._buf is not None:
+                self._buf = self._buf[:0].copy()
+            self._n = 0
+            self._carry = b""
+            request = self.partial_request
+        if request is not None:
+            request.cancel()
+
+    def view(self):
+        """The PCM received so far, as a view into the buffer (no copy)."""
+        with self._lock:
+            return self._buf[:self._n] if self.is_pcm else None
+
+    def finish(self):
+        """Returns the whole utterance as float32 mono at SAMPLE_RATE."""
+        with self._lock:
+            if self.discarded:
+                raise UploadDiscarded("upload {} was discarded".format(self.upload_id))
+            self.finished = True
+            if self.partial_request is not None:
+                # The final decode supersedes a preview still waiting its turn.
+                self.partial_request.cancel()
+            if self.is_pcm:
+                audio = self._buf[:self._n]
+                return resample(audio, self.sample_rate)
+            data = bytes(self._raw)
+            self._raw = None
+        debug(TAG, "Decoding {} bytes of {} audio", len(data), self.format)
+        if self.format in WAV_FORMATS:
+            return decode_wav_bytes(data)
+        return decode_compressed_bytes(data)
+
+    def describe(self):
+        with self._lock:
+            return {
+                "upload_id": self.upload_id,
+                "format": self.format,
+                "sample_rate": self.sample_rate,
+                "bytes_received": self.bytes_received,
+                "chunks_received": self.chunks_received,
+                "audio_sec": round(self._n / float(self.sample_rate), 3) if self.is_pcm else None,
+                "finished": self.finished,
+                "partial_transcript": self.partial_text,
+                "idle_sec": round(self.idle_sec(), 3),
+            }
@@ -0,0 +1,341 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from config import SESSIONS_DIR
+from src.logger import error, info
+
+TAG = "BATTERY"
+
+DEFAULT_BATTERY_LOG = os.path.join(os.path.dirname(SESSIONS_DIR), "battery_log.csv")
+DEFAULT_LOW_CHARGE = 20.0
+DEFAULT_SLOT_MIN = 30.0
+# Speaking-time estimate for turns without a measured ai_duration_sec (robot mode):
+# ~150 words per minute at ~6 characters per word.
+SPEECH_CHARS_PER_SEC = 15.0
+# Complete sessions per robot needed before fitting idle and speech drain separately.
+MIN_FIT_SESSIONS = 4
+
+_FLOAT_COLUMNS = ("starting_charge", "final_charge", "session_duration_sec")
+_TEXT_COLUMNS = ("session_id", "session_dir", "robot_name", "final_reason", "started_at")
+
+
+# ---------------------------------------------------------
+# Loading
+# ---------------------------------------------------------
+def _float_column(values):
+    arr = np.asarray(values, dtype=str)
+    arr = np.where(np.char.strip(arr) == "", "nan", arr)
+    return arr.astype(np.float64)
+
+
+def load_battery_log(path):
+    """
+    battery_log.csv -> dict of column arrays. Numeric columns are float64
+    with NaN for missing readings (many sessions never get a final one).
+    Error columns can hold quoted multi-line text, so rows are split with
+    the csv module and everything after that is columnar.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        width = len(header)
+        rows = [row[:width] + [""] * (width - len(row)) for row in reader if row]
+
+    index = {name: i for i, name in enumerate(header)}
+    raw = list(zip(*rows)) if rows else [()] * width
+    table = {"rows": len(rows)}
+    for name in _TEXT_COLUMNS:
+        table[name] = np.asarray(raw[index[name]] if name in index else [""] * len(rows), dtype=object)
+    for name in _FLOAT_COLUMNS:
+        table[name] = _float_column(raw[index[name]]) if name in index else np.full(len(rows), np.nan)
+    return table
+
+
+def _is_placeholder(text):
+    # "(sent to robot)", "(robot spoke)" and similar stand-ins carry no speech length.
+    return text.startswith("(") and text.endswith(")")
+
+
+# Per session: turns, measured speaking seconds, and reply characters of
+# turns without a measured duration (robot mode), to be converted to seconds.
+_TURN_STATS_SQL = """
+SELECT session_id,
+       COUNT(*),
+       TOTAL(ai_duration_sec),
+       TOTAL(CASE WHEN ai_duration_sec IS NULL AND NOT (ai_text LIKE '(%)') THEN length(ai_text) END)
+FROM turns
+GROUP BY session_id
+"""
+
+
+def turn_stats_from_index(session_ids, sessions_dir=None, db_path=None):
+    """Turn count and speaking seconds per session, via the incremental session index."""
+    from src import session_index
+
+    if db_path is None and sessions_dir:
+        db_path = os.path.join(sessions_dir, os.path.basename(session_index.DEFAULT_DB_PATH))
+    session_index.update_index(sessions_dir=sessions_dir, db_path=db_path)
+    conn = session_index.connect(db_path)
+    try:
+        rows = conn.execute(_TURN_STATS_SQL).fetchall()
+    finally:
+        conn.close()
+    return _join_turn_stats(session_ids, rows)
+
+
+def turn_stats_from_logs(session_ids, session_dirs, sessions_dir=None):
+    """Same as turn_stats_from_index, reading each conversation_log.jsonl directly."""
+    sessions_dir = sessions_dir or SESSIONS_DIR
+    rows = []
+    for session_id, recorded_dir in zip(session_ids, session_dirs):
+        candidates = (os.path.join(sessions_dir, session_id), recorded_dir)
+        for session_dir in candidates:
+            path = os.path.join(session_dir or "", "conversation_log.jsonl")
+            if os.path.isfile(path):
+                break
+        else:
+            continue
+        turns, measured, chars = 0, 0.0, 0
+        with open(path, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    r = json.loads(line)
+                except ValueError:
+                    error(TAG, "Skipping malformed line in {}".format(path))
+                    continue
+                if r.get("turn") is None:
+                    continue
+                turns += 1
+                if r.get("ai_duration_sec") is not None:
+                    measured += r["ai_duration_sec"]
+                else:
+                    text = r.get("ai_text") or ""
+                    chars += 0 if _is_placeholder(text) else len(text)
+        rows.append((session_id, turns, measured, chars))
+    return _join_turn_stats(session_ids, rows)
+
+
+def _join_turn_stats(session_ids, rows):
+    """
+    (session_id, turns, measured_sec, unmeasured_chars) rows -> arrays
+    aligned with session_ids. A session on several CSV rows gets its stats on
+    each of them; repeated stats rows for one session count once.
+    """
+    n = len(session_ids)
+    turns = np.zeros(n, dtype=np.int64)
+    speech = np.zeros(n, dtype=np.float64)
+    has_log = np.zeros(n, dtype=bool)
+    if n == 0 or not rows:
+        return {"turns": turns, "speech_sec": speech, "has_log": has_log}
+
+    sid, count, measured, chars = zip(*rows)
+    sid, first = np.unique(np.asarray(sid, dtype=object), return_index=True)
+    count = np.asarray(count, dtype=np.int64)[first]
+    per_session = (np.asarray(measured, dtype=np.float64)
+                   + np.asarray(chars, dtype=np.float64) / SPEECH_CHARS_PER_SEC)[first]
+
+    ids, inverse = np.unique(np.asarray(session_ids, dtype=object), return_inverse=True)
+    # Sessions in the log but not in the CSV (and vice versa) simply don't match.
+    pos = np.minimum(np.searchsorted(sid, ids), sid.size - 1)
+    matched = sid[pos] == ids
+    hit = matched[inverse]
+    src = pos[inverse][hit]
+
+    turns[hit] = count[src]
+    speech[hit] = per_session[src]
+    has_log[hit] = True
+    return {"turns": turns, "speech_sec": speech, "has_log": has_log}
+
+
+# ---------------------------------------------------------
+# Analysis
+# ---------------------------------------------------------
+def _fit_rates(duration_min, speech_min, drain):
+    """
+    drain ≈ idle_rate * (duration - speech) + speech_rate * speech, in
+    percent per minute, by least squares. Returns (idle, speech) or None if
+    the fit is underdetermined or not physical.
+    """
+    if drain.size < MIN_FIT_SESSIONS:
+        return None
+    design = np.column_stack([duration_min - speech_min, speech_min])
+    if np.linalg.matrix_rank(design) < 2:
+        return None
+    (idle, speech), *_ = np.linalg.lstsq(design, drain, rcond=None)
+    if idle < 0 or speech < 0:
+        return None
+    return float(idle), float(speech)
+
+
+def analyse(table, turn_stats, low_charge=DEFAULT_LOW_CHARGE, slot_min=DEFAULT_SLOT_MIN):
+    start = table["starting_charge"]
+    final = table["final_charge"]
+    duration_min = table["session_duration_sec"] / 60.0
+    speech_min = turn_stats["speech_sec"] / 60.0
+    turns = turn_stats["turns"]
+    robots = table["robot_name"]
+
+    complete = ~np.isnan(start) & ~np.isnan(final) & (duration_min > 0)
+    drain = start - final
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drain_per_hour = np.where(complete, drain / duration_min * 60.0, np.nan)
+        min_per_turn = np.where(complete & (turns > 0), duration_min / turns, np.nan)
+
+    estimated_final = final.copy()
+    estimated = np.zeros(table["rows"], dtype=bool)
+    per_robot = {}
+    for robot in sorted(set(robots.tolist())):
+        sel = robots == robot
+        done = sel & complete
+        rate_per_min = float(np.nanmedian(drain_per_hour[done])) / 60.0 if done.any() else np.nan
+        fit = _fit_rates(duration_min[done & turn_stats["has_log"]],
+                         speech_min[done & turn_stats["has_log"]],
+                         drain[done & turn_stats["has_log"]])
+        turn_min = float(np.nanmedian(min_per_turn[done])) if np.isfinite(min_per_turn[done]).any() else np.nan
+
+        # Sessions without a final reading: estimate from turns held (and speech, if the fit allows).
+        open_ = sel & np.isnan(final) & ~np.isnan(start) & (turns > 0)
+        if open_.any() and np.isfinite(turn_min) and np.isfinite(rate_per_min):
+            est_duration = turns[open_] * turn_min
+            if fit is not None:
+                idle, speech = fit
+                est_drain = idle * np.maximum(est_duration - speech_min[open_], 0.0) + speech * speech_min[open_]
+            else:
+                est_drain = rate_per_min * est_duration
+            estimated_final[open_] = start[open_] - est_drain
+            estimated[open_] = True
+
+        minutes_to_low = (100.0 - low_charge) / rate_per_min if rate_per_min > 0 else None
+        per_robot[robot] = {
+            "sessions": int(sel.sum()),
+            "with_final_reading": int(done.sum()),
+            "drain_pct_per_hour_median": _round(rate_per_min * 60.0),
+            "drain_pct_per_hour_p90": _round(np.nanpercentile(drain_per_hour[done], 90)) if done.any() else None,
+            "idle_drain_pct_per_min": _round(fit[0]) if fit else None,
+            "speech_drain_pct_per_min": _round(fit[1]) if fit else None,
+            "minutes_per_turn_median": _round(turn_min),
+            "minutes_from_full_to_low": _round(minutes_to_low),
+            "slots_per_charge": int(minutes_to_low // slot_min) if minutes_to_low else None,
+            "charge_needed_per_slot_pct": _round(rate_per_min * slot_min),
+        }
+
+    # At risk: ended (or is estimated to end) below the low mark, or started a
+    # session without enough charge for one more slot at that robot's usual rate.
+    robot_slot_cost = np.array(
+        [per_robot[r]["charge_needed_per_slot_pct"] or np.nan for r in robots.tolist()], dtype=np.float64
+    )
+    ended_low = estimated_final < low_charge
+    short_start = (start - robot_slot_cost) < low_charge
+    at_risk = ended_low | short_start
+    risk_rows = np.flatnonzero(at_risk)
+    at_risk_sessions = [
+        {
+            "session_id": table["session_id"][i],
+            "robot": robots[i],
+            "starting_charge": _round(start[i]),
+            "final_charge": _round(estimated_final[i]),
+            "final_estimated": bool(estimated[i]),
+            "reason": "ended_low" if ended_low[i] else "insufficient_start",
+        }
+        for i in risk_rows
+    ]
+
+    return {
+        "sessions": int(table["rows"]),
+        "with_final_reading": int(complete.sum()),
+        "missing_final_reading": int(np.isnan(final).sum()),
+        "with_turn_log": int(turn_stats["has_log"].sum()),
+        "low_charge_pct": low_charge,
+        "slot_min": slot_min,
+        "robots": per_robot,
+        "at_risk": at_risk_sessions,
+    }
+
+
+def _round(value, digits=3):
+    if value is None:
+        return None
+    value = float(value)
+    return round(value, digits) if np.isfinite(value) else None
+
+
+def build_report(csv_path=DEFAULT_BATTERY_LOG, sessions_dir=None, use_index=True, db_path=None,
+                 low_charge=DEFAULT_LOW_CHARGE, slot_min=DEFAULT_SLOT_MIN):
+    t0 = time.perf_counter()
+    table = load_battery_log(csv_path)
+    session_ids = table["session_id"].tolist()
+    if use_index and os.path.isdir(sessions_dir or SESSIONS_DIR):
+        stats = turn_stats_from_index(session_ids, sessions_dir=sessions_dir, db_path=db_path)
+    else:
+        stats = turn_stats_from_logs(session_ids, table["session_dir"].tolist(), sessions_dir=sessions_dir)
+    report = analyse(table, stats, low_charge=low_charge, slot_min=slot_min)
+    report["elapsed_sec"] = round(time.perf_counter() - t0, 4)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m src.battery_report",
+        description="Robot battery drain per hour and per minute of speech, from battery_log.csv and session logs.",
+    )
+    parser.add_argument("csv", nargs="?", default=DEFAULT_BATTERY_LOG)
+    parser.add_argument("--sessions-dir", default=SESSIONS_DIR)
+    parser.add_argument("--db", help="session index database (default: sessions_index.sqlite3 in the sessions dir)")
+    parser.add_argument("--no-index", action="store_true", help="read conversation logs directly instead of the index")
+    parser.add_argument("--low", type=float, default=DEFAULT_LOW_CHARGE, help="charge (%%) treated as running out")
+    parser.add_argument("--slot-min", type=float, default=DEFAULT_SLOT_MIN, help="length of a study slot in minutes")
+    parser.add_argument("--limit", type=int, default=20, help="at-risk sessions to list in the text report")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = build_report(
+        args.csv,
+        sessions_dir=args.sessions_dir,
+        use_index=not args.no_index,
+        db_path=args.db,
+        low_charge=args.low,
+        slot_min=args.slot_min,
+    )
+    if args.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+        return 0
+
+    info(TAG, "{} sessions, {} with a final reading, {} with turn logs ({:.3f}s)".format(
+        report["sessions"], report["with_final_reading"], report["with_turn_log"], report["elapsed_sec"]
+    ))
+    print("{:<12} {:>8} {:>10} {:>10} {:>12} {:>11} {:>8}".format(
+        "robot", "sessions", "%/hour", "%/speech", "full->low", "%/slot", "slots"
+    ))
+    for robot, r in report["robots"].items():
+        print("{:<12} {:>8} {:>10} {:>10} {:>12} {:>11} {:>8}".format(
+            robot, r["sessions"],
+            _fmt(r["drain_pct_per_hour_median"]), _fmt(r["speech_drain_pct_per_min"]),
+            _fmt(r["minutes_from_full_to_low"], " min"), _fmt(r["charge_needed_per_slot_pct"]),
+            _fmt(r["slots_per_charge"]),
+        ))
+    if report["at_risk"]:
+        print("\nat risk (< {:.0f}%):".format(report["low_charge_pct"]))
+        for s in report["at_risk"][:args.limit]:
+            print("  {session_id} {robot}: start {starting_charge}, end {final_charge}{est} ({reason})".format(
+                est=" (est.)" if s["final_estimated"] else "", **s
+            ))
+        if len(report["at_risk"]) > args.limit:
+            print("  ... and {} more (--json for all)".format(len(report["at_risk"]) - args.limit))
+    return 0
+
+
+def _fmt(value, suffix=""):
+    return "-" if value is None else "{}{}".format(round(value, 1) if isinstance(value, float) else value, suffix)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,548 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from config import SAMPLE_RATE
+from src import asr_queue, asr_whisper, nao_converse, tts_engine
+from src.audio_sources import synthetic_utterance
+from src.converse_stub import ConverseStub
+from src.file_watch import get_watcher
+from src.conversation import ConversationManager
+from src.journal import get_journal
+from src.latency_report import collect_stage_durations, stage_percentiles
+from src.logger import info
+from src.response_modes import LocalResponseAdapter, RobotResponseAdapter
+from src.robot_job import build_input_job
+from src.robot_queue import FileJobQueue, SqliteJobQueue
+from src.tracing import now_iso
+
+TAG = "BENCH"
+
+DEFAULT_THRESHOLD_PCT = 20.0
+# Stage changes smaller than this are treated as timer noise by compare.
+DEFAULT_MIN_ABS_SEC = 0.002
+
+
+# ---------------------------------------------------------
+# Stand-in backends
+# ---------------------------------------------------------
+class StubTranscriber:
+    """Sleeps for a fixed fraction of the audio length, like a model with that real-time factor."""
+
+    def __init__(self, realtime_factor=0.05):
+        self.realtime_factor = float(realtime_factor)
+        self.calls = 0
+
+    def __call__(self, audio):
+        self.calls += 1
+        time.sleep(self.realtime_factor * float(len(audio)) / float(SAMPLE_RATE))
+        return "synthetic utterance {}".format(self.calls)
+
+
+class StandInRobot:
+    """
+    Answers each turn_NNNN_input.json in the inbox with a turn_NNNN_output.json after a delay.
+    `replies` and `latencies` (by turn number) override the canned reply and the delay.
+    """
+
+    def __init__(self, inbox_dir, outbox_dir, latency_sec=0.05, poll_sec=0.005, replies=None, latencies=None):
+        self.inbox_dir = inbox_dir
+        self.outbox_dir = outbox_dir
+        self.latency_sec = float(latency_sec)
+        self.poll_sec = float(poll_sec)
+        self.replies = dict(replies or {})
+        self.latencies = dict(latencies or {})
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stand-in-robot", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(1.0)
+
+    def _run(self):
+        answered = set()
+        while not self._stop.is_set():
+            for name in sorted(os.listdir(self.inbox_dir)):
+                if not name.endswith("_input.json") or name in answered:
+                    continue
+                answered.add(name)
+                turn_id = int(name.split("_")[1])
+                try:
+                    with open(os.path.join(self.inbox_dir, name), "r", encoding="utf-8") as f:
+                        job = json.load(f)
+                except (OSError, ValueError):
+                    job = {}
+                started_at = now_iso()
+                time.sleep(self.latencies.get(turn_id, self.latency_sec))
+                reply = self.replies.get(turn_id, "Stand-in robot reply.")
+                out_name = name.replace("_input.json", "_output.json")
+                tmp_path = os.path.join(self.outbox_dir, out_name + ".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    # Trace fields echoed back as a robot runner should (see src.robot_job.build_input_job).
+                    json.dump({
+                        "ok": True,
+                        "ai_segments_list": [[reply]],
+                        "trace_id": job.get("trace_id"),
+                        "span_id": job.get("span_id"),
+                        "started_at": started_at,
+                        "finished_at": now_iso(),
+                    }, f)
+                os.replace(tmp_path, os.path.join(self.outbox_dir, out_name))
+            self._stop.wait(self.poll_sec)
+
+
+# ---------------------------------------------------------
+# Run
+# ---------------------------------------------------------
+def _max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+def run_benchmark(
+    turns=20,
+    mode="computer",
+    asr="stub",
+    asr_rtf=0.05,
+    converse_latency_sec=0.05,
+    robot_latency_sec=0.05,
+    utterance_sec=2.0,
+    trace_memory=False,
+    keep_sessions=False,
+):
+    robot = mode == "robot"
+    sessions_dir = tempfile.mkdtemp(prefix="voice_llm_bench_")
+    transcriber = StubTranscriber(asr_rtf) if asr == "stub" else asr_whisper.transcribe
+    if asr != "stub":
+        asr_whisper.warm()
+
+    tts_engine.configure(backend="null")
+    stub = ConverseStub(latency_sec=converse_latency_sec)
+    nao_converse.configure(api_base=stub.start())
+
+    convo = ConversationManager(
+        robot_enabled=robot,
+        robot_name="bench-robot" if robot else None,
+        transcriber=transcriber,
+        sessions_dir=sessions_dir,
+    )
+    robot_runner = None
+    if robot:
+        robot_runner = StandInRobot(convo.to_robot_dir, convo.from_robot_dir, latency_sec=robot_latency_sec)
+        robot_runner.start()
+        adapter = RobotResponseAdapter(wait_for_done=True)
+    else:
+        adapter = LocalResponseAdapter()
+
+    audio_clips = [synthetic_utterance(utterance_sec, seed=i) for i in range(min(turns, 8))]
+
+    if trace_memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        for i in range(turns):
+            audio = audio_clips[i % len(audio_clips)]
+            turn_id, text = convo.transcribe_only(audio, released_at=time.monotonic())
+            reply, outpath = adapter.prepare_reply(convo, turn_id, text)
+            adapter.complete_turn(convo, turn_id, reply, outpath)
+        wall_sec = time.perf_counter() - t0
+        peak_traced_mb = None
+        if trace_memory:
+            peak_traced_mb = tracemalloc.get_traced_memory()[1] / (1024.0 * 1024.0)
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        if robot_runner is not None:
+            robot_runner.stop()
+        stub.stop()
+
+    get_journal().flush()
+    stages = stage_percentiles(collect_stage_durations([convo.log_path]))
+    if not keep_sessions:
+        shutil.rmtree(sessions_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mode": mode,
+            "asr": asr,
+            "asr_rtf": asr_rtf if asr == "stub" else None,
+            "converse_latency_sec": converse_latency_sec,
+            "robot_latency_sec": robot_latency_sec if robot else None,
+            "utterance_sec": utterance_sec,
+            "sessions_dir": sessions_dir if keep_sessions else None,
+        },
+        "turns": turns,
+        "wall_sec": round(wall_sec, 4),
+        "throughput_turns_per_sec": round(turns / wall_sec, 3) if wall_sec > 0 else None,
+        "stages": stages,
+        "memory": {
+            "peak_traced_mb": None if peak_traced_mb is None else round(peak_traced_mb, 3),
+            "max_rss_mb": round(_max_rss_mb(), 1),
+        },
+    }
+
+
+# ---------------------------------------------------------
+# Upload
+# ---------------------------------------------------------
+def _percentile_summary(samples):
+    arr = np.asarray(samples, dtype=np.float64)
+    p50, p90, p99 = np.percentile(arr, [50, 90, 99])
+    return {"n": int(arr.size), "p50": round(float(p50), 5), "p90": round(float(p90), 5), "p99": round(float(p99), 5)}
+
+
+def run_upload_benchmark(chunk_ms=(20, 100, 500), uploads=10, utterance_sec=3.0, asr_rtf=0.05, realtime=False):
+    """
+    Upload synthetic s16le utterances to an in-process bridge over HTTP, one
+    request per chunk, and measure per-chunk latency, ingest throughput and
+    finish-to-transcript latency for each chunk size.
+    """
+    import requests
+    from werkzeug.serving import make_server
+
+    from src import bridge_server
+
+    sessions_dir = tempfile.mkdtemp(prefix="voice_llm_upload_bench_")
+    bridge_server.configure(sessions_dir=sessions_dir, robots=["bench-upload"])
+    asr_queue.configure(transcribe_fn=StubTranscriber(asr_rtf))
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, bridge_server.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-bridge", daemon=True).start()
+    base = "http://127.0.0.1:{}".format(server.server_port)
+
+    pcm = (np.clip(synthetic_utterance(utterance_sec), -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    http = requests.Session()
+    results = {}
+    try:
+        for ms in chunk_ms:
+            chunk_bytes = int(SAMPLE_RATE * ms / 1000.0) * 2
+            chunk_lat, finish_lat, upload_walls = [], [], []
+            for _ in range(uploads):
+                up = http.post(base + "/robots/bench-upload/uploads", json={"format": "s16le"}).json()
+                t0 = time.perf_counter()
+                for off in range(0, len(pcm), chunk_bytes):
+                    c0 = time.perf_counter()
+                    http.post(base + up["chunks_url"], data=pcm[off:off + chunk_bytes]).raise_for_status()
+                    chunk_lat.append(time.perf_counter() - c0)
+                    if realtime:
+                        time.sleep(ms / 1000.0)
+                upload_walls.append(time.perf_counter() - t0)
+                f0 = time.perf_counter()
+                http.post(base + up["finish_url"], params={"sync": 1}).raise_for_status()
+                finish_lat.append(time.perf_counter() - f0)
+            total_wall = sum(upload_walls)
+            results["{}ms".format(ms)] = {
+                "chunk_bytes": chunk_bytes,
+                "chunks_per_upload": -(-len(pcm) // chunk_bytes),
+                "chunk_request_sec": _percentile_summary(chunk_lat),
+                "finish_to_transcript_sec": _percentile_summary(finish_lat),
+                "ingest_mb_per_sec": round(len(pcm) * uploads / total_wall / 1e6, 3) if total_wall > 0 else None,
+                "ingest_x_realtime": round(utterance_sec * uploads / total_wall, 1) if total_wall > 0 else None,
+            }
+    finally:
+        server.shutdown()
+        bridge_server.shutdown()
+        shutil.rmtree(sessions_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "utterance_sec": utterance_sec,
+            "uploads_per_size": uploads,
+            "asr_rtf": asr_rtf,
+            "realtime": realtime,
+        },
+        "chunk_sizes": results,
+    }
+
+
+# ---------------------------------------------------------
+# Robot job queue
+# ---------------------------------------------------------
+QUEUE_MODES = ("files_poll", "files_watch", "sqlite", "sqlite_other_conn")
+
+
+def _consume_files(inbox_dir, n, seen, mode, poll_sec):
+    watcher = get_watcher(poll_sec=poll_sec) if mode == "files_watch" else None
+    for turn_id in range(1, n + 1):
+        path = os.path.join(inbox_dir, "turn_{:04d}_input.json".format(turn_id))
+        if watcher is not None:
+            watcher.wait_for(path, 10.0)
+        else:
+            # What a file-polling robot does: list the inbox every poll interval.
+            while "turn_{:04d}_input.json".format(turn_id) not in os.listdir(inbox_dir):
+                time.sleep(poll_sec)
+        with open(path, "r", encoding="utf-8") as f:
+            json.load(f)
+        seen[turn_id] = time.perf_counter()
+
+
+def _consume_sqlite(queue, n, seen):
+    while len(seen) < n:
+        claimed = queue.claim(consumer="bench", wait_sec=10.0)
+        if claimed is None:
+            return
+        seen[claimed["turn_id"]] = time.perf_counter()
+        queue.ack(claimed["job_id"], claimed["claim_token"])
+
+
+def run_queue_benchmark(jobs=200, interval_sec=0.01, poll_sec=0.05, modes=QUEUE_MODES):
+    """Enqueue-to-claim latency of the file inbox (polled and watched) versus the SQLite queue."""
+    results = {}
+    for mode in modes:
+        work_dir = tempfile.mkdtemp(prefix="voice_llm_queue_bench_")
+        inbox_dir = os.path.join(work_dir, "robot_inbox")
+        outbox_dir = os.path.join(work_dir, "robot_outbox")
+        os.makedirs(inbox_dir)
+        os.makedirs(outbox_dir)
+        seen = {}
+        if mode.startswith("files"):
+            producer = FileJobQueue(inbox_dir, outbox_dir)
+            consumer = threading.Thread(target=_consume_files, args=(inbox_dir, jobs, seen, mode, poll_sec))
+        else:
+            db_path = os.path.join(work_dir, "robot_queue.sqlite3")
+            producer = SqliteJobQueue(db_path, export_files=False)
+            # A second connection stands in for a robot process sharing the database.
+            consumer_queue = producer if mode == "sqlite" else SqliteJobQueue(db_path, export_files=False)
+            consumer = threading.Thread(target=_consume_sqlite, args=(consumer_queue, jobs, seen))
+        enqueued, enqueue_cost = {}, []
+        consumer.start()
+        try:
+            for turn_id in range(1, jobs + 1):
+                job = build_input_job(turn_id, "bench-robot", "synthetic utterance {}".format(turn_id))
+                t0 = time.perf_counter()
+                producer.enqueue(job)
+                enqueued[turn_id] = t0
+                enqueue_cost.append(time.perf_counter() - t0)
+                time.sleep(interval_sec)
+            consumer.join(15.0)
+        finally:
+            producer.close()
+            if mode == "sqlite_other_conn":
+                consumer_queue.close()
+            shutil.rmtree(work_dir, ignore_errors=True)
+        lat = [seen[t] - enqueued[t] for t in sorted(seen)]
+        results[mode] = {
+            "claimed": len(lat),
+            "enqueue_sec": _percentile_summary(enqueue_cost),
+            "enqueue_to_claim_sec": _percentile_summary(lat) if lat else None,
+        }
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "jobs": jobs,
+            "interval_sec": interval_sec,
+            "poll_sec": poll_sec,
+        },
+        "modes": results,
+    }
+
+
+def run_startup_benchmark(runs=5, timeout_sec=120.0):
+    """
+    Launch the GUI `runs` times, let it exit as soon as it is ready and
+    collect each run's startup trace. Needs a display.
+    """
+    gui_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gui.py")
+    work_dir = tempfile.mkdtemp(prefix="voice_llm_startup_bench_")
+    marks, phases, wall = {}, {}, []
+    try:
+        for i in range(runs):
+            trace_path = os.path.join(work_dir, "startup_{:02d}.json".format(i))
+            env = dict(
+                os.environ,
+                VOICE_LLM_CHAT_STARTUP_TRACE=trace_path,
+                VOICE_LLM_CHAT_EXIT_AFTER_STARTUP="1",
+                VOICE_LLM_CHAT_START_FULLSCREEN="0",
+            )
+            t0 = time.perf_counter()
+            subprocess.run(
+                [sys.executable, gui_path], env=env, timeout=timeout_sec, check=True,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            wall.append(time.perf_counter() - t0)
+            with open(trace_path, "r", encoding="utf-8") as f:
+                trace = json.load(f)
+            for name, at in trace["marks"].items():
+                marks.setdefault(name, []).append(at)
+            for p in trace["phases"]:
+                phases.setdefault(p["phase"], []).append(p["duration_sec"])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "runs": runs,
+        },
+        "process_wall_sec": _percentile_summary(wall),
+        "marks_sec": {name: _percentile_summary(v) for name, v in marks.items()},
+        "phases_sec": {name: _percentile_summary(v) for name, v in phases.items()},
+    }
+
+
+# ---------------------------------------------------------
+# Compare
+# ---------------------------------------------------------
+def compare_results(current, baseline, threshold_pct=DEFAULT_THRESHOLD_PCT, min_abs_sec=DEFAULT_MIN_ABS_SEC):
+    """Returns a list of regressions: stages whose p50 or p90 grew by more than threshold_pct."""
+    regressions = []
+    for stage, base in (baseline.get("stages") or {}).items():
+        cur = (current.get("stages") or {}).get(stage)
+        if not cur:
+            continue
+        for key in ("p50", "p90"):
+            b, c = base.get(key), cur.get(key)
+            if b is None or c is None:
+                continue
+            if c - b > max(b * threshold_pct / 100.0, min_abs_sec):
+                regressions.append({
+                    "stage": stage,
+                    "percentile": key,
+                    "baseline_sec": b,
+                    "current_sec": c,
+                    "change_pct": round((c - b) / b * 100.0, 1) if b else None,
+                })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python3 -m src.benchmark")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_run = sub.add_parser("run", help="drive N synthetic turns through the pipeline")
+    p_run.add_argument("--turns", type=int, default=20)
+    p_run.add_argument("--mode", choices=("computer", "robot"), default="computer")
+    p_run.add_argument("--asr", choices=("stub", "whisper"), default="stub")
+    p_run.add_argument("--asr-rtf", type=float, default=0.05, help="stub ASR seconds per second of audio")
+    p_run.add_argument("--converse-latency", type=float, default=0.05)
+    p_run.add_argument("--robot-latency", type=float, default=0.05)
+    p_run.add_argument("--utterance-sec", type=float, default=2.0)
+    p_run.add_argument("--trace-memory", action="store_true", help="also record tracemalloc peak (slower)")
+    p_run.add_argument("--keep-sessions", action="store_true")
+    p_run.add_argument("--out", default="bench_results.json")
+    p_run.add_argument("--baseline", help="fail if any stage regresses against this results file")
+    p_run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD_PCT)
+
+    p_up = sub.add_parser("upload", help="measure bridge audio upload throughput and latency per chunk size")
+    p_up.add_argument("--chunk-ms", type=int, nargs="+", default=[20, 100, 500])
+    p_up.add_argument("--uploads", type=int, default=10, help="uploads per chunk size")
+    p_up.add_argument("--utterance-sec", type=float, default=3.0)
+    p_up.add_argument("--asr-rtf", type=float, default=0.05)
+    p_up.add_argument("--realtime", action="store_true", help="pace chunks at the rate they would be recorded")
+    p_up.add_argument("--out", default="bench_upload.json")
+
+    p_q = sub.add_parser("queue", help="compare robot job enqueue-to-claim latency: file inbox vs SQLite queue")
+    p_q.add_argument("--jobs", type=int, default=200)
+    p_q.add_argument("--interval", type=float, default=0.01, help="seconds between enqueues")
+    p_q.add_argument("--poll", type=float, default=0.05, help="inbox poll interval for files_poll")
+    p_q.add_argument("--modes", nargs="+", choices=QUEUE_MODES, default=list(QUEUE_MODES))
+    p_q.add_argument("--out", default="bench_queue.json")
+
+    p_st = sub.add_parser("startup", help="launch the GUI repeatedly and report time to window and to ready")
+    p_st.add_argument("--runs", type=int, default=5)
+    p_st.add_argument("--out", default="bench_startup.json")
+
+    p_cmp = sub.add_parser("compare", help="compare a results file against a baseline")
+    p_cmp.add_argument("results")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD_PCT)
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "upload":
+        results = run_upload_benchmark(
+            chunk_ms=args.chunk_ms,
+            uploads=args.uploads,
+            utterance_sec=args.utterance_sec,
+            asr_rtf=args.asr_rtf,
+            realtime=args.realtime,
+        )
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        for size, r in results["chunk_sizes"].items():
+            info(TAG, "{}: chunk p99 {:.4f}s, finish->transcript p50 {:.4f}s p99 {:.4f}s, {}x realtime".format(
+                size, r["chunk_request_sec"]["p99"], r["finish_to_transcript_sec"]["p50"],
+                r["finish_to_transcript_sec"]["p99"], r["ingest_x_realtime"],
+            ))
+        return 0
+
+    if args.cmd == "queue":
+        results = run_queue_benchmark(jobs=args.jobs, interval_sec=args.interval, poll_sec=args.poll, modes=args.modes)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        for mode, r in results["modes"].items():
+            lat = r["enqueue_to_claim_sec"] or {}
+            info(TAG, "{}: {} claimed, enqueue p50 {:.5f}s, enqueue->claim p50 {}s p99 {}s".format(
+                mode, r["claimed"], r["enqueue_sec"]["p50"], lat.get("p50"), lat.get("p99"),
+            ))
+        return 0
+
+    if args.cmd == "startup":
+        results = run_startup_benchmark(runs=args.runs)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        for name, r in sorted(results["marks_sec"].items(), key=lambda kv: kv[1]["p50"]):
+            info(TAG, "{}: p50 {:.3f}s p90 {:.3f}s".format(name, r["p50"], r["p90"]))
+        return 0
+
+    if args.cmd == "run":
+        results = run_benchmark(
+            turns=args.turns,
+            mode=args.mode,
+            asr=args.asr,
+            asr_rtf=args.asr_rtf,
+            converse_latency_sec=args.converse_latency,
+            robot_latency_sec=args.robot_latency,
+            utterance_sec=args.utterance_sec,
+            trace_memory=args.trace_memory,
+            keep_sessions=args.keep_sessions,
+        )
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        info(TAG, "{} turns in {:.3f}s ({} turns/s) -> {}".format(
+            results["turns"], results["wall_sec"], results["throughput_turns_per_sec"], args.out
+        ))
+        if not args.baseline:
+            return 0
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    else:
+        with open(args.results, "r", encoding="utf-8") as f:
+            results = json.load(f)
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    regressions = compare_results(results, baseline, threshold_pct=args.threshold)
+    for r in regressions:
+        print("REGRESSION {stage} {percentile}: {baseline_sec:.4f}s -> {current_sec:.4f}s ({change_pct}%)".format(**r))
+    if regressions:
+        return 1
+    print("No stage regressed by more than {:.0f}%".format(args.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+import requests
+
+from src.logger import info
+
+TAG = "LOAD"
+
+# A ramp step counts as saturated when any of these holds (see run_ramp).
+DEFAULT_MAX_ERROR_RATE = 0.01
+# Throughput must grow by at least this fraction when robots are added.
+MIN_THROUGHPUT_GAIN = 0.1
+
+
+def _percentiles(samples):
+    if not samples:
+        return None
+    arr = np.asarray(samples, dtype=np.float64)
+    p50, p90, p99 = np.percentile(arr, [50, 90, 99])
+    return {
+        "n": int(arr.size),
+        "p50": round(float(p50), 4),
+        "p90": round(float(p90), 4),
+        "p99": round(float(p99), 4),
+        "max": round(float(arr.max()), 4),
+    }
+
+
+class _Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.transcript_latencies = []
+        self.audio_sec = 0.0
+
+    def record(self, endpoint, status, elapsed):
+        with self.lock:
+            self.statuses[endpoint][str(status)] += 1
+            if status is not None and status < 400:
+                self.latencies[endpoint].append(elapsed)
+
+    def error(self, endpoint, e):
+        with self.lock:
+            self.statuses[endpoint]["error"] += 1
+            self.errors[type(e).__name__] += 1
+
+    def transcribed(self, stop_to_transcript_sec, audio_sec):
+        with self.lock:
+            self.transcript_latencies.append(stop_to_transcript_sec)
+            self.audio_sec += audio_sec
+
+
+def _call(http, results, endpoint, method, url, timeout, **kwargs):
+    t0 = time.perf_counter()
+    try:
+        resp = http.request(method, url, timeout=timeout, **kwargs)
+    except requests.RequestException as e:
+        results.error(endpoint, e)
+        return None
+    results.record(endpoint, resp.status_code, time.perf_counter() - t0)
+    return resp
+
+
+def _robot_name(i):
+    return "load-{:02d}".format(i)
+
+
+def _jittered(rng, sec, jitter):
+    """sec spread uniformly by ±jitter (a fraction of sec)."""
+    if sec <= 0 or jitter <= 0:
+        return max(0.0, sec)
+    return max(0.0, sec * (1.0 + rng.uniform(-jitter, jitter)))
+
+
+def _robot_loop(base_url, robot, cycles, hold_sec, poll_wait_sec, timeout, results,
+                think_sec=0.0, jitter=0.0, stop_at=None, seed=0):
+    """
+    /start -> hold -> /stop [-> long-poll the transcript] -> think, for
+    `cycles` cycles or until `stop_at` (perf_counter), whichever comes first.
+    """
+    http = requests.Session()
+    rng = random.Random(seed)
+    prefix = "{}/robots/{}".format(base_url.rstrip("/"), robot)
+    done = 0
+    while (cycles is None or done < cycles) and (stop_at is None or time.perf_counter() < stop_at):
+        done += 1
+        _call(http, results, "start", "POST", prefix + "/start", timeout)
+        hold = _jittered(rng, hold_sec, jitter)
+        time.sleep(hold)
+        stopped_at = time.perf_counter()
+        resp = _call(http, results, "stop", "POST", prefix + "/stop", timeout)
+        if poll_wait_sec > 0 and resp is not None and resp.status_code == 202:
+            turn_id = (resp.json() or {}).get("turn_id")
+            result = _call(http, results, "turn_result", "GET", "{}/turns/{}".format(prefix, turn_id), timeout,
+                           params={"wait": poll_wait_sec})
+            if result is not None and result.status_code == 200:
+                results.transcribed(time.perf_counter() - stopped_at, hold)
+        time.sleep(_jittered(rng, think_sec, jitter))
+
+
+def run_load(base_url, robots=4, cycles=20, hold_sec=0.5, poll_wait_sec=0.0, timeout=30.0,
+             think_sec=0.0, jitter=0.0, duration_sec=None, seed=0):
+    """
+    Drive concurrent /start + /stop cycles from `robots` simulated robots and
+    return per-endpoint latency percentiles, status counts, error rate and
+    (with poll_wait_sec > 0) transcription throughput. With duration_sec the
+    robots keep cycling until it has passed instead of stopping after `cycles`.
+    """
+    results = _Results()
+    t0 = time.perf_counter()
+    stop_at = t0 + duration_sec if duration_sec else None
+    threads = [
+        threading.Thread(
+            target=_robot_loop,
+            args=(base_url, _robot_name(i), None if duration_sec else cycles, hold_sec, poll_wait_sec,
+                  timeout, results),
+            kwargs={"think_sec": think_sec, "jitter": jitter, "stop_at": stop_at, "seed": seed + i},
+            name="load-robot-{}".format(i),
+            daemon=True,
+        )
+        for i in range(robots)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_sec = time.perf_counter() - t0
+
+    requests_total = sum(sum(c.values()) for c in results.statuses.values())
+    failed = sum(n for c in results.statuses.values() for status, n in c.items()
+                 if status == "error" or int(status) >= 400)
+    transcribed = len(results.transcript_latencies)
+    return {
+        "url": base_url,
+        "robots": robots,
+        "cycles": None if duration_sec else cycles,
+        "duration_sec": duration_sec,
+        "hold_sec": hold_sec,
+        "think_sec": think_sec,
+        "wall_sec": round(wall_sec, 3),
+        "requests_per_sec": round(requests_total / wall_sec, 2) if wall_sec > 0 else None,
+        "error_rate": round(failed / requests_total, 4) if requests_total else None,
+        "latency_sec": {k: _percentiles(v) for k, v in sorted(results.latencies.items())},
+        "statuses": {k: dict(v) for k, v in sorted(results.statuses.items())},
+        "errors": dict(results.errors),
+        "transcription": {
+            "turns": transcribed,
+            "turns_per_sec": round(transcribed / wall_sec, 3) if wall_sec > 0 else None,
+            "audio_sec_per_sec": round(results.audio_sec / wall_sec, 3) if wall_sec > 0 else None,
+            "stop_to_transcript_sec": _percentiles(results.transcript_latencies),
+        },
+    }
+
+
+def _saturation_reasons(step, best_throughput, slo_sec, max_error_rate):
+    reasons = []
+    if (step["error_rate"] or 0.0) > max_error_rate:
+        reasons.append("error_rate")
+    latency = step["transcription"]["stop_to_transcript_sec"]
+    if slo_sec is not None and latency and latency["p90"] > slo_sec:
+        reasons.append("latency_slo")
+    throughput = step["transcription"]["turns_per_sec"] or 0.0
+    if best_throughput and throughput < best_throughput * (1.0 + MIN_THROUGHPUT_GAIN):
+        reasons.append("throughput_plateau")
+    return reasons
+
+
+def run_ramp(base_url, steps=(1, 2, 4, 8), step_sec=30.0, hold_sec=0.5, think_sec=1.0, jitter=0.0,
+             poll_wait_sec=10.0, timeout=30.0, slo_sec=None, max_error_rate=DEFAULT_MAX_ERROR_RATE, seed=0):
+    """
+    Run `step_sec` of load at each robot count in `steps`. The saturation
+    point is the first step whose error rate exceeds max_error_rate, whose
+    p90 /stop-to-transcript latency exceeds slo_sec, or whose transcription
+    throughput grew by less than MIN_THROUGHPUT_GAIN over the best so far.
+    """
+    results = []
+    saturation = None
+    best = None
+    for robots in steps:
+        step = run_load(
+            base_url,
+            robots=robots,
+            hold_sec=hold_sec,
+            poll_wait_sec=poll_wait_sec,
+            timeout=timeout,
+            think_sec=think_sec,
+            jitter=jitter,
+            duration_sec=step_sec,
+            seed=seed,
+        )
+        results.append(step)
+        t = step["transcription"]
+        info(TAG, "{:>3} robots: {} req/s, {} turns/s, errors {:.1%}, transcript p90 {}".format(
+            robots, step["requests_per_sec"], t["turns_per_sec"], step["error_rate"] or 0.0,
+            (t["stop_to_transcript_sec"] or {}).get("p90"),
+        ))
+        reasons = _saturation_reasons(step, best, slo_sec, max_error_rate)
+        if reasons and saturation is None:
+            saturation = {
+                "robots": robots,
+                "reasons": reasons,
+                "last_unsaturated_robots": results[-2]["robots"] if len(results) > 1 else None,
+            }
+        best = max(best or 0.0, t["turns_per_sec"] or 0.0)
+    return {"url": base_url, "step_sec": step_sec, "steps": results, "saturation": saturation}
+
+
+# ---------------------------------------------------------
+# In-process bridge
+# ---------------------------------------------------------
+def start_local_bridge(audio="synthetic", utterance_sec=2.0, asr="stub", asr_rtf=0.05, sessions_dir=None, robots=64):
+    """
+    Serve the bridge app on a free local port with /start–/stop audio from
+    an audio source instead of the microphone, accepting the first `robots`
+    simulated robot names. Returns (url, server).
+    """
+    import logging
+    import tempfile
+
+    from werkzeug.serving import make_server
+
+    from src import asr_queue, bridge_server
+    from src.audio_sources import SourceRecorder, source_from_spec
+
+    bridge_server.configure(
+        sessions_dir=sessions_dir or tempfile.mkdtemp(prefix="voice_llm_loadtest_"),
+        recorder_factory=lambda robot: SourceRecorder(source_from_spec(audio, utterance_sec=utterance_sec)),
+        robots=[_robot_name(i) for i in range(robots)],
+        max_robots=robots,
+    )
+    if asr == "stub":
+        from src.benchmark import StubTranscriber
+
+        asr_queue.configure(transcribe_fn=StubTranscriber(asr_rtf))
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, bridge_server.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="loadtest-bridge", daemon=True).start()
+    return "http://127.0.0.1:{}".format(server.server_port), server
+
+
+def _print_single(report):
+    info(TAG, "{} robots x {} cycles in {}s ({} req/s, errors {:.1%})".format(
+        report["robots"], report["cycles"], report["wall_sec"], report["requests_per_sec"],
+        report["error_rate"] or 0.0,
+    ))
+    print("{:<12} {:>6} {:>8} {:>8} {:>8} {:>8}".format("endpoint", "n", "p50", "p90", "p99", "max"))
+    latencies = dict(report["latency_sec"])
+    latencies["transcript"] = report["transcription"]["stop_to_transcript_sec"]
+    for endpoint, p in latencies.items():
+        if p:
+            print("{:<12} {:>6} {:>8.4f} {:>8.4f} {:>8.4f} {:>8.4f}".format(
+                endpoint, p["n"], p["p50"], p["p90"], p["p99"], p["max"]
+            ))
+    for endpoint, counts in report["statuses"].items():
+        print("{:<12} {}".format(endpoint, " ".join("{}={}".format(k, v) for k, v in sorted(counts.items()))))
+
+
+def _print_ramp(report):
+    print("{:>6} {:>8} {:>8} {:>9} {:>9} {:>10} {:>10}".format(
+        "robots", "req/s", "errors", "stop p90", "turns/s", "xscr p50", "xscr p90"
+    ))
+    for step in report["steps"]:
+        stop = step["latency_sec"].get("stop") or {}
+        t = step["transcription"]
+        xscr = t["stop_to_transcript_sec"] or {}
+        print("{:>6} {:>8} {:>7.1%} {:>9} {:>9} {:>10} {:>10}".format(
+            step["robots"], step["requests_per_sec"], step["error_rate"] or 0.0, stop.get("p90", "-"),
+            t["turns_per_sec"], xscr.get("p50", "-"), xscr.get("p90", "-"),
+        ))
+    s = report["saturation"]
+    if s:
+        info(TAG, "Saturated at {} robots ({}); last unsaturated: {}".format(
+            s["robots"], ", ".join(s["reasons"]), s["last_unsaturated_robots"]
+        ))
+    else:
+        info(TAG, "No saturation up to {} robots".format(report["steps"][-1]["robots"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python3 -m src.bridge_loadtest")
+    parser.add_argument("--url", default="http://127.0.0.1:5055")
+    parser.add_argument("--robots", type=int, default=4, help="concurrent simulated robots")
+    parser.add_argument("--cycles", type=int, default=20, help="start/stop cycles per robot")
+    parser.add_argument("--ramp", help="comma-separated robot counts, e.g. 1,2,4,8,16 (runs --step-sec each)")
+    parser.add_argument("--step-sec", type=float, default=30.0, help="duration of each ramp step")
+    parser.add_argument("--hold", type=float, default=0.5, help="seconds between /start and /stop")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds between a turn and the next /start")
+    parser.add_argument("--jitter", type=float, default=0.0, help="spread hold and think by ±this fraction")
+    parser.add_argument("--poll-wait", type=float,
+                        help="long-poll each turn result for up to N seconds (default: 0, or 10 with --ramp)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="client timeout per request")
+    parser.add_argument("--slo", type=float, metavar="SEC", help="p90 /stop-to-transcript bound for --ramp")
+    parser.add_argument("--max-error-rate", type=float, default=DEFAULT_MAX_ERROR_RATE)
+    parser.add_argument("--in-process", action="store_true",
+                        help="start a bridge in this process instead of using --url")
+    parser.add_argument("--audio", default="synthetic",
+                        help="in-process audio source: synthetic, dir:<path> or wav:<a.wav>,<b.wav>")
+    parser.add_argument("--asr", choices=("whisper", "stub"), default="stub", help="in-process ASR")
+    parser.add_argument("--asr-rtf", type=float, default=0.05, help="stub ASR seconds per second of audio")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    url, server = args.url, None
+    if args.in_process:
+        steps = [int(n) for n in args.ramp.split(",") if n.strip()] if args.ramp else [args.robots]
+        url, server = start_local_bridge(audio=args.audio, utterance_sec=max(args.hold * 2, 1.0),
+                                         asr=args.asr, asr_rtf=args.asr_rtf, robots=max(steps))
+        info(TAG, "In-process bridge on {} (audio {}, asr {})".format(url, args.audio, args.asr))
+
+    try:
+        if args.ramp:
+            report = run_ramp(
+                url,
+                steps=[int(n) for n in args.ramp.split(",") if n.strip()],
+                step_sec=args.step_sec,
+                hold_sec=args.hold,
+                think_sec=args.think,
+                jitter=args.jitter,
+                poll_wait_sec=10.0 if args.poll_wait is None else args.poll_wait,
+                timeout=args.timeout,
+                slo_sec=args.slo,
+                max_error_rate=args.max_error_rate,
+                seed=args.seed,
+            )
+        else:
+            report = run_load(
+                url,
+                robots=args.robots,
+                cycles=args.cycles,
+                hold_sec=args.hold,
+                poll_wait_sec=args.poll_wait or 0.0,
+                timeout=args.timeout,
+                think_sec=args.think,
+                jitter=args.jitter,
+                seed=args.seed,
+            )
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    elif args.ramp:
+        _print_ramp(report)
+    else:
+        _print_single(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
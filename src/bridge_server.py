@@ -1,98 +1,1048 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 import threading
 import logging
 import os
+import time
 import json
-from datetime import datetime
+import re
+import uuid
+from urllib.parse import parse_qs
 
-from config import validate_mode_settings
+from config import (
+    BRIDGE_AUDIO_SOURCE,
+    BRIDGE_DRAIN_TIMEOUT_SEC,
+    BRIDGE_MAX_LONG_POLLS,
+    BRIDGE_MAX_STREAMS,
+    BRIDGE_MAX_QUEUE,
+    BRIDGE_QUEUE_TIMEOUT_SEC,
+    BRIDGE_REQUEST_TIMEOUT_SEC,
+    BRIDGE_MAX_ROBOTS,
+    BRIDGE_MAX_UPLOADS_PER_ROBOT,
+    BRIDGE_ROBOT_AUDIO_INPUTS,
+    BRIDGE_ROBOTS,
+    BRIDGE_SERVER,
+    BRIDGE_SYNC_STOP,
+    BRIDGE_UPLOAD_IDLE_TTL_SEC,
+    BRIDGE_UPLOAD_MAX_SEC,
+    BRIDGE_UPLOAD_PARTIAL_EVERY_SEC,
+    BRIDGE_WORKERS,
+    DEFAULT_ROBOT_NAME,
+    ROBOT_CONFIGURED,
+    SAMPLE_RATE,
+    SESSION_ARCHIVE_AFTER_DAYS,
+)
+from src import metrics
+from src import asr_whisper
+from src import logger
+from src.asr_queue import PRIORITY_PREVIEW, get_asr_queue
 from src.audio_io import Recorder
+from src.audio_sources import SourceRecorder, source_from_spec
+from src.audio_upload import (
+    FORMATS as UPLOAD_FORMATS,
+    AudioUpload,
+    ChunkOffsetMismatch,
+    UploadDiscarded,
+    UploadTooLarge,
+    resample,
+)
+from src.bridge_serving import AdmissionController, serve_waitress
 from src.conversation import ConversationManager
-from src.logger import debug, exc
+from src.journal import get_journal
+from src.logger import debug, error, exc, info
+from src.profiling import profile_section
+from src.push_channel import PushChannel
+from src.session_archive import apply_retention
+from src.tracing import TurnTrace, now_iso, parse_traceparent
+from src.turn_jobs import STATUS_DONE, STATUS_ERROR, TurnJobTable
 
 TAG = "BRIDGE"
 
+# Upper bound on one GET /turns/<id>?wait=N long-poll.
+MAX_TURN_WAIT_SEC = 60.0
+UPLOAD_READ_BYTES = 64 * 1024
+# SSE comment sent on idle push streams so proxies and clients keep them open.
+PUSH_KEEPALIVE_SEC = 15.0
+
 app = Flask(__name__)
 
-validate_mode_settings(robot_enabled=True)
-rec = Recorder()                 # opens stream once (your audio_io.py already does this)
-convo = ConversationManager(robot_enabled=True)    # creates session dir etc.
 
-_lock = threading.Lock()
-_is_listening = False
-_recording_started_at = None
+def _is_push_stream(environ):
+    return environ.get("REQUEST_METHOD") == "GET" and environ.get("PATH_INFO", "").endswith("/events")
 
 
-def _now_iso():
-    return datetime.now().isoformat(timespec="milliseconds")
+_LONG_POLL_RE = re.compile(r"^(?:/robots/[^/]+)?/turns/\d+$|^/robots/[^/]+/jobs/claim$")
 
 
-def _write_bridge_event(payload):
+def _is_long_poll(environ):
+    """Turn-result GETs and job claims that ask to wait (?wait=N > 0)."""
+    if not _LONG_POLL_RE.match(environ.get("PATH_INFO", "")):
+        return False
     try:
-        event = dict(payload or {})
-        event.setdefault("ts", _now_iso())
-        event_path = os.path.join(convo.session_dir, "bridge_events.jsonl")
-        with open(event_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(event, ensure_ascii=False, sort_keys=True) + "\n")
-    except Exception as e:
-        exc(TAG, e, "Failed to write bridge event")
+        return float(parse_qs(environ.get("QUERY_STRING", "")).get("wait", ["0"])[0] or 0) > 0
+    except ValueError:
+        return False
+
+
+admission = AdmissionController(
+    app.wsgi_app,
+    max_active=BRIDGE_WORKERS,
+    max_queue=BRIDGE_MAX_QUEUE,
+    queue_timeout_sec=BRIDGE_QUEUE_TIMEOUT_SEC,
+    is_stream=_is_push_stream,
+    max_streams=BRIDGE_MAX_STREAMS,
+    is_long_poll=_is_long_poll,
+    max_long_polls=BRIDGE_MAX_LONG_POLLS,
+    slow_request_sec=BRIDGE_REQUEST_TIMEOUT_SEC,
+)
+app.wsgi_app = admission
+
+_m_started = metrics.REGISTRY.counter(
+    "bridge_recordings_started_total", "Recordings started via /start.", ("robot",)
+)
+_m_stopped = metrics.REGISTRY.counter(
+    "bridge_recordings_stopped_total", "Recordings stopped via /stop.", ("robot",)
+)
+_m_empty = metrics.REGISTRY.counter(
+    "bridge_empty_transcripts_total", "Stopped recordings that produced an empty transcript.", ("robot",)
+)
+_m_audio_sec = metrics.REGISTRY.counter(
+    "bridge_audio_seconds_total", "Seconds of participant audio processed.", ("robot",)
+)
+_m_transcribe_sec = metrics.REGISTRY.histogram(
+    "bridge_transcription_seconds",
+    "Time from a turn's transcription job starting to its transcript (WAV write, ASR queue wait and decode); "
+    "excludes time queued behind the robot's earlier turns.",
+    ("robot",),
+)
+_m_upload_bytes = metrics.REGISTRY.counter(
+    "bridge_upload_bytes_total", "Audio bytes received on upload endpoints.", ("robot",)
+)
+_m_upload_to_transcript_sec = metrics.REGISTRY.histogram(
+    "bridge_upload_to_transcript_seconds", "Time from an upload's finish to its transcript.", ("robot",)
+)
+_m_upload_discarded = metrics.REGISTRY.counter(
+    "bridge_uploads_discarded_total", "Uploads dropped before finishing (reason: deleted, expired, too_large).",
+    ("robot", "reason"),
+)
+_m_previews = metrics.REGISTRY.counter(
+    "bridge_upload_previews_total", "Upload preview transcriptions (outcome: done, failed, cancelled).",
+    ("robot", "outcome"),
+)
+_m_preview_sec = metrics.REGISTRY.histogram(
+    "bridge_upload_preview_seconds", "Time from queueing an upload preview to its transcript.", ("robot",)
+)
+_m_push_ack_sec = metrics.REGISTRY.histogram(
+    "bridge_push_job_to_ack_seconds", "Time from an input job being written to the robot acknowledging it.", ("robot",)
+)
+_m_asr_wait_sec = metrics.REGISTRY.histogram(
+    "bridge_asr_queue_wait_seconds", "Time a transcription waited for the shared ASR engine.", ("robot",)
+)
+metrics.REGISTRY.gauge(
+    "bridge_asr_queue_depth", "Transcriptions waiting for the shared ASR engine.",
+    lambda: get_asr_queue().depth(),
+)
+metrics.REGISTRY.gauge(
+    "bridge_asr_previews_waiting", "Upload previews waiting behind finished turns for the ASR engine.",
+    lambda: get_asr_queue().depth(PRIORITY_PREVIEW),
+)
+metrics.REGISTRY.gauge(
+    "bridge_turn_jobs_pending", "Stopped recordings whose transcription job has not finished.",
+    lambda: sum(s.jobs.pending() for s in list(_sessions.values())),
+)
+metrics.REGISTRY.gauge(
+    "bridge_requests_active", "Requests currently admitted to the bridge.",
+    lambda: admission.stats()["active"],
+)
+metrics.REGISTRY.gauge(
+    "bridge_requests_waiting", "Requests waiting in the admission queue.",
+    lambda: admission.stats()["waiting"],
+)
+metrics.REGISTRY.gauge(
+    "bridge_long_polls", "Turn-result and job-claim long-polls currently waiting.",
+    lambda: admission.stats()["long_polls"],
+)
+metrics.REGISTRY.gauge(
+    "bridge_requests_slow", "Requests that ran longer than the request timeout since start.",
+    lambda: admission.stats()["slow"],
+)
+metrics.REGISTRY.gauge(
+    "bridge_requests_rejected", "Requests refused with 429/503 since start (all reasons).",
+    lambda: sum(admission.stats()["rejected"].values()),
+)
+metrics.REGISTRY.gauge(
+    "bridge_push_streams", "Open robot push (SSE) streams.",
+    lambda: admission.stats()["streams"],
+)
+metrics.REGISTRY.gauge(
+    "bridge_journal_queue_depth", "Log records waiting for the journal writer.",
+    lambda: get_journal().stats()["queue_depth"],
+)
+metrics.REGISTRY.gauge(
+    "bridge_journal_write_latency_seconds_max", "Slowest enqueue-to-write journal latency so far.",
+    lambda: get_journal().stats()["write_latency_ms_max"] / 1000.0,
+)
+metrics.REGISTRY.gauge("process_resident_memory_bytes", "Resident set size.", metrics.process_rss_bytes)
+metrics.REGISTRY.gauge("process_uptime_seconds", "Seconds since the bridge process started.", metrics.process_uptime_sec)
+
+
+_sessions_dir = None
+_recorder_factory = None
+_robots = None
+_max_robots = BRIDGE_MAX_ROBOTS
+
+
+def configure(sessions_dir=None, recorder_factory=None, robots=None, max_robots=None):
+    """
+    Where new bridge sessions are created (default: SESSIONS_DIR), and
+    optionally recorder_factory(robot_name) -> a Recorder-like object
+    (start/stop/shutdown) used for /start–/stop instead of the host microphone.
+    robots replaces the configured robot names sessions may be opened for;
+    max_robots replaces BRIDGE_MAX_ROBOTS.
+    """
+    global _sessions_dir, _recorder_factory, _robots, _max_robots
+    _sessions_dir = sessions_dir
+    if recorder_factory is not None:
+        _recorder_factory = recorder_factory
+    if robots is not None:
+        _robots = set(robots)
+    if max_robots is not None:
+        _max_robots = int(max_robots)
+
+
+def _make_recorder(robot_name):
+    if _recorder_factory is not None:
+        return _recorder_factory(robot_name)
+    if BRIDGE_AUDIO_SOURCE != "recorder":
+        return SourceRecorder(source_from_spec(BRIDGE_AUDIO_SOURCE))
+    return Recorder(input_name=BRIDGE_ROBOT_AUDIO_INPUTS.get(robot_name))
+
+
+def _now_iso():
+    return now_iso()
+
+
+def _trace_from_request():
+    """Start a turn trace; a robot that sends traceparent on /start or the upload keeps its trace id."""
+    parsed = parse_traceparent(request.headers.get("traceparent"))
+    return TurnTrace(trace_id=parsed[0] if parsed else None)
+
+
+class BridgeSession:
+    """One robot's recorder, conversation session and bridge event log."""
+
+    def __init__(self, robot_name):
+        self.robot_name = robot_name
+        self.lock = threading.Lock()
+        self.is_listening = False
+        self.recording_started_at = None
+        self.trace = None
+
+        self.last_asr_wait_sec = None
+        self.convo = ConversationManager(
+            robot_enabled=True,
+            robot_name=robot_name,
+            transcriber=self._transcribe,
+            sessions_dir=_sessions_dir,
+        )
+        self._rec = None
+        self.uploads = {}
+        self.events_path = os.path.join(self.convo.session_dir, "bridge_events.jsonl")
+        self.jobs = TurnJobTable(name="turn-jobs-{}".format(robot_name))
+        self.push = PushChannel()
+        self.convo.add_job_listener(lambda job: self.push.publish("input_job", job))
+
+    @property
+    def rec(self):
+        # Opened on first /start, so robots that only upload never claim a host input device.
+        if self._rec is None:
+            self._rec = _make_recorder(self.robot_name)
+        return self._rec
+
+    def _transcribe(self, audio):
+        req = get_asr_queue().submit(audio, robot=self.robot_name)
+        text = req.result()
+        self.last_asr_wait_sec = req.wait_sec
+        _m_asr_wait_sec.labels(self.robot_name).observe(req.wait_sec)
+        return text
+
+    def write_event(self, payload):
+        try:
+            event = dict(payload or {})
+            event.setdefault("ts", _now_iso())
+            event.setdefault("robot", self.robot_name)
+            get_journal().append(self.events_path, event, ensure_ascii=False, sort_keys=True)
+        except Exception as e:
+            exc(TAG, e, "Failed to write bridge event")
+
+    def describe(self):
+        return {
+            "robot": self.robot_name,
+            "listening": self.is_listening,
+            "turn": self.convo.turn,
+            "pending_turn_jobs": self.jobs.pending(),
+            "turn_pipeline": self.jobs.stats(),
+            "open_uploads": len(self.uploads),
+            "push": self.push.stats(),
+            "session_dir": self.convo.session_dir,
+        }
+
+    def shutdown(self):
+        self.push.close()
+        if self._rec is not None:
+            self._rec.shutdown()
+        self.jobs.shutdown(wait=True)
+        if self.convo.robot_queue is not None:
+            self.convo.robot_queue.close()
+        self.convo.close()
+        get_journal().close_path(self.events_path)
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class UnknownRobot(LookupError):
+    pass
+
+
+class TooManyRobots(RuntimeError):
+    pass
+
+
+def _known_robots():
+    """Robot names sessions may be opened for; empty means any name."""
+    if _robots is not None:
+        return _robots
+    names = set(BRIDGE_ROBOTS) | set(BRIDGE_ROBOT_AUDIO_INPUTS)
+    if ROBOT_CONFIGURED:
+        names.add(DEFAULT_ROBOT_NAME)
+    return names
+
+
+def get_session(robot_name):
+    """
+    The robot's session, opened on first use. Raises UnknownRobot for names
+    outside the configured robots, and TooManyRobots once max_robots
+    sessions are open, so arbitrary path segments can't grow the registry.
+    """
+    with _sessions_lock:
+        session = _sessions.get(robot_name)
+        if session is None:
+            known = _known_robots()
+            if known and robot_name not in known:
+                raise UnknownRobot(robot_name)
+            if len(_sessions) >= _max_robots:
+                raise TooManyRobots(robot_name)
+            session = BridgeSession(robot_name)
+            _sessions[robot_name] = session
+            info(TAG, "Opened session for robot {}: {}".format(robot_name, session.convo.session_dir))
+        return session
+
+
+@app.errorhandler(UnknownRobot)
+def _unknown_robot(e):
+    return jsonify({"ok": False, "error": "unknown_robot", "robot": str(e.args[0])}), 404
+
+
+@app.errorhandler(TooManyRobots)
+def _too_many_robots(e):
+    return jsonify({"ok": False, "error": "too_many_robots", "robot": str(e.args[0]), "max_robots": _max_robots}), 503
+
+
+def _robot_from_request(robot=None):
+    if robot:
+        return robot
+    body = request.get_json(silent=True) or {}
+    return request.args.get("robot") or body.get("robot") or DEFAULT_ROBOT_NAME
+
+
+def _no_robot_response():
+    return jsonify({"ok": False, "error": "robot_required"}), 400
 
 
 @app.post("/start")
-def start():
-    global _is_listening, _recording_started_at
-    with _lock:
-        if _is_listening:
-            _write_bridge_event({"event": "start_already_listening"})
-            return jsonify({"ok": True, "already": True})
-        _is_listening = True
-        _recording_started_at = _now_iso()
-        rec.start()
-    debug(TAG, "Recording started via /start")
-    _write_bridge_event({
-        "event": "recording_started",
-        "recording_started_at": _recording_started_at,
-        "session_dir": convo.session_dir,
-    })
-    return jsonify({"ok": True})
+@app.post("/robots/<robot>/start")
+def start(robot=None):
+    robot = _robot_from_request(robot)
+    if not robot:
+        return _no_robot_response()
+    session = get_session(robot)
+    with profile_section(session.convo.session_dir, "bridge_start_{:03d}".format(session.convo.turn + 1)):
+        return _start(session)
+
+
+def _start(session):
+    robot = session.robot_name
+    with session.lock:
+        if session.is_listening:
+            session.write_event({"event": "start_already_listening"})
+            return jsonify({"ok": True, "already": True, "robot": robot})
+        session.is_listening = True
+        trace = session.trace = _trace_from_request()
+        session.recording_started_at = recording_started_at = trace.started_at
+        session.rec.start()
+    _m_started.labels(robot).inc()
+    debug(TAG, "Recording started via /start for {}".format(robot))
+    session.write_event(dict(
+        trace.fields(),
+        event="recording_started",
+        recording_started_at=recording_started_at,
+        session_dir=session.convo.session_dir,
+    ))
+    return jsonify({"ok": True, "robot": robot, "trace_id": trace.trace_id, "traceparent": trace.traceparent()})
+
+
+def _wants_sync():
+    value = request.args.get("sync")
+    if value is None:
+        value = (request.get_json(silent=True) or {}).get("sync")
+    if value is None:
+        return BRIDGE_SYNC_STOP
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
 
 @app.post("/stop")
-def stop():
-    global _is_listening, _recording_started_at
-    with _lock:
-        if not _is_listening:
-            _write_bridge_event({"event": "stop_not_listening"})
-            return jsonify({"ok": False, "error": "not_listening"}), 400
-        _is_listening = False
-        recording_started_at = _recording_started_at
-        _recording_started_at = None
-
-    audio = rec.stop()
-    turn_id, text = convo.transcribe_only(audio, recording_started_at=recording_started_at)  # writes the input job to outbox already
-    _write_bridge_event({
+@app.post("/robots/<robot>/stop")
+def stop(robot=None):
+    released_at = time.monotonic()
+    robot = _robot_from_request(robot)
+    if not robot:
+        return _no_robot_response()
+    session = get_session(robot)
+    with profile_section(session.convo.session_dir, "bridge_stop_{:03d}".format(session.convo.turn + 1)):
+        return _stop(session, released_at, sync=_wants_sync())
+
+
+def _stop(session, released_at, sync=False):
+    robot = session.robot_name
+    convo = session.convo
+
+    with session.lock:
+        if not session.is_listening:
+            session.write_event({"event": "stop_not_listening"})
+            return jsonify({"ok": False, "error": "not_listening", "robot": robot}), 400
+        session.is_listening = False
+        recording_started_at = session.recording_started_at
+        trace = session.trace
+        session.recording_started_at = None
+        session.trace = None
+        audio = session.rec.stop()
+        turn_id = convo.allocate_turn()
+
+    return _queue_turn(session, turn_id, audio, recording_started_at, released_at, sync=sync, trace=trace)
+
+
+def _queue_turn(session, turn_id, audio, recording_started_at, released_at, sync=False, source="recorder",
+                trace=None):
+    robot = session.robot_name
+    convo = session.convo
+    trace = trace or TurnTrace()
+
+    def run():
+        return _transcribe_turn(session, turn_id, audio, recording_started_at, released_at, source=source,
+                                trace=trace)
+
+    # Sync requests still go through the session's job queue so turns are
+    # transcribed (and handed to the robot) in order.
+    job = session.jobs.submit(turn_id, run)
+    if sync:
+        if not job.wait(BRIDGE_REQUEST_TIMEOUT_SEC):
+            return jsonify({
+                "ok": False,
+                "error": "timeout",
+                "robot": robot,
+                "turn_id": int(turn_id),
+                "result_url": "/robots/{}/turns/{}".format(robot, int(turn_id)),
+            }), 504
+        if job.status != STATUS_DONE:
+            return jsonify({"ok": False, "error": job.error, "robot": robot, "turn_id": int(turn_id)}), 500
+        return jsonify(dict(job.result, ok=True))
+
+    session.write_event(dict(
+        trace.fields(),
+        event="transcription_queued",
+        turn_id=int(turn_id),
+        recording_started_at=recording_started_at,
+        source=source,
+    ))
+    return jsonify({
+        "ok": True,
+        "robot": robot,
+        "turn_id": int(turn_id),
+        "trace_id": trace.trace_id,
+        "status": "queued",
+        "result_url": "/robots/{}/turns/{}".format(robot, int(turn_id)),
+        "session_dir": convo.session_dir,
+        "to_robot_dir": convo.to_robot_dir,
+        "from_robot_dir": convo.from_robot_dir,
+    }), 202
+
+
+def _transcribe_turn(session, turn_id, audio, recording_started_at, released_at, source="recorder", trace=None):
+    robot = session.robot_name
+    convo = session.convo
+
+    session.last_asr_wait_sec = None
+    transcribe_t0 = time.monotonic()
+    turn_id, text = convo.transcribe_only(
+        audio,
+        recording_started_at=recording_started_at,
+        released_at=released_at,
+        turn_id=turn_id,
+        trace=trace,
+    )  # writes the input job to outbox already
+
+    if source == "upload":
+        _m_upload_to_transcript_sec.labels(robot).observe(time.monotonic() - released_at)
+    else:
+        _m_stopped.labels(robot).inc()
+    _m_transcribe_sec.labels(robot).observe(time.monotonic() - transcribe_t0)
+    _m_audio_sec.labels(robot).inc(float(len(audio)) / float(SAMPLE_RATE))
+    if not (text or "").strip():
+        _m_empty.labels(robot).inc()
+    session.write_event({
         "event": "recording_stopped",
+        "trace_id": trace.trace_id if trace else None,
+        "span_id": trace.span_id if trace else None,
         "recording_started_at": recording_started_at,
         "recording_stopped_at": _now_iso(),
         "turn_id": int(turn_id),
         "transcript_nonempty": bool((text or "").strip()),
         "transcript": text or "",
+        "asr_queue_wait_sec": session.last_asr_wait_sec,
+        "release_to_transcript_sec": round(time.monotonic() - released_at, 4),
+        "source": source,
         "session_dir": convo.session_dir,
         "to_robot_dir": convo.to_robot_dir,
         "from_robot_dir": convo.from_robot_dir,
     })
+    get_journal().end_turn(session.events_path)
+
+    return {
+        "robot": robot,
+        "turn_id": int(turn_id),
+        "trace_id": trace.trace_id if trace else None,
+        "transcript": text or "",
+        "session_dir": convo.session_dir,
+        "to_robot_dir": convo.to_robot_dir,
+        "from_robot_dir": convo.from_robot_dir,
+    }
+
+
+# ---------------------------------------------------------
+# Robot-recorded audio uploads
+# ---------------------------------------------------------
+def _truthy(value):
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _get_upload(robot, upload_id):
+    with _sessions_lock:
+        session = _sessions.get(robot)
+    if session is None:
+        return None, None
+    with session.lock:
+        return session, session.uploads.get(upload_id)
 
+
+def _unknown_upload(robot, upload_id):
+    return jsonify({"ok": False, "error": "unknown_upload", "robot": robot, "upload_id": upload_id}), 404
+
+
+@app.post("/uploads")
+@app.post("/robots/<robot>/uploads")
+def create_upload(robot=None):
+    """
+    Open an upload for one turn. JSON body: format (s16le, f32le, wav or a
+    compressed container such as ogg), sample_rate for raw PCM, and
+    partial=true to transcribe previews while chunks arrive.
+    """
+    robot = _robot_from_request(robot)
+    if not robot:
+        return _no_robot_response()
+    body = request.get_json(silent=True) or {}
+    fmt = str(body.get("format") or request.args.get("format") or "s16le").lower()
+    trace = _trace_from_request()
+    try:
+        sample_rate = int(body.get("sample_rate") or request.args.get("sample_rate") or SAMPLE_RATE)
+        upload = AudioUpload(
+            uuid.uuid4().hex[:12],
+            fmt=fmt,
+            sample_rate=sample_rate,
+            max_sec=BRIDGE_UPLOAD_MAX_SEC,
+            partial=_truthy(body.get("partial") or request.args.get("partial") or "0"),
+            recording_started_at=trace.started_at,
+            trace=trace,
+        )
+    except ValueError as e:
+        return jsonify({"ok": False, "error": "bad_upload", "detail": str(e), "formats": list(UPLOAD_FORMATS)}), 400
+
+    _start_upload_sweeper()
+    _sweep_idle_uploads()
+    session = get_session(robot)
+    with session.lock:
+        if len(session.uploads) >= BRIDGE_MAX_UPLOADS_PER_ROBOT:
+            open_ids = sorted(session.uploads)
+        else:
+            open_ids = None
+            session.uploads[upload.upload_id] = upload
+    if open_ids is not None:
+        return jsonify({
+            "ok": False, "error": "too_many_uploads", "robot": robot,
+            "max_uploads": BRIDGE_MAX_UPLOADS_PER_ROBOT, "open_uploads": open_ids,
+        }), 429
+    session.write_event(dict(trace.fields(), event="upload_opened", upload_id=upload.upload_id, format=fmt))
+    prefix = "/robots/{}/uploads/{}".format(robot, upload.upload_id)
+    return jsonify({
+        "ok": True,
+        "robot": robot,
+        "upload_id": upload.upload_id,
+        "trace_id": trace.trace_id,
+        "traceparent": trace.traceparent(),
+        "chunks_url": prefix + "/chunks",
+        "finish_url": prefix + "/finish",
+    }), 201
+
+
+@app.post("/robots/<robot>/uploads/<upload_id>/chunks")
+def upload_chunks(robot, upload_id):
+    """
+    Append the request body to the upload. The body is read in blocks, so one
+    long chunked-transfer request can stream a whole utterance; add ?finish=1
+    to queue the turn as soon as the body ends. ?offset=N (bytes) makes a
+    retried POST safe: a chunk that doesn't start where the upload ends is
+    refused with 409 and the expected offset.
+    """
+    session, upload = _get_upload(robot, upload_id)
+    if upload is None:
+        return _unknown_upload(robot, upload_id)
+    try:
+        offset = request.args.get("offset")
+        offset = None if offset in (None, "") else int(offset)
+    except ValueError:
+        return jsonify({"ok": False, "error": "bad_offset", "detail": "offset must be an integer"}), 400
+
+    stream = request.stream
+    try:
+        while True:
+            block = stream.read(UPLOAD_READ_BYTES)
+            if not block:
+                break
+            upload.append(block, offset=offset)
+            if offset is not None:
+                offset += len(block)
+            _m_upload_bytes.labels(robot).inc(len(block))
+            _maybe_partial(session, upload)
+    except UploadTooLarge as e:
+        _discard_upload(session, upload, "too_large")
+        return jsonify({"ok": False, "error": "upload_too_large", "detail": str(e)}), 413
+    except ChunkOffsetMismatch as e:
+        return jsonify({
+            "ok": False, "error": "offset_mismatch", "detail": str(e),
+            "offset": e.offset, "expected_offset": e.expected,
+        }), 409
+    except ValueError as e:
+        return jsonify({"ok": False, "error": "bad_chunk", "detail": str(e)}), 409
+
+    if _truthy(request.args.get("finish") or "0"):
+        return _finish_upload(session, upload, time.monotonic(), sync=_wants_sync())
+    return jsonify(dict(upload.describe(), ok=True, robot=robot))
+
+
+@app.post("/robots/<robot>/uploads/<upload_id>/finish")
+def finish_upload(robot, upload_id):
+    released_at = time.monotonic()
+    session, upload = _get_upload(robot, upload_id)
+    if upload is None:
+        return _unknown_upload(robot, upload_id)
+    return _finish_upload(session, upload, released_at, sync=_wants_sync())
+
+
+@app.get("/robots/<robot>/uploads/<upload_id>")
+def upload_status(robot, upload_id):
+    _, upload = _get_upload(robot, upload_id)
+    if upload is None:
+        return _unknown_upload(robot, upload_id)
+    return jsonify(dict(upload.describe(), ok=True, robot=robot))
+
+
+@app.delete("/robots/<robot>/uploads/<upload_id>")
+def delete_upload(robot, upload_id):
+    """Abandon an upload: its buffer is freed and no turn is queued."""
+    session, upload = _get_upload(robot, upload_id)
+    if upload is None:
+        return _unknown_upload(robot, upload_id)
+    _discard_upload(session, upload, "deleted")
+    return jsonify({"ok": True, "robot": robot, "upload_id": upload_id, "discarded": True})
+
+
+def _discard_upload(session, upload, reason=None):
+    with session.lock:
+        removed = session.uploads.pop(upload.upload_id, None) is upload
+    upload.discard()
+    if removed and reason is not None:
+        _m_upload_discarded.labels(session.robot_name, reason).inc()
+        session.write_event({
+            "event": "upload_discarded",
+            "upload_id": upload.upload_id,
+            "reason": reason,
+            "bytes_received": upload.bytes_received,
+            "idle_sec": round(upload.idle_sec(), 3),
+        })
+
+
+def _sweep_idle_uploads(now=None):
+    """Drop uploads that received nothing for BRIDGE_UPLOAD_IDLE_TTL_SEC."""
+    now = time.monotonic() if now is None else now
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+    for session in sessions:
+        with session.lock:
+            stale = [u for u in session.uploads.values() if u.idle_sec(now) > BRIDGE_UPLOAD_IDLE_TTL_SEC]
+        for upload in stale:
+            debug(TAG, "Upload {} for {} idle for {:.0f}s; dropping", upload.upload_id, session.robot_name,
+                  upload.idle_sec(now))
+            _discard_upload(session, upload, "expired")
+
+
+_upload_sweeper = None
+_upload_sweeper_lock = threading.Lock()
+
+
+def _start_upload_sweeper():
+    """Started with the first upload, so robots that vanish mid-upload don't pin their buffers."""
+    global _upload_sweeper
+    if _upload_sweeper is not None:
+        return
+    with _upload_sweeper_lock:
+        if _upload_sweeper is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(max(1.0, BRIDGE_UPLOAD_IDLE_TTL_SEC / 4.0))
+                try:
+                    _sweep_idle_uploads()
+                except Exception as e:
+                    exc(TAG, e, "Upload sweep failed")
+
+        _upload_sweeper = threading.Thread(target=run, name="upload-sweeper", daemon=True)
+        _upload_sweeper.start()
+
+
+def _finish_upload(session, upload, released_at, sync=False):
+    try:
+        audio = upload.finish()
+    except UploadDiscarded:
+        # Deleted or expired between the lookup and the finish: nothing to queue.
+        return _unknown_upload(session.robot_name, upload.upload_id)
+    except Exception as e:
+        _discard_upload(session, upload)
+        exc(TAG, e, "Failed to decode upload {}".format(upload.upload_id))
+        return jsonify({"ok": False, "error": "decode_failed", "detail": repr(e)}), 400
+
+    with session.lock:
+        session.uploads.pop(upload.upload_id, None)
+        turn_id = session.convo.allocate_turn()
+    session.write_event({
+        "event": "upload_finished",
+        "trace_id": upload.trace.trace_id if upload.trace else None,
+        "upload_id": upload.upload_id,
+        "turn_id": int(turn_id),
+        "bytes_received": upload.bytes_received,
+        "chunks_received": upload.chunks_received,
+        "upload_sec": round(released_at - upload.created_at, 4),
+        "partial_transcript": upload.partial_text,
+    })
+    return _queue_turn(
+        session, turn_id, audio, upload.recording_started_at, released_at, sync=sync, source="upload",
+        trace=upload.trace,
+    )
+
+
+def _maybe_partial(session, upload):
+    """
+    Queue a preview decode of what has arrived so far, at most one at a time
+    per upload. Previews wait behind every finished turn on the shared ASR
+    workers and complete through a callback there; one still queued when the
+    upload finishes or is discarded is dropped.
+    """
+    if not upload.partial or upload.partial_in_flight:
+        return
+    if upload.samples - upload.partial_samples < BRIDGE_UPLOAD_PARTIAL_EVERY_SEC * upload.sample_rate:
+        return
+    upload.partial_in_flight = True
+    upload.partial_samples = upload.samples
+    # The view stays valid after the buffer grows; appends only write past it.
+    audio = resample(upload.view(), upload.sample_rate)
+    robot = session.robot_name
+
+    def done(req):
+        upload.partial_in_flight = False
+        if req.cancelled:
+            _m_previews.labels(robot, "cancelled").inc()
+            return
+        if req.error is not None:
+            _m_previews.labels(robot, "failed").inc()
+            return
+        upload.partial_text = (req.text or "").strip()
+        _m_previews.labels(robot, "done").inc()
+        _m_preview_sec.labels(robot).observe(req.finished_at - req.enqueued_at)
+
+    upload.partial_request = get_asr_queue().submit(audio, robot=robot, priority=PRIORITY_PREVIEW, on_done=done)
+
+
+@app.get("/turns/<int:turn_id>")
+@app.get("/robots/<robot>/turns/<int:turn_id>")
+def turn_status(turn_id, robot=None):
+    """Transcription job status; ?wait=N long-polls up to N seconds for the result."""
+    robot = _robot_from_request(robot)
+    if not robot:
+        return _no_robot_response()
+    with _sessions_lock:
+        session = _sessions.get(robot)
+    job = session.jobs.get(turn_id) if session is not None else None
+    if job is None:
+        return jsonify({"ok": False, "error": "unknown_turn", "robot": robot, "turn_id": turn_id}), 404
+
+    try:
+        wait_sec = min(MAX_TURN_WAIT_SEC, BRIDGE_REQUEST_TIMEOUT_SEC, max(0.0, float(request.args.get("wait") or 0)))
+    except ValueError:
+        wait_sec = 0.0
+    if wait_sec > 0:
+        job.wait(wait_sec)
+
+    body = dict(job.describe(), robot=robot)
+    if job.status == STATUS_DONE:
+        return jsonify(dict(body, ok=True))
+    if job.status == STATUS_ERROR:
+        return jsonify(dict(body, ok=False)), 500
+    return jsonify(dict(body, ok=True)), 202
+
+
+# ---------------------------------------------------------
+# Robot job queue (VOICE_LLM_CHAT_ROBOT_QUEUE=sqlite)
+# ---------------------------------------------------------
+def _job_queue(robot):
+    queue = get_session(robot).convo.robot_queue
+    if getattr(queue, "backend", None) != "sqlite":
+        return None, (jsonify({"ok": False, "error": "queue_backend_files", "robot": robot}), 409)
+    return queue, None
+
+
+@app.get("/robots/<robot>/jobs")
+def robot_jobs(robot):
+    queue, err = _job_queue(robot)
+    if err:
+        return err
+    return jsonify({"ok": True, "robot": robot, "stats": queue.stats(), "pending": queue.pending()})
+
+
+@app.post("/robots/<robot>/jobs/claim")
+def robot_jobs_claim(robot):
+    """Claim the oldest job; ?wait=N long-polls. JSON body may set consumer and visibility_sec."""
+    queue, err = _job_queue(robot)
+    if err:
+        return err
+    body = request.get_json(silent=True) or {}
+    try:
+        wait_sec = min(MAX_TURN_WAIT_SEC, BRIDGE_REQUEST_TIMEOUT_SEC, max(0.0, float(request.args.get("wait") or 0)))
+        visibility_sec = body.get("visibility_sec")
+        visibility_sec = None if visibility_sec is None else float(visibility_sec)
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "bad_claim"}), 400
+    claimed = queue.claim(consumer=body.get("consumer"), visibility_sec=visibility_sec, wait_sec=wait_sec)
+    if claimed is None:
+        return "", 204
+    return jsonify(dict(claimed, ok=True, robot=robot))
+
+
+@app.post("/robots/<robot>/jobs/<int:job_id>/ack")
+def robot_jobs_ack(robot, job_id):
+    queue, err = _job_queue(robot)
+    if err:
+        return err
+    token = (request.get_json(silent=True) or {}).get("claim_token")
+    if not queue.ack(job_id, token):
+        return jsonify({"ok": False, "error": "stale_claim", "job_id": job_id}), 409
+    return jsonify({"ok": True, "job_id": job_id})
+
+
+@app.post("/robots/<robot>/jobs/<int:job_id>/release")
+def robot_jobs_release(robot, job_id):
+    queue, err = _job_queue(robot)
+    if err:
+        return err
+    token = (request.get_json(silent=True) or {}).get("claim_token")
+    if not queue.release(job_id, token):
+        return jsonify({"ok": False, "error": "stale_claim", "job_id": job_id}), 409
+    return jsonify({"ok": True, "job_id": job_id})
+
+
+@app.post("/robots/<robot>/jobs/<int:job_id>/complete")
+def robot_jobs_complete(robot, job_id):
+    """JSON body: claim_token and result (the same object a robot writes to turn_NNNN_output.json)."""
+    queue, err = _job_queue(robot)
+    if err:
+        return err
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body.get("result"), dict):
+        return jsonify({"ok": False, "error": "result_required"}), 400
+    if not body.get("claim_token"):
+        return jsonify({"ok": False, "error": "claim_token_required"}), 400
+    if not queue.complete(job_id, body["result"], claim_token=body["claim_token"]):
+        return jsonify({"ok": False, "error": "stale_claim", "job_id": job_id}), 409
+    return jsonify({"ok": True, "job_id": job_id})
+
+
+# ---------------------------------------------------------
+# Push channel (SSE)
+# ---------------------------------------------------------
+def _sse(event):
+    return "id: {}\nevent: {}\ndata: {}\n\n".format(
+        event.seq, event.kind, json.dumps(event.data, ensure_ascii=False, separators=(",", ":"))
+    )
+
+
+@app.get("/robots/<robot>/events")
+def robot_events(robot):
+    """
+    Server-sent events: each input job as it is written. Resumes after
+    Last-Event-ID or ?since=N; with neither, replays everything not yet acked.
+    """
+    session = get_session(robot)
+    push = session.push
+    try:
+        since = int(request.headers.get("Last-Event-ID") or request.args.get("since") or push.acked_seq)
+    except ValueError:
+        since = push.acked_seq
+
+    def stream():
+        push.subscribe()
+        last = since
+        try:
+            yield "retry: 2000\n\n"
+            while not push.closed:
+                events, missed = push.events_after(last, timeout=PUSH_KEEPALIVE_SEC)
+                if missed:
+                    # Older jobs have left the replay buffer; the robot reads them from the inbox.
+                    yield "event: replay_gap\ndata: {}\n\n".format(json.dumps({"first": missed[0], "last": missed[1]}))
+                    last = max(last, missed[1])
+                if not events:
+                    yield ": keepalive\n\n"
+                    continue
+                for event in events:
+                    push.mark_sent(event)
+                    yield _sse(event)
+                    last = event.seq
+        finally:
+            push.unsubscribe()
+
+    session.write_event({"event": "push_subscribed", "since": since})
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/robots/<robot>/events/ack")
+def robot_events_ack(robot):
+    """Cumulative ack: JSON {"seq": N} acknowledges every event up to N."""
+    session = get_session(robot)
+    body = request.get_json(silent=True) or {}
+    try:
+        seq = int(body.get("seq", request.args.get("seq")))
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "seq_required"}), 400
+
+    for event in session.push.ack(seq):
+        if event.kind != "input_job":
+            continue
+        to_ack = event.acked_at - event.published_at
+        _m_push_ack_sec.labels(robot).observe(to_ack)
+        session.write_event({
+            "event": "push_acked",
+            "seq": event.seq,
+            "turn_id": event.data.get("turn_id"),
+            "trace_id": event.data.get("trace_id"),
+            "span_id": event.data.get("span_id"),
+            "job_to_send_sec": None if event.sent_at is None else round(event.sent_at - event.published_at, 4),
+            "job_to_ack_sec": round(to_ack, 4),
+        })
+        debug(TAG, "Robot {} acked turn {} {:.1f} ms after the job was written".format(
+            robot, event.data.get("turn_id"), to_ack * 1000.0
+        ))
+    return jsonify({"ok": True, "robot": robot, "acked_seq": session.push.acked_seq})
+
+
+def close_streams():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.push.close()
+
+
+@app.get("/sessions")
+def sessions():
+    with _sessions_lock:
+        described = [s.describe() for s in _sessions.values()]
     return jsonify({
-    "ok": True,
-    "turn_id": int(turn_id),
-    "transcript": text or "",
-    "session_dir": convo.session_dir,
-    "to_robot_dir": convo.to_robot_dir,
-    "from_robot_dir": convo.from_robot_dir,
+        "ok": True,
+        "sessions": described,
+        "asr": get_asr_queue().stats(),
+        "admission": admission.stats(),
     })
 
 
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype=None, content_type=metrics.CONTENT_TYPE)
+
+
+def shutdown():
+    with _sessions_lock:
+        for session in _sessions.values():
+            try:
+                session.shutdown()
+            except Exception as e:
+                exc(TAG, e, "Failed to shut down session for {}".format(session.robot_name))
+    get_journal().close()
+
+
 if __name__ == "__main__":
+    logger.start()
+    # Warm the shared ASR model in the background so the first /stop doesn't pay for it.
+    threading.Thread(target=asr_whisper.warm, name="asr-warm", daemon=True).start()
+    if ROBOT_CONFIGURED:
+        get_session(DEFAULT_ROBOT_NAME)
+    if SESSION_ARCHIVE_AFTER_DAYS is not None:
+        threading.Thread(target=apply_retention, name="session-retention", daemon=True).start()
+
     # Listen on LAN so the robot can hit it
     if os.getenv("BRIDGE_VERBOSE", "0") != "1":
         logging.getLogger("werkzeug").setLevel(logging.ERROR)
-    app.run(host="0.0.0.0", port=5055, threaded=True)
+    if BRIDGE_SERVER == "waitress":
+        try:
+            # Admission control bounds the app itself; the extra threads let
+            # queued requests wait and /metrics answer while saturated.
+            serve_waitress(
+                app,
+                admission,
+                host="0.0.0.0",
+                port=5055,
+                threads=BRIDGE_WORKERS + BRIDGE_MAX_QUEUE + BRIDGE_MAX_STREAMS + BRIDGE_MAX_LONG_POLLS + 2,
+                channel_timeout_sec=BRIDGE_REQUEST_TIMEOUT_SEC,
+                connection_limit=4 * (BRIDGE_WORKERS + BRIDGE_MAX_QUEUE) + BRIDGE_MAX_STREAMS + BRIDGE_MAX_LONG_POLLS,
+                drain_timeout_sec=BRIDGE_DRAIN_TIMEOUT_SEC,
+                on_drain=close_streams,
+                on_shutdown=shutdown,
+            )
+            raise SystemExit(0)
+        except ImportError:
+            error(TAG, "waitress is not installed (pip install waitress); falling back to the Flask dev server")
+    try:
+        app.run(host="0.0.0.0", port=5055, threaded=True)
+    finally:
+        close_streams()
+        admission.drain(BRIDGE_DRAIN_TIMEOUT_SEC)
+        shutdown()
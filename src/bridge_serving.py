@@ -0,0 +1,293 @@
+import _thread
+import json
+import signal
+import threading
+import time
+
+from src.logger import debug, error, info
+
+TAG = "SERVE"
+
+# Always served, even when saturated or draining, so operators can see why.
+DEFAULT_EXEMPT_PATHS = ("/metrics",)
+
+
+class _StreamBody:
+    """Passes a streaming app_iter through and frees its slot when the server closes it."""
+
+    def __init__(self, app_iter, on_close):
+        self._app_iter = app_iter
+        self._on_close = on_close
+
+    def __iter__(self):
+        return iter(self._app_iter)
+
+    def close(self):
+        try:
+            close = getattr(self._app_iter, "close", None)
+            if close is not None:
+                close()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close is not None:
+                on_close()
+
+
+class AdmissionController:
+    """
+    WSGI middleware bounding how many requests run the app at once.
+
+    Up to `max_active` requests run concurrently; up to `max_queue` more wait
+    (at most `queue_timeout_sec`) for a slot. Anything beyond that is refused
+    with 429, a wait that times out gets 503, and once drain() has started
+    every new request gets 503. All refusals carry Retry-After.
+
+    Long-lived streams (requests matching `is_stream`) don't take a worker
+    slot; at most `max_streams` of them are open at once. Likewise long-polls
+    (requests matching `is_long_poll`) wait on their own pool of
+    `max_long_polls` slots, so robots parked on a poll can't starve
+    /start and /stop; a full pool answers 429 straight away.
+
+    Handler run time is not enforced (a WSGI thread can't be interrupted
+    safely): handlers bound their own waits, and any worker-slot request
+    running longer than `slow_request_sec` is counted and logged.
+    """
+
+    def __init__(self, app, max_active=8, max_queue=16, queue_timeout_sec=5.0,
+                 retry_after_sec=1, exempt_paths=DEFAULT_EXEMPT_PATHS, is_stream=None, max_streams=16,
+                 is_long_poll=None, max_long_polls=32, slow_request_sec=None):
+        self.app = app
+        self.max_active = max(1, int(max_active))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout_sec = float(queue_timeout_sec)
+        self.retry_after_sec = int(retry_after_sec)
+        self.exempt_paths = tuple(exempt_paths)
+        self.is_stream = is_stream
+        self.max_streams = max(0, int(max_streams))
+        self.is_long_poll = is_long_poll
+        self.max_long_polls = max(0, int(max_long_polls))
+        self.slow_request_sec = slow_request_sec
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._streams = 0
+        self._long_polls = 0
+        self._draining = False
+        self.admitted = 0
+        self.slow = 0
+        self.rejected = {"queue_full": 0, "queue_timeout": 0, "draining": 0, "streams_full": 0, "long_polls_full": 0}
+
+    # ---------------------------------------------------------
+    # Admission
+    # ---------------------------------------------------------
+    def _acquire(self):
+        """Returns None once admitted, otherwise the rejection reason."""
+        with self._cond:
+            if self._draining:
+                return "draining"
+            if self._active < self.max_active and self._waiting == 0:
+                self._active += 1
+                return None
+            if self._waiting >= self.max_queue:
+                return "queue_full"
+            self._waiting += 1
+            deadline = time.monotonic() + self.queue_timeout_sec
+            try:
+                while self._active >= self.max_active and not self._draining:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return "queue_timeout"
+                    self._cond.wait(remaining)
+                if self._draining:
+                    return "draining"
+                self._active += 1
+                return None
+            finally:
+                self._waiting -= 1
+
+    def _release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _reject(self, reason, start_response):
+        with self._cond:
+            self.rejected[reason] += 1
+        status = ("429 Too Many Requests" if reason in ("queue_full", "streams_full", "long_polls_full")
+                  else "503 Service Unavailable")
+        body = json.dumps({"ok": False, "error": "overloaded" if reason != "draining" else "draining",
+                           "reason": reason}).encode("utf-8")
+        start_response(status, [
+            ("Content-Type", "application/json"),
+            ("Content-Length", str(len(body))),
+            ("Retry-After", str(self.retry_after_sec)),
+        ])
+        return [body]
+
+    def _acquire_stream(self):
+        with self._cond:
+            if self._draining:
+                return "draining"
+            if self._streams >= self.max_streams:
+                return "streams_full"
+            self._streams += 1
+            return None
+
+    def _release_stream(self):
+        with self._cond:
+            self._streams -= 1
+
+    def _acquire_long_poll(self):
+        with self._cond:
+            if self._draining:
+                return "draining"
+            if self._long_polls >= self.max_long_polls:
+                return "long_polls_full"
+            self._long_polls += 1
+            return None
+
+    def _release_long_poll(self):
+        with self._cond:
+            self._long_polls -= 1
+            self._cond.notify_all()
+
+    def _run(self, environ, start_response, release, slow_after=None):
+        t0 = time.monotonic()
+        with self._cond:
+            self.admitted += 1
+        try:
+            # The bridge's responses are small JSON bodies, so materialise them
+            # here and free the slot before the server writes to the socket.
+            # close() is the WSGI end of the response (Flask teardown, call_on_close).
+            body = self.app(environ, start_response)
+            try:
+                return list(body)
+            finally:
+                close = getattr(body, "close", None)
+                if close is not None:
+                    close()
+        finally:
+            release()
+            elapsed = time.monotonic() - t0
+            if slow_after is not None and elapsed > slow_after:
+                with self._cond:
+                    self.slow += 1
+                error(TAG, "Slow request: {} {} took {:.1f}s".format(
+                    environ.get("REQUEST_METHOD"), environ.get("PATH_INFO"), elapsed
+                ))
+
+    def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO", "") in self.exempt_paths:
+            return self.app(environ, start_response)
+
+        if self.is_stream is not None and self.is_stream(environ):
+            reason = self._acquire_stream()
+            if reason is not None:
+                return self._reject(reason, start_response)
+            try:
+                return _StreamBody(self.app(environ, start_response), self._release_stream)
+            except Exception:
+                self._release_stream()
+                raise
+
+        long_poll = self.is_long_poll is not None and self.is_long_poll(environ)
+        reason = self._acquire_long_poll() if long_poll else self._acquire()
+        if reason is not None:
+            debug(TAG, "Rejected {} {} ({})".format(environ.get("REQUEST_METHOD"), environ.get("PATH_INFO"), reason))
+            return self._reject(reason, start_response)
+        if long_poll:
+            # Long-polls wait by design; their wait is clamped by the handler.
+            return self._run(environ, start_response, self._release_long_poll)
+        return self._run(environ, start_response, self._release, slow_after=self.slow_request_sec)
+
+    # ---------------------------------------------------------
+    # Drain
+    # ---------------------------------------------------------
+    def begin_drain(self):
+        """Refuse new requests from now on; running and queued ones are unaffected."""
+        with self._cond:
+            self._draining = True
+            self._cond.notify_all()
+
+    def wait_idle(self, timeout_sec=15.0):
+        """Wait for running requests (long-polls included) to finish. Returns True if none are left."""
+        deadline = time.monotonic() + float(timeout_sec)
+        with self._cond:
+            while self._active > 0 or self._long_polls > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def drain(self, timeout_sec=15.0):
+        self.begin_drain()
+        return self.wait_idle(timeout_sec)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": self._active,
+                "waiting": self._waiting,
+                "streams": self._streams,
+                "long_polls": self._long_polls,
+                "max_long_polls": self.max_long_polls,
+                "slow": self.slow,
+                "max_active": self.max_active,
+                "max_queue": self.max_queue,
+                "draining": self._draining,
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+            }
+
+
+def serve_waitress(wsgi_app, admission, host, port, threads, channel_timeout_sec, connection_limit,
+                   drain_timeout_sec=15.0, on_drain=None, on_shutdown=None):
+    """
+    Run `wsgi_app` under waitress. The first SIGINT/SIGTERM starts a graceful
+    drain: new requests get 503, running ones finish (up to drain_timeout_sec)
+    and their responses are flushed before the server loop stops and
+    on_shutdown() runs. on_drain() runs when the drain starts, e.g. to end
+    open streams. A second signal stops immediately.
+    Raises ImportError when waitress is not installed.
+    """
+    from waitress import create_server
+
+    server = create_server(
+        wsgi_app,
+        host=host,
+        port=port,
+        threads=threads,
+        channel_timeout=int(channel_timeout_sec),
+        connection_limit=connection_limit,
+        ident="voice-llm-chat-bridge",
+    )
+
+    def _finish_drain():
+        if not admission.wait_idle(drain_timeout_sec):
+            error(TAG, "Drain timed out after {:.1f}s with requests still running".format(drain_timeout_sec))
+        # Let the server loop write the last responses before it stops.
+        time.sleep(server.adj.asyncore_loop_timeout + 0.1)
+        # Delivered to _on_signal on the main thread, which now raises.
+        _thread.interrupt_main()
+
+    def _on_signal(signum, frame):
+        if admission.stats()["draining"]:
+            raise KeyboardInterrupt
+        info(TAG, "Signal {} received; draining".format(signum))
+        admission.begin_drain()
+        if on_drain is not None:
+            on_drain()
+        threading.Thread(target=_finish_drain, name="bridge-drain", daemon=True).start()
+
+    signal.signal(signal.SIGTERM, _on_signal)
+    signal.signal(signal.SIGINT, _on_signal)
+
+    info(TAG, "Serving on http://{}:{} with {} threads".format(host, port, threads))
+    try:
+        # Returns after KeyboardInterrupt, once waitress has stopped its worker threads.
+        server.run()
+    finally:
+        if on_shutdown is not None:
+            on_shutdown()
@@ -1,6 +1,7 @@
 import os
 import json
-import time
+import socket
+import threading
 import numpy as np
 from datetime import datetime
 
@@ -13,36 +14,46 @@ from config import (
     ROBOT_DONE_TIMEOUT_SEC,
     ROBOT_INBOX_DIRNAME,
     DEFAULT_ROBOT_NAME,
+    FALLBACK_REPLY,
     ROBOT_CHAT_ENABLED,
+    ROBOT_QUEUE_BACKEND,
+    ROBOT_QUEUE_EXPORT_FILES,
+    ROBOT_QUEUE_VISIBILITY_SEC,
+    SESSIONS_DIR,
+    SESSION_OWNER_FILENAME,
     validate_mode_settings,
 )
-from src import audio_io, asr_whisper, nao_converse
+from src import audio_io, asr_whisper, deadline, nao_converse, tracing, turn_timing
 
+from src.journal import get_journal
 from src.logger import debug, error, exc
-from src.robot_job import write_input_job
+from src.robot_job import build_input_job
+from src.robot_queue import open_job_queue
+from src.turn_table import TurnRecord, TurnTable
 
 TAG_ASR = "ASR"
 TAG_LOG = "LOG"
 TAG_LLM = "LLM"
+TAG_ROBOT = "ROBOT"
 
 
 class ConversationManager:
-    def __init__(self, robot_enabled=None, robot_name=None):
+    def __init__(self, robot_enabled=None, robot_name=None, transcriber=None, sessions_dir=None):
         self.history = []
-        self.turn = 0
-        self._pending_turn = None
+        self._turns = TurnTable()
+        # Serialises log writes so turns released by different threads stay in order.
+        self._finalize_lock = threading.Lock()
         self.robot_enabled = ROBOT_CHAT_ENABLED if robot_enabled is None else bool(robot_enabled)
         self.robot_name = robot_name or DEFAULT_ROBOT_NAME
+        self.transcriber = transcriber or asr_whisper.transcribe
 
         if self.robot_enabled:
-            validate_mode_settings(robot_enabled=True)
+            validate_mode_settings(robot_enabled=True, robot_name=self.robot_name)
 
-        base = os.path.join(os.path.dirname(__file__), "..", "sessions")
+        base = sessions_dir or SESSIONS_DIR
         os.makedirs(base, exist_ok=True)
 
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.session_dir = os.path.join(base, f"session_{ts}")
-        os.makedirs(self.session_dir, exist_ok=True)
+        self.session_dir = self._create_session_dir(base)
         if self.robot_enabled:
             ensure_session_robot_dirs(self.session_dir)
 
@@ -52,6 +63,9 @@ class ConversationManager:
 
         self.log_path = os.path.join(self.session_dir, "conversation_log.jsonl")
         self.dialogue_path = os.path.join(self.session_dir, "session_dialogue.txt")
+        self.journal = get_journal()
+        self._dialogue_lines = []
+        self._job_listeners = []
 
         # Jobs TO robot (_input.json)
         self.to_robot_dir = None
@@ -59,54 +73,107 @@ class ConversationManager:
         # Results FROM robot (.done.json)
         self.from_robot_dir = None
 
+        self.robot_queue = None
+
         if self.robot_enabled:
             self.to_robot_dir = os.path.join(self.session_dir, ROBOT_INBOX_DIRNAME)
             self.from_robot_dir = os.path.join(self.session_dir, ROBOT_OUTBOX_DIRNAME)
+            self.robot_queue = open_job_queue(
+                ROBOT_QUEUE_BACKEND,
+                self.session_dir,
+                self.to_robot_dir,
+                self.from_robot_dir,
+                export_files=ROBOT_QUEUE_EXPORT_FILES,
+                visibility_sec=ROBOT_QUEUE_VISIBILITY_SEC,
+            )
 
-    def _log(self, record):
-        with open(self.log_path, "a") as f:
-            json.dump(record, f)
-            f.write("\n")
+    @staticmethod
+    def _create_session_dir(base):
+        # mkdir is atomic, so concurrent sessions started in the same second
+        # each get their own directory (session_<ts>, session_<ts>_2, ...).
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = 1
+        while True:
+            name = f"session_{ts}" if suffix == 1 else f"session_{ts}_{suffix}"
+            path = os.path.join(base, name)
+            try:
+                os.mkdir(path)
+            except FileExistsError:
+                suffix += 1
+                continue
+            with open(os.path.join(path, SESSION_OWNER_FILENAME), "w") as f:
+                json.dump({"pid": os.getpid(), "host": socket.gethostname(), "created_at": tracing.now_iso()}, f)
+            return path
 
-    def _atomic_write_text(self, final_path, text):
-        tmp_path = final_path + ".tmp"
-        with open(tmp_path, "w", encoding="utf-8") as f:
-            f.write(text)
-        os.replace(tmp_path, final_path)
+    def _log(self, record):
+        self.journal.append(self.log_path, record)
 
     def _dialogue_line(self, turn_id, speaker, text):
         safe_text = "" if text is None else str(text)
         return "turn_{} {}: {}".format(int(turn_id), speaker, json.dumps(safe_text, ensure_ascii=False))
 
     def _rewrite_session_dialogue(self):
-        lines = []
-        if os.path.isfile(self.log_path):
-            with open(self.log_path, "r", encoding="utf-8") as f:
-                for raw_line in f:
-                    raw_line = raw_line.strip()
-                    if not raw_line:
-                        continue
-                    try:
-                        record = json.loads(raw_line)
-                    except Exception:
-                        continue
-
-                    turn_id = record.get("turn")
-                    if turn_id is None:
-                        continue
-
-                    lines.append(self._dialogue_line(turn_id, "user", record.get("user", "")))
-                    lines.append(self._dialogue_line(turn_id, "robot", record.get("ai_text", "")))
-
         # Use two blank lines between speaker turns for easier scanning.
-        dialogue_text = "\n\n\n".join(lines)
+        dialogue_text = "\n\n\n".join(self._dialogue_lines)
         if dialogue_text:
             dialogue_text += "\n\n\n"
-        self._atomic_write_text(self.dialogue_path, dialogue_text)
+        self.journal.replace(self.dialogue_path, dialogue_text)
+
+    def add_job_listener(self, fn):
+        """Call fn(job) with each robot input job right after its inbox file is written."""
+        self._job_listeners.append(fn)
+
+    def _notify_job_listeners(self, job):
+        for fn in list(self._job_listeners):
+            try:
+                fn(job)
+            except Exception as e:
+                exc(TAG_ROBOT, e, "Input job listener failed")
+
+    @property
+    def turn(self):
+        """The most recently allocated turn id (0 before the first turn)."""
+        return self._turns.last_id
+
+    def allocate_turn(self):
+        """Reserve the next turn id, e.g. so the bridge can hand it out before transcribing."""
+        return self._turns.allocate()
 
     def set_pending_ai_text(self, turn_id, ai_text):
-        if self._pending_turn and self._pending_turn.get("turn") == turn_id:
-            self._pending_turn["ai_text"] = ai_text
+        record = self._turns.get(turn_id)
+        if record is not None:
+            record.ai_text = ai_text
+
+    def mark_stage(self, turn_id, stage, t=None):
+        """Record a monotonic stage boundary (see src.turn_timing) on an in-flight turn."""
+        record = self._turns.get(turn_id)
+        if record is not None:
+            record.stage_marks[stage] = turn_timing.now() if t is None else t
+
+    def _turn_deadline(self, turn_id):
+        record = self._turns.get(turn_id)
+        return record.deadline if record is not None else None
+
+    def _child_traceparent(self, turn_id, name):
+        """traceparent for a new span `name` under the turn's trace (recorded in child_spans)."""
+        record = self._turns.get(turn_id)
+        if record is None or record.trace is None:
+            return None
+        span_id, traceparent = record.trace.child()
+        record.child_spans[name] = span_id
+        return traceparent
+
+    def check_deadline(self, turn_id, stage):
+        """Record a deadline miss for `stage` if it ended late (no-op without a turn budget)."""
+        budget = self._turn_deadline(turn_id)
+        if budget is not None:
+            budget.check(stage)
+
+    def note_degraded(self, turn_id, how):
+        """Record how a late turn was degraded (e.g. "holding_phrase", "fallback") in its log row."""
+        budget = self._turn_deadline(turn_id)
+        if budget is not None:
+            budget.note_degraded(how)
 
     def generate_watchdog_reply(self, ephemeral_system=None):
         reply_data = nao_converse.converse(
@@ -124,22 +191,30 @@ class ConversationManager:
     # ---------------------------------------------------------
     # Phase 1 — Transcription only
     # ---------------------------------------------------------
-    def transcribe_only(self, audio, recording_started_at=None):
+    def transcribe_only(self, audio, recording_started_at=None, released_at=None, turn_id=None, trace=None):
         """
         Saves input wav + returns (turn_id, transcription text).
         Also computes participant's speech duration and stores a pending log row.
+        released_at is the monotonic time the participant released the button.
+        turn_id is one previously reserved with allocate_turn(); a new one is
+        allocated when omitted. trace is the TurnTrace started with the
+        recording; one is started here if the caller has none.
         """
-        self.turn += 1
-        turn_id = self.turn
+        stage_marks = {"button_release": turn_timing.now() if released_at is None else released_at}
+        if trace is None:
+            trace = tracing.start_trace()
+        budget = deadline.for_turn(stage_marks["button_release"])
+        if turn_id is None:
+            turn_id = self.allocate_turn()
 
-        debug(TAG_ASR, f"transcribe_only start, turn {turn_id}")
+        debug(TAG_ASR, "transcribe_only start, turn {}", turn_id)
 
         # Compute participant duration first so we can short-circuit
         n_samples = len(audio) if audio is not None else 0
         participant_duration_sec = float(n_samples) / float(SAMPLE_RATE)
-        debug(TAG_ASR, f"Participant duration (sec): {participant_duration_sec:.3f}")
+        debug(TAG_ASR, "Participant duration (sec): {:.3f}", participant_duration_sec)
         audio_rms = float(np.sqrt(np.mean(np.square(audio)))) if n_samples > 0 else 0.0
-        debug(TAG_ASR, f"Participant RMS energy: {audio_rms:.6f}")
+        debug(TAG_ASR, "Participant RMS energy: {:.6f}", audio_rms)
 
         input_audio_path = None
 
@@ -156,36 +231,48 @@ class ConversationManager:
         else:
             # Save input audio (only if we're going to transcribe)
             input_audio_path = os.path.join(self.session_dir, f"input_turn_{turn_id:03d}.wav")
-            debug(TAG_ASR, f"Saving input WAV to: {input_audio_path}")
+            debug(TAG_ASR, "Saving input WAV to: {}", input_audio_path)
             audio_io.save_wav(audio, input_audio_path)
+            stage_marks["wav_saved"] = turn_timing.now()
             debug(TAG_ASR, "Input WAV saved")
 
             # Transcribe
-            debug(TAG_ASR, "Calling asr_whisper.transcribe…")
-            text = asr_whisper.transcribe(audio)
-            debug(TAG_ASR, f"Raw transcription: {text!r}")
+            debug(TAG_ASR, "Calling transcriber…")
+            stage_marks["asr_start"] = turn_timing.now()
+            text = self.transcriber(audio)
+            stage_marks["asr_end"] = turn_timing.now()
+            debug(TAG_ASR, "Raw transcription: {!r}", text)
             text = text.strip()
-            debug(TAG_ASR, f"Stripped transcription: {text!r}")
-
-        self._pending_turn = {
-            "turn": turn_id,
-            "user": text,
-            "ai_text": None,
-            "participant_duration_sec": participant_duration_sec,
-            "ai_duration_sec": None,
-        }
+            debug(TAG_ASR, "Stripped transcription: {!r}", text)
+            if budget is not None:
+                budget.check("asr", stage_marks["asr_end"])
+
+        record = TurnRecord(
+            turn_id,
+            user=text,
+            participant_duration_sec=participant_duration_sec,
+            trace=trace,
+            recording_started_at=recording_started_at or trace.started_at,
+            button_release_at=tracing.wall_iso(stage_marks["button_release"]),
+            stage_marks=stage_marks,
+            deadline=budget,
+        )
+        self._open_turn(record)
 
         if self.robot_enabled:
             try:
-                write_input_job(
-                    inbox_dir=self.to_robot_dir,
+                job = build_input_job(
                     turn_id=turn_id,
                     robot_name=self.robot_name,
                     participant_text=text,
                     input_audio_path=input_audio_path,
                     participant_duration_sec=participant_duration_sec,
                     recording_started_at=recording_started_at,
+                    trace=trace,
                 )
+                record.child_spans["robot_job"] = job["span_id"]
+                self.robot_queue.enqueue(job)
+                self._notify_job_listeners(job)
             except Exception as e:
                 error(TAG_ASR, "write_input_job failed: {}".format(repr(e)))
 
@@ -194,48 +281,72 @@ class ConversationManager:
     # ---------------------------------------------------------
     # Phase 2 — LLM reply only
     # ---------------------------------------------------------
-    def reply_only(self, turn_id, text):
+    def reply_only(self, turn_id, text, on_late=None):
         """
         Generates reply, updates history, and determines output path.
         Speaking is handled by GUI.
 
+        With a turn budget (TURN_DEADLINE_SEC), on_late() is called once the
+        reply is overdue while /converse keeps running. A failed call, or one
+        still running TURN_DEADLINE_GRACE_SEC past the budget (abandoned, its
+        late reply dropped), is answered with FALLBACK_REPLY instead of silence.
+
         Logging is not finalised here; we still need AI audio duration.
         """
         output_audio_path = os.path.join(
             self.session_dir, f"output_turn_{turn_id:03d}.aiff"
         )
 
+        budget = self._turn_deadline(turn_id)
+        traceparent = self._child_traceparent(turn_id, "converse")
+        replied = False
         if not text:
             reply = "(no speech detected)"
             outpath = None
         else:
+            self.mark_stage(turn_id, "converse_start")
             try:
-                reply_data = nao_converse.converse(
-                    prompt=text,
-                    history=self.history,
-                    turn_count=turn_id,
+                reply_data, _late = deadline.call_with_deadline(
+                    lambda: nao_converse.converse(
+                        prompt=text,
+                        history=self.history,
+                        turn_count=turn_id,
+                        traceparent=traceparent,
+                    ),
+                    budget.remaining("converse") if budget is not None else None,
+                    on_late=on_late,
                 )
                 reply = reply_data["spoken_text"]
                 outpath = output_audio_path
+                replied = True
+            except deadline.DeadlineExceeded as e:
+                error(TAG_LLM, "nao_converse abandoned: {}".format(e))
+                reply = FALLBACK_REPLY
+                outpath = output_audio_path
+                budget.note_degraded("abandoned")
+                budget.note_degraded("fallback")
             except Exception as e:
                 exc(TAG_LLM, e, msg="nao_converse failed")
-                reply = "(UQ Py3 converse error — see terminal.)"
-                outpath = None
+                if budget is not None:
+                    reply = FALLBACK_REPLY
+                    outpath = output_audio_path
+                    budget.note_degraded("fallback")
+                else:
+                    reply = "(UQ Py3 converse error — see terminal.)"
+                    outpath = None
+            self.mark_stage(turn_id, "converse_end")
+            if budget is not None:
+                budget.check("converse")
 
         self.history.append({"role": "user", "content": text})
-        if outpath is not None:  # only on successful LLM call
+        if replied:  # only on successful LLM call
             self.history.append({"role": "assistant", "content": reply})
 
-        if self._pending_turn and self._pending_turn.get("turn") == turn_id:
-            self._pending_turn["ai_text"] = reply
+        record = self._turns.get(turn_id)
+        if record is not None:
+            record.ai_text = reply
         else:
-            self._pending_turn = {
-                "turn": turn_id,
-                "user": text,
-                "ai_text": reply,
-                "participant_duration_sec": None,
-                "ai_duration_sec": None,
-            }
+            self._open_turn(TurnRecord(turn_id, user=text, ai_text=reply))
 
         return reply, outpath
 
@@ -245,26 +356,59 @@ class ConversationManager:
     def finalize_turn_log(self, turn_id, ai_duration_sec):
         """
         Called after TTS has completed and the AI audio duration is known.
-        Writes a single JSON line for the completed turn.
+        Writes a single JSON line for the completed turn. Turns are logged in
+        turn order: one that finishes while an earlier turn is still in
+        flight is written once that turn is finalised or discarded.
         """
-        if not self._pending_turn:
-            error(TAG_LOG, "No pending turn to finalise (turn {turn_id})")
+        record = self._turns.get(turn_id)
+        if record is None:
+            error(TAG_LOG, f"No pending turn to finalise (turn {turn_id})")
             return
 
-        if self._pending_turn.get("turn") != turn_id:
-            error(
-                TAG_LOG,
-                f"Pending turn mismatch: pending={self._pending_turn.get('turn')} got={turn_id}"
-            )
+        record.ai_duration_sec = ai_duration_sec
+        record.stage_marks["finalized"] = turn_timing.now()
+        with self._finalize_lock:
+            ready = self._turns.finish(turn_id) or []
+            if not any(r.turn == turn_id for r in ready):
+                debug(TAG_LOG, "Turn {} waits for an earlier turn before logging".format(turn_id))
+            self._write_turns(ready)
+
+    def discard_turn(self, turn_id):
+        """Drop a turn that will never be finalised (e.g. its reply failed) so later turns can be logged."""
+        with self._finalize_lock:
+            self._write_turns(self._turns.discard(turn_id))
+
+    def close(self):
+        """Release the session's log handle; a later turn would reopen it."""
+        self.journal.close_path(self.log_path)
+
+    def _open_turn(self, record):
+        # Opening past MAX_OPEN_TURNS drops the oldest unfinished turn; later ones it held back are logged now.
+        with self._finalize_lock:
+            self._write_turns(self._turns.open(record))
+
+    def _write_turns(self, records):
+        if not records:
             return
-
-        self._pending_turn["ai_duration_sec"] = ai_duration_sec
-
-        self._log(self._pending_turn)
+        for record in records:
+            row = record.as_record()
+            stage_marks = record.stage_marks
+            row["stage_offsets_sec"] = turn_timing.offsets(stage_marks)
+            row["stage_durations_sec"] = turn_timing.durations(stage_marks)
+            if record.deadline is not None:
+                row.update(record.deadline.as_record())
+            overlap = turn_timing.render_gate_overlap(stage_marks)
+            if overlap is not None:
+                debug(TAG_LOG, "Turn {} TTS render: {:.3f}s hidden behind the gate, {:.3f}s after release".format(
+                    record.turn, overlap[0], overlap[1]
+                ))
+
+            self._log(row)
+            self._dialogue_lines.append(self._dialogue_line(record.turn, "user", row.get("user", "")))
+            self._dialogue_lines.append(self._dialogue_line(record.turn, "robot", row.get("ai_text", "")))
+            debug(TAG_LOG, "Logged turn {}".format(record.turn))
         self._rewrite_session_dialogue()
-        debug(TAG_LOG, "Logged turn {}".format(self._pending_turn["turn"]))
-
-        self._pending_turn = None
+        self.journal.end_turn(self.log_path)
 
     # ---------------------------------------------------------
     # ROBOT-CHAT PIPELINE METHOD
@@ -276,13 +420,4 @@ class ConversationManager:
         if timeout_sec is None:
             timeout_sec = ROBOT_DONE_TIMEOUT_SEC
 
-        done_path = os.path.join(self.from_robot_dir, "turn_{:04d}_output.json".format(int(turn_id)))
-
-        t0 = time.time()
-        while time.time() - t0 < timeout_sec:
-            if os.path.isfile(done_path):
-                with open(done_path, "r") as f:
-                    return json.load(f)
-            time.sleep(poll_sec)
-
-        return None
+        return self.robot_queue.wait_result(turn_id, timeout_sec, poll_sec=poll_sec)
@@ -0,0 +1,124 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.logger import debug, info
+
+TAG = "STUB"
+
+
+class ConverseStub:
+    """
+    Local stand-in for the uq-neuro-nao Py3 /converse endpoint.
+
+    Replies are looked up by turn_count in `replies` when given (e.g. the
+    ai_text of a recorded session), otherwise the prompt is echoed back.
+    `latencies` likewise overrides latency_sec per turn.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_sec=0.0, replies=None, latencies=None):
+        self.latency_sec = float(latency_sec)
+        self.replies = dict(replies or {})
+        self.latencies = dict(latencies or {})
+        self.requests = 0
+        self.last_traceparent = None
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def latency_for(self, payload):
+        if payload.get("watchdog_mode"):
+            return self.latency_sec
+        return self.latencies.get(int(payload.get("turn_count") or 0), self.latency_sec)
+
+    def reply_for(self, payload):
+        turn = int(payload.get("turn_count") or 0)
+        if turn in self.replies:
+            return self.replies[turn]
+        if payload.get("watchdog_mode"):
+            return "Are you still there?"
+        prompt = (payload.get("prompt") or "").strip()
+        return "You said: {}".format(prompt) if prompt else "I didn't catch that."
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.rstrip("/") != "/converse":
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self.send_error(400)
+                    return
+                latency_sec = stub.latency_for(payload)
+                if latency_sec > 0:
+                    time.sleep(latency_sec)
+                stub.requests += 1
+                stub.last_traceparent = self.headers.get("traceparent")
+                text = stub.reply_for(payload)
+                body = json.dumps({"response": text, "segments_list": [[text]]}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                debug(TAG, fmt % args)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="converse-stub", daemon=True)
+        self._thread.start()
+        debug(TAG, "Listening on {}".format(self.url))
+        return self.url
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python3 -m src.converse_stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before replying")
+    args = parser.parse_args(argv)
+
+    stub = ConverseStub(args.host, args.port, latency_sec=args.latency)
+    info(TAG, "Stand-in /converse on {}".format(stub.url))
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+import hashlib
+import itertools
+import os
+import queue
+import threading
+import time
+
+from config import (
+    FALLBACK_REPLY,
+    HOLDING_PHRASES,
+    SESSIONS_DIR,
+    TTS_VOICE,
+    TURN_DEADLINE_GRACE_SEC,
+    TURN_DEADLINE_SEC,
+    TURN_DEADLINE_SHARES,
+)
+from src import turn_timing
+from src.logger import debug, exc
+
+TAG = "DEADLINE"
+
+# Pre-rendered holding phrases and the fallback reply, shared across sessions.
+PHRASE_CACHE_DIR = os.path.join(SESSIONS_DIR, "phrase_cache")
+# Live calls at once; calls abandoned at their cutoff don't count (see CallPool).
+MAX_CALL_WORKERS = 4
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call ran past its hard cutoff; its result, when it comes, is dropped."""
+
+
+class TurnDeadline:
+    """
+    Latency budget for one turn, measured from button release. Each stage in
+    `shares` must end by the running total of the shares so far (asr 0.3,
+    converse 0.7 -> ASR due at 30% of the budget, the reply at 100%).
+    """
+
+    __slots__ = ("budget_sec", "start", "due", "misses", "degraded")
+
+    def __init__(self, budget_sec, start, shares=None):
+        self.budget_sec = float(budget_sec)
+        self.start = start
+        self.due = {}
+        self.misses = {}
+        self.degraded = []
+        elapsed = 0.0
+        for stage, share in (TURN_DEADLINE_SHARES if shares is None else shares).items():
+            elapsed += float(share)
+            self.due[stage] = start + self.budget_sec * elapsed
+
+    def remaining(self, stage, now=None):
+        """Seconds left before `stage` is due (negative once missed), or None if it has no share."""
+        due = self.due.get(stage)
+        if due is None:
+            return None
+        return due - (turn_timing.now() if now is None else now)
+
+    def check(self, stage, end=None):
+        """Record a miss if `stage` ended after it was due. Returns the overrun in seconds, or None."""
+        remaining = self.remaining(stage, end)
+        if remaining is None or remaining >= 0:
+            return None
+        self.misses[stage] = round(-remaining, 4)
+        debug(TAG, "{} missed its deadline by {:.3f}s".format(stage, -remaining))
+        return -remaining
+
+    def note_degraded(self, how):
+        if how not in self.degraded:
+            self.degraded.append(how)
+
+    def as_record(self):
+        return {
+            "deadline_budget_sec": self.budget_sec,
+            "deadline_misses": dict(self.misses),
+            "degraded": list(self.degraded),
+        }
+
+
+def for_turn(start, budget_sec=None):
+    """TurnDeadline starting at `start` (monotonic), or None when no budget is configured."""
+    budget_sec = TURN_DEADLINE_SEC if budget_sec is None else budget_sec
+    if not budget_sec:
+        return None
+    return TurnDeadline(budget_sec, start)
+
+
+class _Call:
+    __slots__ = ("fn", "value", "error", "done", "started", "finished", "abandoned")
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.value = None
+        self.error = None
+        self.done = threading.Event()
+        self.started = False
+        self.finished = False
+        self.abandoned = False
+
+
+class CallPool:
+    """
+    Long-lived daemon threads for calls made against a deadline. A thread is
+    started only when none is idle, up to `max_workers`; past that calls
+    wait their turn. An abandoned call stops counting against `max_workers`
+    straight away: its thread finishes the call, drops the result and exits,
+    so slow backends can't starve later calls of a worker.
+    """
+
+    def __init__(self, max_workers=MAX_CALL_WORKERS, name="deadline-call"):
+        self.max_workers = max(1, int(max_workers))
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = 0
+        self._idle = 0
+
+    def submit(self, fn):
+        call = _Call(fn)
+        with self._lock:
+            spawn = False
+            if self._idle > 0:
+                self._idle -= 1
+            elif self._threads < self.max_workers:
+                self._threads += 1
+                spawn = True
+            n = self._threads
+        if spawn:
+            self._spawn(n)
+        self._queue.put(call)
+        return call
+
+    def _spawn(self, n):
+        threading.Thread(target=self._run, name="{}-{}".format(self.name, n), daemon=True).start()
+
+    def _run(self):
+        while True:
+            call = self._queue.get()
+            with self._lock:
+                skip = call.abandoned
+                call.started = not skip
+                if skip:
+                    # Given up on before it started: nothing to run.
+                    self._idle += 1
+            if skip:
+                call.fn = None
+                continue
+            try:
+                call.value = call.fn()
+            except BaseException as e:
+                call.error = e
+            call.fn = None
+            with self._lock:
+                call.finished = True
+                abandoned = call.abandoned
+                if not abandoned:
+                    # Idle before done is signalled, so the caller's next call reuses this thread.
+                    self._idle += 1
+            call.done.set()
+            if abandoned:
+                debug(TAG, "Dropped a result that arrived after its cutoff")
+                call.value = call.error = None
+                return
+
+    def abandon(self, call):
+        """
+        Give up on `call`; its thread no longer counts as a worker. Returns
+        False if the call finished first, in which case its result stands.
+        """
+        with self._lock:
+            if call.finished:
+                return False
+            call.abandoned = True
+            if not call.started:
+                return True
+            self._threads -= 1
+            # Calls queued behind the busy workers get this thread's replacement.
+            replace = not self._queue.empty() and self._threads < self.max_workers
+            if replace:
+                self._threads += 1
+            n = self._threads
+        if replace:
+            self._spawn(n)
+        return True
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_call_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = CallPool()
+    return _pool
+
+
+def call_with_deadline(fn, timeout_sec, on_late=None, grace_sec=None, pool=None):
+    """
+    Run fn() on a pooled worker and return (result, late). If it has not
+    returned within timeout_sec, on_late() runs on the calling thread (e.g.
+    to queue a holding phrase) while fn keeps going. If it still has not
+    returned grace_sec (TURN_DEADLINE_GRACE_SEC) after that, the call is
+    abandoned: DeadlineExceeded is raised and its result dropped.
+    Exceptions from fn are re-raised. timeout_sec None calls fn inline.
+    """
+    if timeout_sec is None:
+        return fn(), False
+
+    pool = get_call_pool() if pool is None else pool
+    grace_sec = TURN_DEADLINE_GRACE_SEC if grace_sec is None else grace_sec
+    cutoff = time.monotonic() + max(0.0, timeout_sec) + max(0.0, float(grace_sec or 0.0))
+    call = pool.submit(fn)
+    late = not call.done.wait(max(0.0, timeout_sec))
+    if late and on_late is not None:
+        try:
+            on_late()
+        except Exception as e:
+            exc(TAG, e, msg="on_late failed")
+    if late and not call.done.wait(max(0.0, cutoff - time.monotonic())) and pool.abandon(call):
+        raise DeadlineExceeded("no result {:.1f}s after the deadline".format(float(grace_sec or 0.0)))
+    if call.error is not None:
+        raise call.error
+    return call.value, late
+
+
+class PhraseCache:
+    """
+    Holding phrases and the fallback reply rendered once to
+    PHRASE_CACHE_DIR (keyed by voice and text), so a late turn can speak
+    straight away instead of waiting for TTS.
+    """
+
+    def __init__(self, holding=None, fallback=None, cache_dir=PHRASE_CACHE_DIR):
+        self.holding_phrases = list(HOLDING_PHRASES if holding is None else holding)
+        self.fallback = FALLBACK_REPLY if fallback is None else fallback
+        self.cache_dir = cache_dir
+        self._rendered = {}
+        self._cycle = itertools.cycle(self.holding_phrases) if self.holding_phrases else None
+        self._lock = threading.Lock()
+
+    def _path(self, text):
+        key = hashlib.sha1("{}\n{}".format(TTS_VOICE, text).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, "phrase_{}.aiff".format(key))
+
+    def render(self, text):
+        from src import tts_engine
+
+        with self._lock:
+            if text in self._rendered:
+                return self._rendered[text]
+        path = self._path(text)
+        if not os.path.isfile(path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = tts_engine.render(text, path)
+        with self._lock:
+            self._rendered[text] = path
+        return path
+
+    def warm(self):
+        for text in self.holding_phrases + [self.fallback]:
+            try:
+                self.render(text)
+            except Exception as e:
+                exc(TAG, e, msg="Could not pre-render {!r}".format(text))
+        debug(TAG, "Phrase cache ready ({} phrases)".format(len(self._rendered)))
+
+    def path_for(self, text):
+        """Pre-rendered file for `text`, if there is one on disk."""
+        with self._lock:
+            path = self._rendered.get(text)
+        return path if path and os.path.isfile(path) else None
+
+    def holding(self):
+        """Next holding phrase as (text, path), or None if none are configured or rendering failed."""
+        if self._cycle is None:
+            return None
+        with self._lock:
+            text = next(self._cycle)
+        path = self.render(text)
+        return (text, path) if path else None
+
+
+_phrases = None
+_phrases_lock = threading.Lock()
+
+
+def get_phrase_cache():
+    global _phrases
+    if _phrases is None:
+        with _phrases_lock:
+            if _phrases is None:
+                _phrases = PhraseCache()
+    return _phrases
+
+
+def warm_phrases_async():
+    """Pre-render holding phrases in the background when a turn budget is configured."""
+    if not TURN_DEADLINE_SEC:
+        return None
+    t = threading.Thread(target=get_phrase_cache().warm, name="phrase-cache", daemon=True)
+    t.start()
+    return t
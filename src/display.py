@@ -6,6 +6,7 @@ from src.logger import debug
 
 
 TAG = "DISPLAY"
+_UNSET = object()
 
 
 class _CGPoint(Structure):
@@ -89,8 +90,14 @@ def _pick_display(displays):
     return displays[0] if displays else None
 
 
-def place_on_target_display(root, fallback_geometry):
-    display = _pick_display(_active_displays())
+def find_target_display():
+    """Enumerate displays and pick the target one. Needs no Tk, so it can run off the UI thread."""
+    return _pick_display(_active_displays())
+
+
+def place_on_target_display(root, fallback_geometry, display=_UNSET):
+    if display is _UNSET:
+        display = find_target_display()
     if display is None:
         root.geometry(fallback_geometry)
         return False
@@ -0,0 +1,258 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from src.logger import debug, error, exc
+
+TAG = "WATCH"
+
+# <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """Portable fallback: checks for the file every poll_sec."""
+
+    kind = "polling"
+
+    def __init__(self, poll_sec=0.05):
+        self.poll_sec = float(poll_sec)
+
+    def wait_for(self, path, timeout_sec):
+        deadline = time.monotonic() + max(0.0, float(timeout_sec))
+        while True:
+            if os.path.isfile(path):
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_sec, remaining))
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Wakes waiters when a file is renamed into (or finished being written in)
+    a watched directory. One reader thread serves any number of directories
+    and concurrent waiters. A directory is watched only while someone waits
+    on it. If the event queue overflows every waiter re-checks the
+    filesystem, and if the reader fails waits fall back to polling.
+    """
+
+    kind = "inotify"
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._libc.inotify_init1.argtypes = [ctypes.c_int]
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, "inotify_init1 failed: {}".format(os.strerror(err)))
+
+        self._wake_r, self._wake_w = os.pipe()
+        self._lock = threading.Lock()
+        self._dir_by_wd = {}
+        self._wd_by_dir = {}
+        self._dir_refs = {}
+        self._waiters = {}
+        self._closed = False
+        self._failed = False
+        self._fallback = PollingWatcher()
+
+        self._thread = threading.Thread(target=self._run, name="inotify-watcher", daemon=True)
+        self._thread.start()
+
+    def _add_watch(self, dir_path):
+        wd = self._wd_by_dir.get(dir_path)
+        if wd is not None:
+            self._dir_refs[dir_path] += 1
+            return
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(dir_path), _IN_CLOSE_WRITE | _IN_MOVED_TO
+        )
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, "inotify_add_watch({}) failed: {}".format(dir_path, os.strerror(err)))
+        self._wd_by_dir[dir_path] = wd
+        self._dir_by_wd[wd] = dir_path
+        # Waiters from before an IN_IGNORED (directory removed and re-created) keep their references.
+        self._dir_refs[dir_path] = self._dir_refs.get(dir_path, 0) + 1
+        debug(TAG, "Watching {} (wd={})".format(dir_path, wd))
+
+    def _release_watch(self, dir_path):
+        """Drop one waiter's reference; the watch is removed with the last one."""
+        refs = self._dir_refs.get(dir_path, 0) - 1
+        if refs > 0:
+            self._dir_refs[dir_path] = refs
+            return
+        self._dir_refs.pop(dir_path, None)
+        wd = self._wd_by_dir.pop(dir_path, None)
+        if wd is None:
+            return
+        self._dir_by_wd.pop(wd, None)
+        if not (self._closed or self._failed):
+            # Fails harmlessly (EINVAL) if the directory is already gone.
+            self._libc.inotify_rm_watch(self._fd, wd)
+        debug(TAG, "Stopped watching {} (wd={})".format(dir_path, wd))
+
+    def wait_for(self, path, timeout_sec):
+        if self._failed:
+            return self._fallback.wait_for(path, timeout_sec)
+        path = os.path.abspath(path)
+        dir_path = os.path.dirname(path)
+        deadline = time.monotonic() + max(0.0, float(timeout_sec))
+        ready = threading.Event()
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("watcher is closed")
+            try:
+                self._add_watch(dir_path)
+            except OSError as e:
+                if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+                    raise
+                watched = False
+            else:
+                watched = True
+                self._waiters.setdefault(path, []).append(ready)
+
+        if not watched:
+            # Nothing to watch until the directory exists; polling notices it being created too.
+            debug(TAG, "{} does not exist yet; polling for {}".format(dir_path, path))
+            return self._fallback.wait_for(path, timeout_sec)
+
+        try:
+            # Registered before checking, so an arrival in between still wakes us.
+            while True:
+                if os.path.isfile(path):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not ready.wait(remaining):
+                    return os.path.isfile(path)
+                # Woken by an event, an overflow, a failed reader or close().
+                ready.clear()
+                if self._failed:
+                    return self._fallback.wait_for(path, deadline - time.monotonic())
+                if self._closed:
+                    return os.path.isfile(path)
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(path)
+                if waiters is not None:
+                    try:
+                        waiters.remove(ready)
+                    except ValueError:
+                        pass
+                    if not waiters:
+                        del self._waiters[path]
+                self._release_watch(dir_path)
+
+    def _wake_all(self):
+        with self._lock:
+            pending = [ready for waiters in self._waiters.values() for ready in waiters]
+        for ready in pending:
+            ready.set()
+
+    def _dispatch(self, data):
+        offset = 0
+        woken = []
+        with self._lock:
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                raw_name = data[offset:offset + name_len].rstrip(b"\0")
+                offset += name_len
+
+                if mask & _IN_Q_OVERFLOW:
+                    # Events were lost: wake everyone to re-check the filesystem.
+                    woken.extend(ready for waiters in self._waiters.values() for ready in waiters)
+                    continue
+                dir_path = self._dir_by_wd.get(wd)
+                if dir_path is None:
+                    continue
+                if mask & _IN_IGNORED:
+                    self._dir_by_wd.pop(wd, None)
+                    self._wd_by_dir.pop(dir_path, None)
+                    continue
+                if not raw_name:
+                    continue
+
+                path = os.path.join(dir_path, os.fsdecode(raw_name))
+                woken.extend(self._waiters.get(path, ()))
+
+        for ready in woken:
+            ready.set()
+
+    def _run(self):
+        while True:
+            try:
+                readable, _, _ = select.select([self._fd, self._wake_r], [], [])
+            except InterruptedError:
+                continue
+            if self._wake_r in readable:
+                break
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                exc(TAG, e, "inotify read failed; falling back to polling")
+                self._failed = True
+                self._wake_all()
+                break
+            self._dispatch(data)
+
+        os.close(self._fd)
+        os.close(self._wake_r)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        os.write(self._wake_w, b"x")
+        self._thread.join(1.0)
+        os.close(self._wake_w)
+        # Let blocked waiters re-check the filesystem themselves.
+        self._wake_all()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_watcher(poll_sec=0.05):
+    """Process-wide watcher: inotify on Linux, polling elsewhere or if inotify is unavailable."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                watcher = None
+                if sys.platform.startswith("linux"):
+                    try:
+                        watcher = InotifyWatcher()
+                    except Exception as e:
+                        error(TAG, "inotify unavailable ({}); falling back to polling".format(e))
+                _shared = watcher or PollingWatcher(poll_sec=poll_sec)
+                debug(TAG, "Using {} file watcher".format(_shared.kind))
+    return _shared
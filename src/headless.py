@@ -0,0 +1,276 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+
+from config import ROBOT_CHAT_ENABLED, WAIT_FOR_ROBOT_DONE, validate_mode_settings
+from src.audio_sources import DirectorySource, SyntheticSource, WavSource, deliver
+from src.journal import get_journal
+from src.latency_report import collect_stage_durations, stage_percentiles
+from src import logger
+from src.logger import debug, info
+from src.pipeline import STATUS_DONE, STATUS_ERROR
+from src.tracing import start_trace
+from src.turn_flow import GATE_MANUAL, LocalWatchdog, build_turn_pipeline, operator_gate
+
+TAG = "HEADLESS"
+
+
+class HeadlessRunner:
+    """
+    Drives ConversationManager and a response adapter from an AudioSource,
+    with no display or microphone. Turns go through the same pipeline,
+    operator gate and local watchdog rules as the GUI, one turn at a time.
+
+    Every wait (capture, gaps between utterances, typing delays, watchdog
+    interval) is scaled by `speed`: 1 is real time, 10 is ten times faster,
+    0 does not wait at all. The Return gate has no operator here; it is
+    released after `manual_gate_sec`.
+    """
+
+    def __init__(self, source, robot_enabled=None, robot_name=None, wait_for_done=WAIT_FOR_ROBOT_DONE, speed=1.0,
+                 transcriber=None, sessions_dir=None, watchdog=None, manual_gate_sec=0.0, on_session=None):
+        self.source = source
+        self.robot_enabled = ROBOT_CHAT_ENABLED if robot_enabled is None else bool(robot_enabled)
+        self.robot_name = robot_name
+        self.wait_for_done = wait_for_done
+        self.speed = max(0.0, float(speed))
+        self.transcriber = transcriber
+        self.sessions_dir = sessions_dir
+        self.watchdog = LocalWatchdog(enabled=watchdog, robot_enabled=self.robot_enabled)
+        self.manual_gate_sec = float(manual_gate_sec)
+        # Called with the ConversationManager once the session exists (e.g. to attach a stand-in robot).
+        self.on_session = on_session
+        self.convo = None
+        self.pipeline = None
+        self.counts = {"turns": 0, "watchdogs": 0, "errors": 0}
+
+    def _sleep(self, sec):
+        if self.speed > 0 and sec > 0:
+            time.sleep(sec / self.speed)
+
+    def _scaled(self, wall_sec):
+        """Wall-clock seconds -> conversation seconds."""
+        return wall_sec * self.speed if self.speed > 0 else 0.0
+
+    # ---------------------------------------------------------
+    # Pipeline callbacks (run on pipeline worker threads)
+    # ---------------------------------------------------------
+    def _release(self, item):
+        if item.kind == "turn":
+            self.convo.mark_stage(item.data["turn_id"], "gate_end")
+        self.pipeline.resume(item.key)
+
+    def _on_progress(self, item, stage):
+        if item.failed:
+            return
+        d = item.data
+        if stage == "asr":
+            self.watchdog.note_participant(d["text"])
+            return
+        if stage != "reply" or not d.get("outpath") or not d.get("reply"):
+            return
+
+        gate = operator_gate("watchdog" if item.kind == "watchdog" else "turn_reply", d["reply"])
+        if gate is None:
+            self._release(item)
+            return
+        hold_sec = self.manual_gate_sec if gate == GATE_MANUAL else gate
+        debug(TAG, "Operator gate for {!r}: releasing after {:.3f}s".format(item.key, hold_sec))
+        timer = threading.Timer(hold_sec / self.speed if self.speed > 0 else 0.0, self._release, args=(item,))
+        timer.daemon = True
+        timer.start()
+
+    # ---------------------------------------------------------
+    # Turn loop
+    # ---------------------------------------------------------
+    def _run_item(self, data, **kwargs):
+        item = self.pipeline.submit(data, block=True, **kwargs)
+        item.wait()
+        if item.status == STATUS_ERROR:
+            self.counts["errors"] += 1
+        return item
+
+    def _idle(self, gap_sec):
+        """Spend a gap between utterances, firing the watchdog when the GUI would."""
+        elapsed = 0.0
+        while self.watchdog.can_fire(self.convo.turn) and elapsed + self.watchdog.interval_sec <= gap_sec:
+            self._sleep(self.watchdog.interval_sec)
+            elapsed += self.watchdog.interval_sec
+            t0 = time.monotonic()
+            item = self._run_item({"watchdog_index": self.watchdog.total + 1}, kind="watchdog", start="reply")
+            elapsed += self._scaled(time.monotonic() - t0)
+            if item.status == STATUS_DONE and item.data.get("reply"):
+                self.watchdog.note_fired()
+                self.counts["watchdogs"] += 1
+        self._sleep(gap_sec - elapsed)
+
+    def run(self, max_turns=None):
+        from src.conversation import ConversationManager
+        from src.response_modes import LocalResponseAdapter, RobotResponseAdapter
+
+        validate_mode_settings(robot_enabled=self.robot_enabled, robot_name=self.robot_name)
+        self.convo = ConversationManager(
+            robot_enabled=self.robot_enabled,
+            robot_name=self.robot_name,
+            transcriber=self.transcriber,
+            sessions_dir=self.sessions_dir,
+        )
+        if self.on_session is not None:
+            self.on_session(self.convo)
+        adapter = (
+            RobotResponseAdapter(wait_for_done=self.wait_for_done)
+            if self.robot_enabled
+            else LocalResponseAdapter()
+        )
+        self.pipeline = build_turn_pipeline(self.convo, adapter, on_progress=self._on_progress, name="headless")
+        info(TAG, "Session {} (speed {})".format(self.convo.session_dir, self.speed or "unpaced"))
+
+        t0 = time.perf_counter()
+        audio_sec = 0.0
+        try:
+            for utterance in self.source:
+                if max_turns is not None and self.counts["turns"] >= max_turns:
+                    break
+                trace = start_trace()
+                audio = deliver(utterance, speed=self.speed)
+                audio_sec += utterance.duration_sec
+                item = self._run_item({
+                    "audio": audio,
+                    "recording_started_at": trace.started_at,
+                    "released_at": time.monotonic(),
+                    "trace": trace,
+                })
+                self.counts["turns"] += 1
+                debug(TAG, "{}: {!r} -> {!r}".format(utterance.name, item.data.get("text"), item.data.get("reply")))
+                # As in the GUI, the watchdog only follows turns that spoke a reply.
+                if item.data.get("outpath"):
+                    self._idle(utterance.gap_sec)
+                else:
+                    self._sleep(utterance.gap_sec)
+        finally:
+            self.pipeline.close()
+            self.convo.close()
+            get_journal().flush()
+        wall_sec = time.perf_counter() - t0
+
+        return {
+            "meta": {
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "mode": "robot" if self.robot_enabled else "computer",
+                "speed": self.speed,
+                "session_dir": self.convo.session_dir,
+            },
+            "turns": self.counts["turns"],
+            "watchdogs": self.counts["watchdogs"],
+            "errors": self.counts["errors"],
+            "audio_sec": round(audio_sec, 3),
+            "wall_sec": round(wall_sec, 4),
+            "throughput_turns_per_sec": round(self.counts["turns"] / wall_sec, 3) if wall_sec > 0 else None,
+            "pipeline": self.pipeline.stats(),
+            "stages": stage_percentiles(collect_stage_durations([self.convo.log_path])),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m src.headless",
+        description="Run the conversation pipeline without a display or microphone.",
+    )
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--wav", nargs="+", metavar="PATH", help="16-bit PCM WAV files, one per turn")
+    src.add_argument("--dir", help="directory of WAV turns, played in name order")
+    src.add_argument("--synthetic", type=int, metavar="N", help="N synthetic utterances")
+    parser.add_argument("--pattern", default="*.wav", help="file pattern for --dir (e.g. 'input_turn_*.wav')")
+    parser.add_argument("--utterance-sec", type=float, default=2.0, help="length of synthetic utterances")
+    parser.add_argument("--gap", type=float, default=0.0, help="silence after each utterance (seconds)")
+    parser.add_argument("--loop", type=int, default=1, help="play the WAV files this many times")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = real time, 0 = as fast as possible")
+    parser.add_argument("--turns", type=int, help="stop after this many turns")
+    parser.add_argument("--mode", choices=("computer", "robot"), help="default: the configured pipeline")
+    parser.add_argument("--robot-name")
+    parser.add_argument("--robot-stub", type=float, metavar="SEC",
+                        help="answer robot jobs with a local stand-in after SEC seconds")
+    parser.add_argument("--asr", choices=("whisper", "stub"), default="whisper")
+    parser.add_argument("--asr-rtf", type=float, default=0.05, help="stub ASR seconds per second of audio")
+    parser.add_argument("--converse-stub", type=float, metavar="SEC",
+                        help="serve /converse locally with canned replies after SEC seconds")
+    parser.add_argument("--tts", choices=("say", "null"), help="override the TTS backend")
+    parser.add_argument("--no-watchdog", action="store_true")
+    parser.add_argument("--manual-gate-sec", type=float, default=0.0,
+                        help="how long the Return gate stays closed when it is enabled")
+    parser.add_argument("--sessions-dir")
+    parser.add_argument("--out", help="write the run summary as JSON")
+    args = parser.parse_args(argv)
+    logger.start()
+
+    from src import nao_converse, tts_engine
+
+    if args.synthetic is not None:
+        source = SyntheticSource(args.synthetic, duration_sec=args.utterance_sec, gap_sec=args.gap)
+    elif args.dir:
+        source = DirectorySource(args.dir, pattern=args.pattern, gap_sec=args.gap, loop=args.loop)
+    else:
+        source = WavSource(args.wav, gap_sec=args.gap, loop=args.loop)
+
+    transcriber = None
+    if args.asr == "stub":
+        from src.benchmark import StubTranscriber
+
+        transcriber = StubTranscriber(args.asr_rtf)
+    if args.tts:
+        tts_engine.configure(backend=args.tts)
+
+    stub = None
+    if args.converse_stub is not None:
+        from src.converse_stub import ConverseStub
+
+        stub = ConverseStub(latency_sec=args.converse_stub)
+        nao_converse.configure(api_base=stub.start())
+
+    robots = []
+
+    def attach_robot(convo):
+        if args.robot_stub is None or not convo.robot_enabled:
+            return
+        from src.benchmark import StandInRobot
+
+        robot = StandInRobot(convo.to_robot_dir, convo.from_robot_dir, latency_sec=args.robot_stub)
+        robot.start()
+        robots.append(robot)
+
+    robot_enabled = None if args.mode is None else args.mode == "robot"
+    runner = HeadlessRunner(
+        source,
+        robot_enabled=robot_enabled,
+        robot_name=args.robot_name,
+        speed=args.speed,
+        transcriber=transcriber,
+        sessions_dir=args.sessions_dir,
+        watchdog=False if args.no_watchdog else None,
+        manual_gate_sec=args.manual_gate_sec,
+        on_session=attach_robot,
+    )
+
+    try:
+        summary = runner.run(max_turns=args.turns)
+    finally:
+        for robot in robots:
+            robot.stop()
+        if stub is not None:
+            stub.stop()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+    info(TAG, "{} turns, {} watchdogs, {} errors in {:.3f}s ({} turns/s) -> {}".format(
+        summary["turns"], summary["watchdogs"], summary["errors"], summary["wall_sec"],
+        summary["throughput_turns_per_sec"], summary["meta"]["session_dir"],
+    ))
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from config import JOURNAL_DURABILITY, JOURNAL_FLUSH_MS
+from src.logger import debug, error, exc
+
+TAG = "JOURNAL"
+
+DURABILITY_RECORD = "record"      # flush after every batch of records
+DURABILITY_INTERVAL = "interval"  # flush at most every flush_ms
+DURABILITY_TURN = "turn"          # flush + fsync when a turn is closed
+
+_OP_APPEND = "append"
+_OP_REPLACE = "replace"
+_OP_END_TURN = "end_turn"
+_OP_CLOSE = "close"
+_OP_BARRIER = "barrier"
+_OP_STOP = "stop"
+
+# Files kept open at once; the least recently written is flushed and closed
+# past this (many bridge sessions, or sessions archived by retention).
+MAX_OPEN_FILES = 64
+
+
+class Journal:
+    """
+    Append-only JSONL writer running on a background thread.
+
+    Callers only serialise and enqueue; the writer thread owns every file
+    handle, batches queued records, and applies the durability policy. At
+    most `max_open` handles stay open; close_path() releases one early.
+    """
+
+    def __init__(self, durability=None, flush_ms=None, max_batch=256, max_open=MAX_OPEN_FILES):
+        self.durability = durability or JOURNAL_DURABILITY
+        if self.durability not in (DURABILITY_RECORD, DURABILITY_INTERVAL, DURABILITY_TURN):
+            raise ValueError("Unknown journal durability: {}".format(self.durability))
+        self.flush_sec = max(0.001, float(JOURNAL_FLUSH_MS if flush_ms is None else flush_ms) / 1000.0)
+        self.max_batch = max(1, int(max_batch))
+        self.max_open = max(1, int(max_open))
+
+        self._queue = queue.Queue()
+        self._handles = OrderedDict()
+        self._dirty = set()
+        self._unflushed = []
+        self._last_flush = time.monotonic()
+        self._closed = False
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+        self._stats_lock = threading.Lock()
+        self._records_written = 0
+        self._batches_written = 0
+        self._write_errors = 0
+        self._latency_last_ms = None
+        self._latency_max_ms = 0.0
+        self._latency_total_ms = 0.0
+
+    # ---------------------------------------------------------
+    # Caller side — enqueue only
+    # ---------------------------------------------------------
+    def append(self, path, record, **dumps_kwargs):
+        line = json.dumps(record, **dumps_kwargs) + "\n"
+        self._put((_OP_APPEND, path, line, time.monotonic()))
+
+    def replace(self, path, text):
+        """Atomically replace path with text (tmp file + rename) on the writer thread."""
+        self._put((_OP_REPLACE, path, text, time.monotonic()))
+
+    def end_turn(self, path=None):
+        """Turn boundary: flushes (and under the turn policy, fsyncs) pending records."""
+        self._put((_OP_END_TURN, path, None, time.monotonic()))
+
+    def close_path(self, path):
+        """Flush, fsync and close path's handle once everything queued for it is written."""
+        self._put((_OP_CLOSE, path, None, time.monotonic()))
+
+    def flush(self, timeout=5.0):
+        """Block until everything enqueued so far has been written and flushed."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._put((_OP_BARRIER, None, done, time.monotonic()))
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        with self._start_lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is None:
+            return
+        self._queue.put((_OP_STOP, None, None, time.monotonic()))
+        thread.join(timeout)
+        if thread.is_alive():
+            error(TAG, "Writer thread did not stop within {:.1f}s".format(timeout))
+
+    def stats(self):
+        with self._stats_lock:
+            written = self._records_written
+            return {
+                "durability": self.durability,
+                "queue_depth": self._queue.qsize(),
+                "records_written": written,
+                "batches_written": self._batches_written,
+                "write_errors": self._write_errors,
+                "write_latency_ms_last": self._latency_last_ms,
+                "write_latency_ms_avg": (self._latency_total_ms / written) if written else None,
+                "write_latency_ms_max": self._latency_max_ms,
+            }
+
+    def _put(self, item):
+        if self._closed:
+            error(TAG, "Journal closed; dropping {} for {}".format(item[0], item[1]))
+            return
+        self._ensure_started()
+        self._queue.put(item)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+                self._thread.start()
+
+    # ---------------------------------------------------------
+    # Writer thread
+    # ---------------------------------------------------------
+    def _run(self):
+        debug(TAG, "Writer started (durability={}, flush_ms={:.0f})".format(self.durability, self.flush_sec * 1000.0))
+        running = True
+        while running:
+            timeout = self.flush_sec if self._dirty else None
+            try:
+                batch = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                self._flush_dirty(fsync=False)
+                continue
+
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for op, path, payload, enqueued_at in batch:
+                try:
+                    if op == _OP_APPEND:
+                        self._handle(path).write(payload)
+                        self._dirty.add(path)
+                        self._unflushed.append(enqueued_at)
+                    elif op == _OP_REPLACE:
+                        self._write_replace(path, payload)
+                        self._record_written([enqueued_at])
+                    elif op == _OP_END_TURN:
+                        self._flush_dirty(fsync=self.durability == DURABILITY_TURN)
+                    elif op == _OP_CLOSE:
+                        self._close_handle(path, fsync=True)
+                    elif op == _OP_BARRIER:
+                        self._flush_dirty(fsync=False)
+                        payload.set()
+                    elif op == _OP_STOP:
+                        running = False
+                except Exception as e:
+                    with self._stats_lock:
+                        self._write_errors += 1
+                    exc(TAG, e, "Journal {} failed for {}".format(op, path))
+
+            with self._stats_lock:
+                self._batches_written += 1
+
+            if self.durability == DURABILITY_RECORD:
+                self._flush_dirty(fsync=False)
+            elif time.monotonic() - self._last_flush >= self.flush_sec:
+                self._flush_dirty(fsync=False)
+
+        self._flush_dirty(fsync=True)
+        for f in self._handles.values():
+            try:
+                f.close()
+            except Exception:
+                pass
+        self._handles.clear()
+        debug(TAG, "Writer stopped")
+
+    def _handle(self, path):
+        f = self._handles.get(path)
+        if f is not None:
+            self._handles.move_to_end(path)
+            return f
+        while len(self._handles) >= self.max_open:
+            oldest = next(iter(self._handles))
+            debug(TAG, "Closing {} ({} files open)", oldest, len(self._handles))
+            try:
+                self._close_handle(oldest, fsync=self.durability == DURABILITY_TURN)
+            except Exception as e:
+                with self._stats_lock:
+                    self._write_errors += 1
+                exc(TAG, e, "Journal close failed for {}".format(oldest))
+        f = open(path, "a", encoding="utf-8")
+        self._handles[path] = f
+        return f
+
+    def _close_handle(self, path, fsync):
+        f = self._handles.pop(path, None)
+        self._dirty.discard(path)
+        if f is None:
+            return
+        try:
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        finally:
+            f.close()
+
+    def _write_replace(self, path, text):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def _flush_dirty(self, fsync):
+        for path in list(self._dirty):
+            f = self._handles.get(path)
+            if f is None:
+                continue
+            try:
+                f.flush()
+                if fsync:
+                    os.fsync(f.fileno())
+            except Exception as e:
+                with self._stats_lock:
+                    self._write_errors += 1
+                exc(TAG, e, "Journal flush failed for {}".format(path))
+        self._dirty.clear()
+        self._last_flush = time.monotonic()
+        if self._unflushed:
+            self._record_written(self._unflushed)
+            self._unflushed = []
+
+    def _record_written(self, enqueued_times):
+        now = time.monotonic()
+        with self._stats_lock:
+            for t in enqueued_times:
+                latency_ms = (now - t) * 1000.0
+                self._records_written += 1
+                self._latency_last_ms = latency_ms
+                self._latency_total_ms += latency_ms
+                if latency_ms > self._latency_max_ms:
+                    self._latency_max_ms = latency_ms
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_journal():
+    """Process-wide journal shared by the conversation log and bridge events."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = Journal()
+                atexit.register(_shared.close)
+    return _shared
+
+
+def shutdown(timeout=5.0):
+    if _shared is not None:
+        _shared.close(timeout=timeout)
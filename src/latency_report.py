@@ -0,0 +1,82 @@
+import argparse
+import glob
+import json
+import os
+import sys
+
+import numpy as np
+
+from config import SESSIONS_DIR
+from src.turn_timing import RENDER_GATE_STAGES, STAGE_SPANS
+
+PERCENTILES = (50, 90, 99)
+
+
+def _iter_turn_records(paths):
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+
+
+def collect_stage_durations(paths):
+    stages = {}
+    for record in _iter_turn_records(paths):
+        for stage, value in (record.get("stage_durations_sec") or {}).items():
+            if value is not None:
+                stages.setdefault(stage, []).append(float(value))
+    return stages
+
+
+def stage_percentiles(stages):
+    report = {}
+    for stage, values in stages.items():
+        arr = np.asarray(values, dtype=np.float64)
+        pct = np.percentile(arr, PERCENTILES)
+        report[stage] = {"n": int(arr.size)}
+        for p, v in zip(PERCENTILES, pct):
+            report[stage]["p{}".format(p)] = round(float(v), 4)
+    return report
+
+
+def _stage_order(stage):
+    names = list(STAGE_SPANS) + list(RENDER_GATE_STAGES)
+    return names.index(stage) if stage in names else len(names)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m src.latency_report",
+        description="p50/p90/p99 per turn stage across session conversation logs.",
+    )
+    parser.add_argument("sessions", nargs="*", help="session directories (default: every session)")
+    parser.add_argument("--sessions-dir", default=SESSIONS_DIR)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    session_dirs = args.sessions or sorted(glob.glob(os.path.join(args.sessions_dir, "session_*")))
+    paths = [os.path.join(d, "conversation_log.jsonl") for d in session_dirs]
+    report = stage_percentiles(collect_stage_durations(paths))
+
+    if args.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+        return 0
+
+    print("{:<22} {:>6} {:>9} {:>9} {:>9}".format("stage", "n", "p50 s", "p90 s", "p99 s"))
+    for stage in sorted(report, key=_stage_order):
+        row = report[stage]
+        print("{:<22} {:>6} {:>9.3f} {:>9.3f} {:>9.3f}".format(stage, row["n"], row["p50"], row["p90"], row["p99"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
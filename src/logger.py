@@ -1,29 +1,261 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
 import traceback
+from collections import deque
 from datetime import datetime
 
-DEBUG = False
+from config import LOG_JSON_BACKUPS, LOG_JSON_MAX_BYTES, LOG_JSON_PATH, LOG_LEVEL, LOG_QUEUE_MAX
 
+DEBUG, INFO, ERROR = 10, 20, 40
+LEVELS = {"debug": DEBUG, "info": INFO, "error": ERROR}
+_LEVEL_NAMES = {v: k for k, v in LEVELS.items()}
 
-def _ts():
-    return datetime.now().strftime("%H:%M:%S.%f")[:-3]
+# The writer also wakes on its own this often, so messages queued by
+# nowait() (which never signals it) are written within this delay.
+_POLL_SEC = 0.05
 
+_level = LEVELS.get(LOG_LEVEL, INFO)
+# Records are (time, level, tag, msg, args, exc_text). deque append/popleft
+# are atomic, so producers never take a lock; the bound is checked
+# without one and is approximate under contention.
+_queue = deque()
+_queue_max = LOG_QUEUE_MAX
+_dropped = 0
+_wake = threading.Event()
+_writer = None
+_writer_lock = threading.Lock()
+_write_lock = threading.Lock()
+_json = None
 
-def debug(tag, msg):
-    if DEBUG:
-        print(f"[{_ts()}] [{tag}] {msg}")
 
+def set_level(level):
+    """Change the minimum level at runtime ("debug", "info", "error" or a number)."""
+    global _level
+    _level = LEVELS[level.lower()] if isinstance(level, str) else int(level)
 
-def info(tag, msg):
-    print(f"[{_ts()}] [{tag}] {msg}")
 
+def get_level():
+    return _LEVEL_NAMES.get(_level, _level)
 
-def error(tag, msg):
-    print(f"[{_ts()}] [{tag} ERROR] {msg}")
 
+def is_enabled(level):
+    return level >= _level
 
-def exc(tag, e, msg=None):
-    if msg:
-        error(tag, f"{msg}: {repr(e)}")
+
+# ---------------------------------------------------------
+# Output
+# ---------------------------------------------------------
+class _RotatingJsonFile:
+    """JSON lines, rotated to path.1 … path.<backups> once the file passes max_bytes."""
+
+    def __init__(self, path, max_bytes, backups):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.f = open(path, "a", encoding="utf-8")
+
+    def write(self, record):
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if self.max_bytes and self.f.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self.f.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = "{}.{}".format(self.path, i)
+            if os.path.exists(src):
+                os.replace(src, "{}.{}".format(self.path, i + 1))
+        if self.backups > 0:
+            os.replace(self.path, self.path + ".1")
+        else:
+            os.remove(self.path)
+        self.f = open(self.path, "a", encoding="utf-8")
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+def _format(msg, args):
+    if not args:
+        return str(msg)
+    try:
+        return str(msg).format(*args)
+    except Exception as e:
+        return "{} {!r} (format failed: {!r})".format(msg, args, e)
+
+
+def _write(records):
+    """Write records to the console (and JSON file). Caller holds _write_lock."""
+    global _dropped
+    if _dropped:
+        n, _dropped = _dropped, 0
+        records = [(time.time(), ERROR, "LOG", "Dropped {} messages (queue full)".format(n), (), None)] + records
+    for t, level, tag, msg, args, exc_text in records:
+        text = _format(msg, args)
+        stamp = datetime.fromtimestamp(t)
+        label = "{} ERROR".format(tag) if level >= ERROR else tag
+        sys.stdout.write("[{}] [{}] {}\n".format(stamp.strftime("%H:%M:%S.%f")[:-3], label, text))
+        if exc_text:
+            sys.stderr.write(exc_text)
+        if _json is not None:
+            record = {"ts": stamp.isoformat(timespec="microseconds"), "level": _LEVEL_NAMES.get(level, level),
+                      "tag": tag, "msg": text}
+            if exc_text:
+                record["exc"] = exc_text
+            try:
+                _json.write(record)
+            except OSError:
+                pass
+    sys.stdout.flush()
+    if _json is not None:
+        _json.flush()
+
+
+def _drain(extra=None):
+    with _write_lock:
+        batch = []
+        while _queue:
+            try:
+                batch.append(_queue.popleft())
+            except IndexError:
+                break
+        if extra is not None:
+            batch.append(extra)
+        if batch or _dropped:
+            _write(batch)
+
+
+def _run_writer():
+    while True:
+        _wake.wait(_POLL_SEC)
+        _wake.clear()
+        try:
+            _drain()
+        except Exception:
+            # Never let a bad record kill the writer.
+            traceback.print_exc()
+
+
+def _enqueue(record, wake):
+    global _dropped
+    if len(_queue) >= _queue_max:
+        _dropped += 1
+        return
+    _queue.append(record)
+    if wake:
+        _wake.set()
+
+
+def _emit(level, tag, msg, args, exc_text=None):
+    record = (time.time(), level, tag, msg, args, exc_text)
+    if _writer is None:
+        # Synchronous: anything nowait() queued goes out first, in order.
+        _drain(record)
     else:
-        error(tag, repr(e))
-    traceback.print_exc()
+        _enqueue(record, wake=True)
+
+
+# ---------------------------------------------------------
+# Setup
+# ---------------------------------------------------------
+def start():
+    """
+    Move console/file output to a background writer so callers only append
+    to a queue. Long-running apps call this at startup; short CLIs stay
+    synchronous so their log lines and print() output keep their order.
+    """
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                t = threading.Thread(target=_run_writer, name="log-writer", daemon=True)
+                t.start()
+                atexit.register(flush)
+                _writer = t
+    return _writer
+
+
+def flush(timeout=2.0):
+    """Write everything queued so far (inline when no writer is running)."""
+    if _writer is None:
+        _drain()
+        return True
+    deadline = time.monotonic() + timeout
+    _wake.set()
+    while _queue and time.monotonic() < deadline:
+        time.sleep(0.005)
+    # The writer pops and writes under _write_lock, so this waits out its last batch.
+    with _write_lock:
+        pass
+    return not _queue
+
+
+def configure(level=None, json_path=None, json_max_bytes=None, json_backups=None, queue_max=None):
+    """Set the level, the rotating JSON log file (json_path="" turns it off) and the queue bound."""
+    global _json, _queue_max
+    if level is not None:
+        set_level(level)
+    if queue_max is not None:
+        _queue_max = int(queue_max)
+    if json_path is not None:
+        with _write_lock:
+            if _json is not None:
+                _json.close()
+            _json = None
+            if json_path:
+                _json = _RotatingJsonFile(
+                    json_path,
+                    LOG_JSON_MAX_BYTES if json_max_bytes is None else json_max_bytes,
+                    LOG_JSON_BACKUPS if json_backups is None else json_backups,
+                )
+
+
+if LOG_JSON_PATH:
+    configure(json_path=LOG_JSON_PATH)
+
+
+# ---------------------------------------------------------
+# Logging calls
+# ---------------------------------------------------------
+# msg may use str.format placeholders filled from args; the string is only
+# built once the level check has passed (on the writer thread after start()).
+def debug(tag, msg, *args):
+    if _level <= DEBUG:
+        _emit(DEBUG, tag, msg, args)
+
+
+def info(tag, msg, *args):
+    if _level <= INFO:
+        _emit(INFO, tag, msg, args)
+
+
+def error(tag, msg, *args):
+    if _level <= ERROR:
+        _emit(ERROR, tag, msg, args)
+
+
+def exc(tag, e, msg=None):
+    if _level > ERROR:
+        return
+    # The traceback has to be captured now, before the handler returns.
+    text = "{}: {!r}".format(msg, e) if msg else repr(e)
+    _emit(ERROR, tag, text, (), traceback.format_exc())
+
+
+def nowait(tag, msg, *args, level=ERROR):
+    """
+    For realtime threads (audio callbacks): only appends to the queue, never
+    formats, writes, signals or blocks, and drops the message when the queue
+    is full. The writer picks it up within _POLL_SEC; without a writer it
+    waits for the next flush() or start().
+    """
+    if level >= _level:
+        _enqueue((time.time(), level, tag, msg, args, None), wake=False)
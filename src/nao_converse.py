@@ -1,5 +1,3 @@
-import requests
-
 from config import (
     CONVERSE_MODEL,
     CONVERSE_INTERLOCUTOR,
@@ -12,6 +10,14 @@ from src.logger import debug, error
 
 TAG = "UQPY3"
 _UNSET = object()
+_api_base = UQ_PY3_API_BASE
+
+
+def configure(api_base=None):
+    """Point /converse at another server (e.g. the src.converse_stub stand-in)."""
+    global _api_base
+    if api_base:
+        _api_base = api_base
 
 
 def segments_to_text(segments_list):
@@ -34,6 +40,7 @@ def converse(
     interlocutor=_UNSET,
     ephemeral_system=None,
     watchdog_mode=False,
+    traceparent=None,
 ):
     safe_interlocutor = None
     if interlocutor is not _UNSET:
@@ -56,17 +63,22 @@ def converse(
     if watchdog_mode:
         payload["watchdog_mode"] = True
 
-    url = UQ_PY3_API_BASE.rstrip("/") + "/converse"
+    url = _api_base.rstrip("/") + "/converse"
     debug(TAG, "POST {}".format(url))
     connect_timeout: float = float(CONNECT_TIMEOUT_SEC)
     read_timeout: float = float(READ_TIMEOUT_SEC)
     timeout: tuple[float, float] = (connect_timeout, read_timeout)
 
+    # Imported here: requests (and urllib3/certifi) is ~0.1s of GUI startup otherwise.
+    import requests
+
     try:
         response = requests.post(
             url,
             json=payload,
             timeout=timeout,
+            # Lets /converse log its work under the turn's trace (see src.tracing).
+            headers={"traceparent": traceparent} if traceparent else None,
         )
         response.raise_for_status()
         data = response.json()
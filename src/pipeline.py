@@ -0,0 +1,376 @@
+import itertools
+import queue
+import threading
+import time
+
+from src.logger import debug, exc
+
+TAG = "PIPE"
+
+# Values a stage function may return besides None ("go on to the next stage").
+HOLD = "hold"  # park the item until resume(key)
+DONE = "done"  # skip the remaining stages
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_HELD = "held"
+STATUS_DONE = "done"
+STATUS_ERROR = "error"
+STATUS_CANCELLED = "cancelled"
+
+_STOP = object()
+
+
+class PipelineFull(Exception):
+    pass
+
+
+class Stage:
+    """
+    One step of the pipeline. `workers` long-lived threads take items from a
+    queue of at most `queue_size` (0 = unbounded). Items keep their order
+    through a stage only when it has a single worker. Stages marked `always`
+    still run for items that failed or were cancelled earlier (cleanup,
+    finalising the turn log).
+    """
+
+    __slots__ = ("name", "fn", "workers", "queue_size", "always")
+
+    def __init__(self, name, fn, workers=1, queue_size=4, always=False):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, int(workers))
+        self.queue_size = max(0, int(queue_size))
+        self.always = bool(always)
+
+
+class PipelineItem:
+    __slots__ = (
+        "key", "kind", "data", "status", "stage", "error", "submitted_at", "finished_at",
+        "stage_sec", "cancelled", "_next", "_resume_requested", "_done",
+    )
+
+    def __init__(self, key, kind, data):
+        self.key = key
+        self.kind = kind
+        self.data = data
+        self.status = STATUS_QUEUED
+        self.stage = None
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.finished_at = None
+        self.stage_sec = {}
+        self.cancelled = threading.Event()
+        self._next = None
+        self._resume_requested = False
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+    def describe(self):
+        out = {"key": self.key, "kind": self.kind, "status": self.status, "stage": self.stage, "stage_sec": dict(self.stage_sec)}
+        if self.finished_at is not None:
+            out["total_sec"] = round(self.finished_at - self.submitted_at, 4)
+        if self.error is not None:
+            out["error"] = self.error
+        return out
+
+
+class Pipeline:
+    """
+    Staged executor for turns: each stage has its own worker pool and bounded
+    queue, so there is no thread per turn and queue depth is visible.
+
+    on_progress(item, stage_name) runs after every stage that ran and
+    on_complete(item) once per item. Both go through `dispatch` (e.g.
+    lambda fn: root.after(0, fn) to land on the Tk thread); by default they
+    run on the worker thread.
+
+    resume() and cancel() never block, so they are safe on the Tk thread:
+    when the next stage's queue is full the item is handed to a router
+    thread that waits for room.
+    """
+
+    def __init__(self, name, stages, on_progress=None, on_complete=None, dispatch=None):
+        if not stages:
+            raise ValueError("pipeline needs at least one stage")
+        self.name = name
+        self.stages = list(stages)
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+        self._dispatch = dispatch
+        self._index = {s.name: i for i, s in enumerate(self.stages)}
+        self._queues = [queue.Queue(maxsize=s.queue_size) for s in self.stages]
+        self._counters = [{"processed": 0, "errors": 0, "busy": 0, "busy_sec": 0.0} for _ in self.stages]
+        self._items = {}
+        self._seq = itertools.count(1)
+        self._completed = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._threads = []
+        for i, stage in enumerate(self.stages):
+            threads = []
+            for n in range(stage.workers):
+                t = threading.Thread(
+                    target=self._worker, args=(i,), name="{}-{}-{}".format(name, stage.name, n), daemon=True
+                )
+                t.start()
+                threads.append(t)
+            self._threads.append(threads)
+        self._handoff = queue.Queue()
+        self._router = threading.Thread(target=self._run_router, name="{}-router".format(name), daemon=True)
+        self._router.start()
+
+    # ---------------------------------------------------------
+    # Producer side
+    # ---------------------------------------------------------
+    def submit(self, data=None, key=None, kind="turn", start=None, block=False, timeout=None):
+        """
+        Queue an item at the first stage (or `start`). Raises PipelineFull if
+        that stage's queue is full and block is False (or timeout expires).
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("pipeline {} is closed".format(self.name))
+            if key is None:
+                key = next(self._seq)
+            if key in self._items:
+                raise ValueError("item {!r} is already in the pipeline".format(key))
+            item = PipelineItem(key, kind, {} if data is None else data)
+            self._items[key] = item
+        idx = self._index[start] if start is not None else 0
+        try:
+            self._queues[idx].put(item, block=block, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self._items.pop(key, None)
+            raise PipelineFull("stage {} queue is full".format(self.stages[idx].name))
+        return item
+
+    def get(self, key):
+        with self._lock:
+            return self._items.get(key)
+
+    def resume(self, key):
+        """Release a held item into its next stage. Safe to call before the hold lands."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return False
+            if item.status != STATUS_HELD:
+                item._resume_requested = True
+                return True
+            item.status = STATUS_QUEUED
+            nxt = item._next
+        self._route_nowait(item, nxt)
+        return True
+
+    def cancel(self, key):
+        """Cancel an item: remaining stages are skipped except `always` ones."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return False
+            item.cancelled.set()
+            held = item.status == STATUS_HELD
+            if held:
+                item.status = STATUS_QUEUED
+            nxt = item._next
+        if held:
+            self._route_nowait(item, nxt)
+        return True
+
+    def _route_nowait(self, item, idx):
+        if not self._route(item, idx, block=False):
+            self._handoff.put((item, idx))
+
+    def _run_router(self):
+        while True:
+            entry = self._handoff.get()
+            if entry is _STOP:
+                return
+            item, idx = entry
+            try:
+                self._route(item, idx)
+            except Exception as e:
+                exc(TAG, e, "{}: routing failed for {!r}".format(self.name, item.key))
+
+    # ---------------------------------------------------------
+    # Workers
+    # ---------------------------------------------------------
+    def _worker(self, idx):
+        q = self._queues[idx]
+        while True:
+            item = q.get()
+            if item is _STOP:
+                return
+            try:
+                self._run(idx, item)
+            except Exception as e:
+                exc(TAG, e, "{}: routing failed for {!r}".format(self.name, item.key))
+
+    def _run(self, idx, item):
+        stage = self.stages[idx]
+        if (item.failed or item.cancelled.is_set()) and not stage.always:
+            self._route(item, idx + 1)
+            return
+
+        counters = self._counters[idx]
+        item.stage = stage.name
+        item.status = STATUS_RUNNING
+        result = None
+        t0 = time.perf_counter()
+        with self._lock:
+            counters["busy"] += 1
+        try:
+            result = stage.fn(item)
+        except Exception as e:
+            exc(TAG, e, "{}: stage {} failed for {!r}".format(self.name, stage.name, item.key))
+            item.error = repr(e)
+            with self._lock:
+                counters["errors"] += 1
+        finally:
+            dt = time.perf_counter() - t0
+            item.stage_sec[stage.name] = round(dt, 4)
+            with self._lock:
+                counters["busy"] -= 1
+                counters["processed"] += 1
+                counters["busy_sec"] += dt
+
+        if result == DONE:
+            self._emit(self.on_progress, item, stage.name)
+            self._finish(item)
+            return
+
+        if result == HOLD and not item.failed:
+            with self._lock:
+                if not item._resume_requested and not item.cancelled.is_set():
+                    item.status = STATUS_HELD
+                    item._next = idx + 1
+                    held = True
+                else:
+                    item._resume_requested = False
+                    held = False
+            # Progress goes out after the hold is recorded, so a callback may resume straight away.
+            self._emit(self.on_progress, item, stage.name)
+            if held:
+                return
+            self._route(item, idx + 1)
+            return
+
+        self._emit(self.on_progress, item, stage.name)
+        self._route(item, idx + 1)
+
+    def _route(self, item, idx, block=True):
+        """Queue the item at stage `idx` (or finish it). Returns False only if block is False and the queue is full."""
+        skipping = item.failed or item.cancelled.is_set()
+        while idx < len(self.stages) and skipping and not self.stages[idx].always:
+            idx += 1
+        if idx >= len(self.stages):
+            self._finish(item)
+            return True
+        item.status = STATUS_QUEUED
+        # Blocking put: a full downstream queue holds this worker back (backpressure).
+        try:
+            self._queues[idx].put(item, block=block)
+        except queue.Full:
+            return False
+        return True
+
+    def _finish(self, item):
+        if item.cancelled.is_set():
+            item.status = STATUS_CANCELLED
+        elif item.failed:
+            item.status = STATUS_ERROR
+        else:
+            item.status = STATUS_DONE
+        item.finished_at = time.monotonic()
+        with self._lock:
+            self._items.pop(item.key, None)
+            self._completed += 1
+        item._done.set()
+        debug(TAG, "{}: {!r} {} in {:.3f}s {}",
+              self.name, item.key, item.status, item.finished_at - item.submitted_at, item.stage_sec)
+        self._emit(self.on_complete, item)
+
+    def _emit(self, callback, *args):
+        if callback is None:
+            return
+
+        def call():
+            try:
+                callback(*args)
+            except Exception as e:
+                exc(TAG, e, "{}: callback failed".format(self.name))
+
+        if self._dispatch is None:
+            call()
+            return
+        try:
+            self._dispatch(call)
+        except Exception as e:
+            exc(TAG, e, "{}: dispatch failed".format(self.name))
+
+    # ---------------------------------------------------------
+    # Introspection and shutdown
+    # ---------------------------------------------------------
+    def pending(self):
+        with self._lock:
+            return len(self._items)
+
+    def stats(self):
+        with self._lock:
+            stages = {}
+            for i, stage in enumerate(self.stages):
+                c = self._counters[i]
+                stages[stage.name] = {
+                    "workers": stage.workers,
+                    "queue_depth": self._queues[i].qsize(),
+                    "queue_size": stage.queue_size,
+                    "busy": c["busy"],
+                    "processed": c["processed"],
+                    "errors": c["errors"],
+                    "busy_sec": round(c["busy_sec"], 4),
+                }
+            held = sum(1 for item in self._items.values() if item.status == STATUS_HELD)
+            return {
+                "name": self.name,
+                "in_flight": len(self._items),
+                "held": held,
+                "completed": self._completed,
+                "stages": stages,
+            }
+
+    def close(self, wait=True, timeout=None):
+        """
+        Stop accepting items, cancel held ones and stop the workers stage by
+        stage once the items already queued have passed through.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            held = [item.key for item in self._items.values() if item.status == STATUS_HELD]
+        for key in held:
+            self.cancel(key)
+
+        def stop():
+            deadline = None if timeout is None else time.monotonic() + timeout
+            # Items the router still holds go out before the first stage is stopped.
+            self._handoff.put(_STOP)
+            self._router.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            for i, threads in enumerate(self._threads):
+                for _ in threads:
+                    self._queues[i].put(_STOP)
+                for t in threads:
+                    t.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+        if wait:
+            stop()
+        else:
+            threading.Thread(target=stop, name="{}-close".format(self.name), daemon=True).start()
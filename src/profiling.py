@@ -0,0 +1,175 @@
+import argparse
+import cProfile
+import glob
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from config import PROFILE_ENABLED, PROFILE_SAMPLE_RATIO, PROFILE_ALLOC_TOP
+from src.logger import debug, exc
+
+TAG = "PROFILE"
+
+PROFILES_DIRNAME = "profiles"
+
+# tracemalloc is process-wide, so overlapping profiled sections share one trace.
+_trace_lock = threading.Lock()
+_trace_users = 0
+# Only one section is CPU-profiled at a time (see _cpu_acquire).
+_cpu_lock = threading.Lock()
+_cpu_busy = False
+
+
+def _trace_acquire():
+    global _trace_users
+    with _trace_lock:
+        if _trace_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _trace_users += 1
+
+
+def _trace_release():
+    global _trace_users
+    with _trace_lock:
+        _trace_users -= 1
+        if _trace_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def _cpu_acquire():
+    """
+    A started cProfile.Profile, or None if another section is already being
+    CPU-profiled. On Python 3.12+ cProfile is process-wide and a second
+    enable() raises ValueError, so overlapping sections (several robots,
+    pipeline stages) only take allocation snapshots.
+    """
+    global _cpu_busy
+    with _cpu_lock:
+        if _cpu_busy:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Some other profiler (e.g. an outside tool) is active.
+            return None
+        _cpu_busy = True
+        return profiler
+
+
+def _cpu_release(profiler):
+    global _cpu_busy
+    with _cpu_lock:
+        profiler.disable()
+        _cpu_busy = False
+
+
+def should_profile():
+    if not PROFILE_ENABLED:
+        return False
+    return random.random() < float(PROFILE_SAMPLE_RATIO)
+
+
+def _unique_base(profiles_dir, label):
+    base = os.path.join(profiles_dir, label)
+    n = 2
+    candidate = base
+    while os.path.exists(candidate + ".prof"):
+        candidate = "{}_{}".format(base, n)
+        n += 1
+    return candidate
+
+
+@contextmanager
+def profile_section(session_dir, label):
+    """
+    CPU-profile and allocation-snapshot the enclosed block when profiling is
+    enabled and this call is sampled. Writes <label>.prof and
+    <label>_alloc.txt under <session_dir>/profiles. Profiling never fails the
+    block: if setup fails, or another section holds the CPU profiler, the
+    block runs with whatever could be started.
+    """
+    if not session_dir or not should_profile():
+        yield
+        return
+
+    profiler = None
+    before = None
+    traced = False
+    t0 = time.perf_counter()
+    try:
+        _trace_acquire()
+        traced = True
+        before = tracemalloc.take_snapshot()
+        profiler = _cpu_acquire()
+    except Exception as e:
+        exc(TAG, e, "Could not start profiling {}".format(label))
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            _cpu_release(profiler)
+        elapsed = time.perf_counter() - t0
+        try:
+            if before is not None:
+                _write_profile(session_dir, label, elapsed, profiler, before, tracemalloc.take_snapshot())
+        except Exception as e:
+            exc(TAG, e, "Failed to write profile for {}".format(label))
+        finally:
+            if traced:
+                _trace_release()
+
+
+def _write_profile(session_dir, label, elapsed, profiler, before, after):
+    profiles_dir = os.path.join(session_dir, PROFILES_DIRNAME)
+    os.makedirs(profiles_dir, exist_ok=True)
+    base = _unique_base(profiles_dir, label)
+    if profiler is not None:
+        profiler.dump_stats(base + ".prof")
+    with open(base + "_alloc.txt", "w", encoding="utf-8") as f:
+        f.write("# {} ({:.3f}s){}\n".format(
+            label, elapsed, "" if profiler is not None else " - no CPU profile, another section held the profiler"
+        ))
+        for stat in after.compare_to(before, "lineno")[:PROFILE_ALLOC_TOP]:
+            f.write(str(stat) + "\n")
+    debug(TAG, "Wrote profile {} ({:.3f}s)".format(base, elapsed))
+
+
+def summarize(session_dir, top=25, sort="cumulative"):
+    paths = sorted(glob.glob(os.path.join(session_dir, PROFILES_DIRNAME, "*.prof")))
+    if not paths:
+        return None
+    out = io.StringIO()
+    stats = pstats.Stats(paths[0], stream=out)
+    for path in paths[1:]:
+        stats.add(path)
+    out.write("Merged {} profiles from {}\n".format(len(paths), session_dir))
+    stats.strip_dirs().sort_stats(sort).print_stats(top)
+    return out.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python3 -m src.profiling")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_sum = sub.add_parser("summarize", help="merge a session's profiles and show the hottest functions")
+    p_sum.add_argument("session_dir")
+    p_sum.add_argument("--top", type=int, default=25)
+    p_sum.add_argument("--sort", default="cumulative", help="pstats sort key (cumulative, tottime, calls, ...)")
+    args = parser.parse_args(argv)
+
+    report = summarize(args.session_dir, top=args.top, sort=args.sort)
+    if report is None:
+        print("No profiles in {}".format(os.path.join(args.session_dir, PROFILES_DIRNAME)))
+        return 1
+    print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import deque
+
+TAG = "PUSH"
+
+
+class PushEvent:
+    __slots__ = ("seq", "kind", "data", "published_at", "sent_at", "acked_at")
+
+    def __init__(self, seq, kind, data):
+        self.seq = seq
+        self.kind = kind
+        self.data = data
+        self.published_at = time.monotonic()
+        self.sent_at = None
+        self.acked_at = None
+
+
+class PushChannel:
+    """
+    Sequenced, replayable event log for one robot.
+
+    Every published event gets the next sequence number. Subscribers read
+    everything after the last sequence they saw, so a robot that reconnects
+    with Last-Event-ID (or ?since=) gets the events it missed. Acks are
+    cumulative. Only the newest `replay` events are kept; a subscriber that
+    asks for older ones is told where the gap is and should recover those
+    turns from the file inbox.
+    """
+
+    def __init__(self, replay=1024):
+        self._events = deque(maxlen=int(replay))
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._acked_seq = 0
+        self._subscribers = 0
+        self._closed = False
+
+    def publish(self, kind, data):
+        with self._cond:
+            self._seq += 1
+            self._events.append(PushEvent(self._seq, kind, data))
+            self._cond.notify_all()
+            return self._seq
+
+    def _oldest_seq(self):
+        return self._events[0].seq if self._events else self._seq + 1
+
+    def events_after(self, since, timeout=None):
+        """
+        Wait up to `timeout` for events with seq > since. Returns
+        (events, missed) where missed is the (first, last) range no longer
+        retained, or None.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._seq <= since and not self._closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            oldest = self._oldest_seq()
+            missed = (since + 1, oldest - 1) if since + 1 < oldest else None
+            events = [ev for ev in self._events if ev.seq > since]
+            return events, missed
+
+    def mark_sent(self, event):
+        if event.sent_at is None:
+            event.sent_at = time.monotonic()
+
+    def ack(self, seq):
+        """Acknowledge everything up to `seq`; returns the events newly acked."""
+        now = time.monotonic()
+        with self._cond:
+            seq = min(int(seq), self._seq)
+            if seq <= self._acked_seq:
+                return []
+            acked = [ev for ev in self._events if self._acked_seq < ev.seq <= seq]
+            for ev in acked:
+                ev.acked_at = now
+            self._acked_seq = seq
+            return acked
+
+    @property
+    def acked_seq(self):
+        return self._acked_seq
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def subscribe(self):
+        with self._cond:
+            self._subscribers += 1
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    def close(self):
+        """Wake every subscriber so their streams end (e.g. on shutdown)."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "last_seq": self._seq,
+                "acked_seq": self._acked_seq,
+                "oldest_replayable_seq": self._oldest_seq(),
+                "subscribers": self._subscribers,
+            }
@@ -0,0 +1,325 @@
+import argparse
+import difflib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from config import ROBOT_INBOX_DIRNAME, SAMPLE_RATE, SESSIONS_DIR
+from src.audio_sources import AudioSource, Utterance, read_wav
+from src.latency_report import PERCENTILES, _iter_turn_records
+from src.logger import debug, info
+
+TAG = "REPLAY"
+
+# Replayed sessions are written here rather than next to the recorded ones, so
+# the session index and latency reports over SESSIONS_DIR don't pick them up.
+DEFAULT_REPLAY_DIR = os.path.join(SESSIONS_DIR, "replays")
+
+# Stages compared between the recording and the replay.
+COMPARE_STAGES = ("asr", "converse", "tts_render", "release_to_playback", "total")
+
+
+class RecordedTurn:
+    """One participant turn of a recorded session, from conversation_log.jsonl and input_turn_NNN.wav."""
+
+    __slots__ = ("turn", "user", "ai_text", "participant_duration_sec", "stage_durations_sec", "audio_path", "saved_at")
+
+    def __init__(self, record, session_dir):
+        self.turn = int(record["turn"])
+        self.user = record.get("user") or ""
+        self.ai_text = record.get("ai_text") or ""
+        self.participant_duration_sec = float(record.get("participant_duration_sec") or 0.0)
+        self.stage_durations_sec = record.get("stage_durations_sec") or {}
+        path = os.path.join(session_dir, "input_turn_{:03d}.wav".format(self.turn))
+        # Turns too short or too quiet for Whisper were never saved.
+        self.audio_path = path if os.path.isfile(path) else None
+        self.saved_at = os.path.getmtime(path) if self.audio_path else None
+
+    def audio(self):
+        if self.audio_path:
+            return read_wav(self.audio_path)
+        # Silence of the recorded length still consumes a turn number and skips ASR, as it did live.
+        return np.zeros(int(self.participant_duration_sec * SAMPLE_RATE), dtype=np.float32)
+
+    @property
+    def released_at(self):
+        """Wall-clock button release, from when the input WAV was written."""
+        if self.saved_at is None:
+            return None
+        return self.saved_at - float(self.stage_durations_sec.get("capture_save") or 0.0)
+
+
+def load_session(session_dir):
+    path = os.path.join(session_dir, "conversation_log.jsonl")
+    if not os.path.isfile(path):
+        raise ValueError("no conversation_log.jsonl in {}".format(session_dir))
+    turns = [RecordedTurn(r, session_dir) for r in _iter_turn_records([path]) if r.get("turn") is not None]
+    turns.sort(key=lambda t: t.turn)
+    return turns
+
+
+def recorded_gaps(turns):
+    """
+    Idle seconds after each turn in the original session: from the end of a
+    turn's processing to the start of the next recording. Unknown (no WAV on
+    either side) counts as no gap.
+    """
+    gaps = []
+    for prev, nxt in zip(turns, turns[1:]):
+        gap = 0.0
+        if prev.released_at is not None and nxt.released_at is not None:
+            prev_done = prev.released_at + float(prev.stage_durations_sec.get("total") or 0.0)
+            next_start = nxt.released_at - nxt.participant_duration_sec
+            gap = max(0.0, next_start - prev_done)
+        gaps.append(gap)
+    return gaps + [0.0]
+
+
+class SessionSource(AudioSource):
+    """A recorded session's turns, with its original gaps when `paced`."""
+
+    def __init__(self, turns, paced=True):
+        self.turns = list(turns)
+        self.gaps = recorded_gaps(self.turns) if paced else [0.0] * len(self.turns)
+
+    def utterances(self):
+        for turn, gap in zip(self.turns, self.gaps):
+            yield Utterance("turn_{:03d}".format(turn.turn), turn.audio(), gap)
+
+
+class RecordedTranscriber:
+    """
+    Returns the recorded transcript of each turn that reached ASR, in order,
+    after sleeping like a model with the given real-time factor. For timing
+    replays where Whisper is unavailable or beside the point.
+    """
+
+    def __init__(self, turns, realtime_factor=0.05):
+        self.texts = [t.user for t in turns if t.audio_path]
+        self.realtime_factor = float(realtime_factor)
+        self.calls = 0
+
+    def __call__(self, audio):
+        time.sleep(self.realtime_factor * float(len(audio)) / float(SAMPLE_RATE))
+        text = self.texts[self.calls] if self.calls < len(self.texts) else ""
+        self.calls += 1
+        return text
+
+
+# ---------------------------------------------------------
+# Comparison
+# ---------------------------------------------------------
+def transcript_diff(original, replayed):
+    """(similarity 0..1 over words, inline diff with [-removed-] {+added+}) of two transcripts."""
+    a, b = original.split(), replayed.split()
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    parts = []
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            parts.extend(a[i1:i2])
+            continue
+        if i2 > i1:
+            parts.append("[-{}-]".format(" ".join(a[i1:i2])))
+        if j2 > j1:
+            parts.append("{{+{}+}}".format(" ".join(b[j1:j2])))
+    return round(matcher.ratio(), 4), " ".join(parts)
+
+
+def compare(turns, replay_log_path):
+    replayed = {r["turn"]: r for r in _iter_turn_records([replay_log_path]) if r.get("turn") is not None}
+    rows = []
+    for t in turns:
+        r = replayed.get(t.turn)
+        row = {"turn": t.turn, "replayed": r is not None, "original_user": t.user}
+        if r is not None:
+            similarity, diff = transcript_diff(t.user, r.get("user") or "")
+            row.update({
+                "replay_user": r.get("user") or "",
+                "transcript_match": t.user.strip() == (r.get("user") or "").strip(),
+                "similarity": similarity,
+                "diff": diff,
+                "replay_ai_text": r.get("ai_text"),
+            })
+        stages = {}
+        for stage in COMPARE_STAGES:
+            before = t.stage_durations_sec.get(stage)
+            after = (r or {}).get("stage_durations_sec", {}).get(stage)
+            if before is None and after is None:
+                continue
+            delta = round(after - before, 4) if before is not None and after is not None else None
+            stages[stage] = {"original": before, "replay": after, "delta": delta}
+        row["stages"] = stages
+        rows.append(row)
+    return rows
+
+
+def summarize(rows):
+    done = [r for r in rows if r["replayed"]]
+    summary = {
+        "turns": len(rows),
+        "replayed": len(done),
+        "transcripts_changed": sum(1 for r in done if not r["transcript_match"]),
+        "mean_similarity": round(float(np.mean([r["similarity"] for r in done])), 4) if done else None,
+        "stages": {},
+    }
+    for stage in COMPARE_STAGES:
+        entry = {}
+        for side in ("original", "replay", "delta"):
+            values = [r["stages"][stage][side] for r in rows if stage in r["stages"]]
+            values = np.asarray([v for v in values if v is not None], dtype=np.float64)
+            if values.size:
+                pct = np.percentile(values, PERCENTILES)
+                entry[side] = {"p{}".format(p): round(float(v), 4) for p, v in zip(PERCENTILES, pct)}
+        if entry:
+            summary["stages"][stage] = entry
+    return summary
+
+
+# ---------------------------------------------------------
+# Replay
+# ---------------------------------------------------------
+def replay_session(session_dir, speed=0.0, robot_enabled=None, robot_name=None, transcriber=None,
+                   converse="recorded", converse_latency=None, robot_latency=None, sessions_dir=None,
+                   manual_gate_sec=0.0):
+    """
+    Feed a recorded session's turns through the current pipeline and compare
+    transcripts and stage timings with the original log.
+
+    speed 1 keeps the original pacing (utterance length and idle gaps), 0
+    replays as fast as possible. converse="recorded" serves the original
+    replies from a local /converse (or stand-in robot), "live" uses the
+    configured endpoint. converse_latency / robot_latency of None replay
+    the recorded converse times; a number fixes them.
+    """
+    from src import nao_converse
+    from src.benchmark import StandInRobot
+    from src.converse_stub import ConverseStub
+    from src.headless import HeadlessRunner
+
+    turns = load_session(session_dir)
+    if robot_enabled is None:
+        robot_enabled = os.path.isdir(os.path.join(session_dir, ROBOT_INBOX_DIRNAME))
+    replies = {t.turn: t.ai_text for t in turns}
+    recorded_converse = {t.turn: float(t.stage_durations_sec.get("converse") or 0.0) for t in turns}
+
+    stub = None
+    if converse == "recorded" and not robot_enabled:
+        if converse_latency is None:
+            stub = ConverseStub(replies=replies, latencies=recorded_converse)
+        else:
+            stub = ConverseStub(replies=replies, latency_sec=converse_latency)
+        nao_converse.configure(api_base=stub.start())
+
+    robots = []
+
+    def attach_robot(convo):
+        if converse != "recorded" or not convo.robot_enabled:
+            return
+        if robot_latency is None:
+            robot = StandInRobot(convo.to_robot_dir, convo.from_robot_dir, replies=replies, latencies=recorded_converse)
+        else:
+            robot = StandInRobot(convo.to_robot_dir, convo.from_robot_dir, latency_sec=robot_latency, replies=replies)
+        robot.start()
+        robots.append(robot)
+
+    runner = HeadlessRunner(
+        SessionSource(turns, paced=speed > 0),
+        robot_enabled=robot_enabled,
+        robot_name=robot_name,
+        speed=speed,
+        transcriber=transcriber,
+        sessions_dir=sessions_dir or DEFAULT_REPLAY_DIR,
+        # Watchdog prompts depend on live silence, not on anything recorded.
+        watchdog=False,
+        manual_gate_sec=manual_gate_sec,
+        on_session=attach_robot,
+    )
+    info(TAG, "Replaying {} turns of {}".format(len(turns), session_dir))
+    try:
+        run = runner.run()
+    finally:
+        for robot in robots:
+            robot.stop()
+        if stub is not None:
+            stub.stop()
+
+    rows = compare(turns, runner.convo.log_path)
+    debug(TAG, "Compared {} turns against {}".format(len(rows), runner.convo.log_path))
+    return {
+        "meta": dict(run["meta"], original_session_dir=session_dir, converse=converse),
+        "wall_sec": run["wall_sec"],
+        "errors": run["errors"],
+        "summary": summarize(rows),
+        "turns": rows,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m src.replay",
+        description="Replay a recorded session through the current pipeline; compare latency and transcripts.",
+    )
+    parser.add_argument("session_dir")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = original pacing, 0 = as fast as possible")
+    parser.add_argument("--mode", choices=("computer", "robot"), help="default: the mode the session was recorded in")
+    parser.add_argument("--robot-name")
+    parser.add_argument("--asr", choices=("whisper", "recorded"), default="whisper",
+                        help="'recorded' returns the original transcripts (timing-only replay)")
+    parser.add_argument("--asr-rtf", type=float, default=0.05, help="seconds per second of audio for --asr recorded")
+    parser.add_argument("--converse", choices=("recorded", "live"), default="recorded")
+    parser.add_argument("--converse-latency", type=float, metavar="SEC",
+                        help="fixed reply latency instead of the recorded converse times")
+    parser.add_argument("--tts", choices=("say", "null"), default="null")
+    parser.add_argument("--manual-gate-sec", type=float, default=0.0)
+    parser.add_argument("--sessions-dir", help="where the replayed session is written (default: sessions/replays)")
+    parser.add_argument("--out", help="write the full comparison as JSON")
+    args = parser.parse_args(argv)
+
+    from src import tts_engine
+
+    tts_engine.configure(backend=args.tts)
+    transcriber = None
+    if args.asr == "recorded":
+        transcriber = RecordedTranscriber(load_session(args.session_dir), args.asr_rtf)
+
+    result = replay_session(
+        os.path.abspath(args.session_dir),
+        speed=args.speed,
+        robot_enabled=None if args.mode is None else args.mode == "robot",
+        robot_name=args.robot_name,
+        transcriber=transcriber,
+        converse=args.converse,
+        converse_latency=args.converse_latency,
+        robot_latency=args.converse_latency,
+        sessions_dir=args.sessions_dir,
+        manual_gate_sec=args.manual_gate_sec,
+    )
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+
+    for row in result["turns"]:
+        if not row["replayed"]:
+            print("turn {:03d}: not replayed".format(row["turn"]))
+            continue
+        total = row["stages"].get("total", {})
+        print("turn {:03d}: total {} -> {} s{}".format(
+            row["turn"], total.get("original"), total.get("replay"),
+            "" if row["transcript_match"] else "  transcript: " + row["diff"],
+        ))
+    s = result["summary"]
+    info(TAG, "{}/{} turns replayed, {} transcripts changed (similarity {}) in {:.3f}s -> {}".format(
+        s["replayed"], s["turns"], s["transcripts_changed"], s["mean_similarity"], result["wall_sec"],
+        result["meta"]["session_dir"],
+    ))
+    for stage, entry in s["stages"].items():
+        if "delta" in entry:
+            info(TAG, "{:<20} p50 {:+.3f}s  p90 {:+.3f}s".format(stage, entry["delta"]["p50"], entry["delta"]["p90"]))
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
+import shutil
+
+from src import deadline, tts_engine
 from src.audio_io import get_audio_duration
 from src.logger import debug, exc
-from src.tts_engine import speak
 
 
 TAG_ROBOT = "ROBOT"
@@ -9,30 +11,66 @@ TAG_LOG = "LOG"
 
 
 class ResponseAdapter:
-    def prepare_reply(self, convo, turn_id, text):
+    """
+    How a turn's reply is produced and delivered. After prepare_reply the
+    turn goes through render_reply -> play_reply -> finalize_turn; the turn
+    pipeline runs these as separate stages, complete_turn runs them inline.
+    """
+
+    def prepare_reply(self, convo, turn_id, text, on_late=None):
+        """
+        Returns (reply, outpath). on_late() is called if the reply is overdue
+        (see TURN_DEADLINE_SEC) while it is still being generated.
+        """
         raise NotImplementedError
 
-    def complete_turn(self, convo, turn_id, reply, outpath):
-        raise NotImplementedError
+    def render_reply(self, convo, turn_id, reply, outpath):
+        """Returns the rendered audio path, or None if there is nothing to play."""
+        return None
 
+    def play_reply(self, convo, turn_id, audio_path):
+        pass
 
-class LocalResponseAdapter(ResponseAdapter):
-    def prepare_reply(self, convo, turn_id, text):
-        return convo.reply_only(turn_id, text)
+    def finalize_turn(self, convo, turn_id, audio_path):
+        raise NotImplementedError
 
     def complete_turn(self, convo, turn_id, reply, outpath):
-        if not outpath:
-            try:
-                convo.finalize_turn_log(turn_id, None)
-            except Exception as e:
-                exc(TAG_LOG, e, msg="finalize_turn_log failed (no TTS path)")
-            return
-
+        audio_path = None
         try:
-            speak(reply, outpath)
+            audio_path = self.render_reply(convo, turn_id, reply, outpath)
+            if audio_path:
+                self.play_reply(convo, turn_id, audio_path)
+        except Exception as e:
+            exc(TAG_TTS, e, msg="TTS worker failed")
+            audio_path = None
+        self.finalize_turn(convo, turn_id, audio_path)
+
 
+class LocalResponseAdapter(ResponseAdapter):
+    def prepare_reply(self, convo, turn_id, text, on_late=None):
+        return convo.reply_only(turn_id, text, on_late=on_late)
+
+    def render_reply(self, convo, turn_id, reply, outpath):
+        if not outpath:
+            return None
+        cached = deadline.get_phrase_cache().path_for(reply)
+        if cached:
+            # The fallback reply is pre-rendered; copy it rather than running TTS again.
+            convo.mark_stage(turn_id, "tts_render_start")
+            path = outpath if outpath.endswith(".aiff") else outpath + ".aiff"
+            shutil.copyfile(cached, path)
+            convo.mark_stage(turn_id, "tts_render_end")
+            return path
+        return tts_engine.render(reply, outpath, on_stage=lambda stage: convo.mark_stage(turn_id, stage))
+
+    def play_reply(self, convo, turn_id, audio_path):
+        tts_engine.play(audio_path, on_stage=lambda stage: convo.mark_stage(turn_id, stage))
+
+    def finalize_turn(self, convo, turn_id, audio_path):
+        ai_duration = None
+        if audio_path:
             try:
-                ai_duration = get_audio_duration(outpath)
+                ai_duration = get_audio_duration(audio_path)
                 if ai_duration is not None:
                     debug(TAG_TTS, f"AI audio duration: {ai_duration:.3f} sec")
                 else:
@@ -41,30 +79,32 @@ class LocalResponseAdapter(ResponseAdapter):
                 exc(TAG_TTS, e, msg="Could not get AI audio duration")
                 ai_duration = None
 
+        try:
             convo.finalize_turn_log(turn_id, ai_duration)
-
         except Exception as e:
-            exc(TAG_TTS, e, msg="TTS worker failed")
-            try:
-                convo.finalize_turn_log(turn_id, None)
-            except Exception as e2:
-                exc(TAG_LOG, e2, msg="finalize_turn_log failed after TTS failure")
+            exc(TAG_LOG, e, msg="finalize_turn_log failed")
 
 
 class RobotResponseAdapter(ResponseAdapter):
     def __init__(self, wait_for_done):
         self.wait_for_done = bool(wait_for_done)
 
-    def prepare_reply(self, convo, turn_id, text):
+    def prepare_reply(self, convo, turn_id, text, on_late=None):
+        # The robot speaks for itself, so there is no holding phrase to play here.
         if not self.wait_for_done:
             convo.set_pending_ai_text(turn_id, "(sent to robot)")
             return "(sent to robot)", None
 
+        # The robot runner calls /converse itself, so its reply wait is the converse stage.
+        convo.mark_stage(turn_id, "converse_start")
         try:
             done = convo.wait_for_robot_done(turn_id)
         except Exception as e:
             exc(TAG_ROBOT, e, msg="wait_for_robot_done failed")
             done = None
+        convo.mark_stage(turn_id, "converse_end")
+        # The robot speaks its own reply, so a late one can only be recorded here.
+        convo.check_deadline(turn_id, "converse")
 
         if done and done.get("ok"):
             segs = done.get("ai_segments_list") or []
@@ -77,7 +117,7 @@ class RobotResponseAdapter(ResponseAdapter):
         convo.set_pending_ai_text(turn_id, reply_text)
         return reply_text, None
 
-    def complete_turn(self, convo, turn_id, reply, outpath):
+    def finalize_turn(self, convo, turn_id, audio_path):
         try:
             convo.finalize_turn_log(turn_id, None)
         except Exception as e:
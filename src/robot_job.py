@@ -1,14 +1,15 @@
 import os
 import json
-from datetime import datetime
 
 from src.logger import debug, error
+from src.tracing import now_iso
 
 TAG = "ROBOTJOB"
 
 
 def _now_iso():
-    return datetime.now().isoformat(timespec="seconds")
+    # Microseconds: job files are lined up against bridge events and robot output in traces.
+    return now_iso()
 
 
 def ensure_dir(path):
@@ -31,14 +32,14 @@ def _atomic_write_json(final_path, payload):
             pass
 
 
-def write_input_job(inbox_dir, turn_id, robot_name, participant_text,
+def build_input_job(turn_id, robot_name, participant_text,
                     input_audio_path=None, participant_duration_sec=None,
-                    recording_started_at=None):
+                    recording_started_at=None, trace=None):
     """
-    Write a participant-input job JSON for the NAO repo to consume.
+    With a TurnTrace, the job gets its own span under the turn: trace_id,
+    span_id, parent_span_id and a W3C traceparent the robot runner should
+    forward (on its /converse call) and copy into its output JSON.
     """
-    ensure_dir(inbox_dir)
-
     job = {
         "robot": robot_name,
         "created_at": _now_iso(),
@@ -48,8 +49,22 @@ def write_input_job(inbox_dir, turn_id, robot_name, participant_text,
         "recording_started_at": recording_started_at,
         "input_audio_path": input_audio_path,
     }
+    if trace is not None:
+        span_id, traceparent = trace.child()
+        job.update({
+            "trace_id": trace.trace_id,
+            "span_id": span_id,
+            "parent_span_id": trace.span_id,
+            "traceparent": traceparent,
+        })
+    return job
 
-    final_path = os.path.join(inbox_dir, "turn_{:04d}_input.json".format(int(turn_id)))
+
+def write_job(inbox_dir, job):
+    """Write an already-built input job to turn_NNNN_input.json in inbox_dir."""
+    ensure_dir(inbox_dir)
+
+    final_path = os.path.join(inbox_dir, "turn_{:04d}_input.json".format(int(job["turn_id"])))
 
     try:
         _atomic_write_json(final_path, job)
@@ -58,3 +73,29 @@ def write_input_job(inbox_dir, turn_id, robot_name, participant_text,
     except Exception as e:
         error(TAG, "Failed to write input job: {}".format(repr(e)))
         return None
+
+
+def write_input_job(inbox_dir, turn_id, robot_name, participant_text,
+                    input_audio_path=None, participant_duration_sec=None,
+                    recording_started_at=None, trace=None):
+    """
+    Write a participant-input job JSON for the NAO repo to consume.
+    """
+    job = build_input_job(
+        turn_id,
+        robot_name,
+        participant_text,
+        input_audio_path=input_audio_path,
+        participant_duration_sec=participant_duration_sec,
+        recording_started_at=recording_started_at,
+        trace=trace,
+    )
+    return write_job(inbox_dir, job)
+
+
+def write_job_result(outbox_dir, turn_id, result):
+    """Write a robot result as turn_NNNN_output.json in outbox_dir."""
+    ensure_dir(outbox_dir)
+    final_path = os.path.join(outbox_dir, "turn_{:04d}_output.json".format(int(turn_id)))
+    _atomic_write_json(final_path, result)
+    return final_path
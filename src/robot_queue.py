@@ -0,0 +1,325 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from src.file_watch import get_watcher
+from src.logger import debug, error
+from src.robot_job import write_job, write_job_result
+
+TAG = "RQUEUE"
+
+QUEUE_DB_NAME = "robot_queue.sqlite3"
+
+STATE_PENDING = "pending"
+STATE_CLAIMED = "claimed"
+STATE_ACKED = "acked"
+STATE_DONE = "done"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    turn_id INTEGER NOT NULL UNIQUE,
+    robot TEXT,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    consumer TEXT,
+    claim_token TEXT,
+    visible_at REAL,
+    enqueued_at REAL NOT NULL,
+    claimed_at REAL,
+    acked_at REAL,
+    completed_at REAL,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, job_id);
+"""
+
+
+def _output_path(outbox_dir, turn_id):
+    return os.path.join(outbox_dir, "turn_{:04d}_output.json".format(int(turn_id)))
+
+
+def _read_output_file(path, deadline, poll_sec):
+    """Read a robot output file, retrying while a writer that doesn't rename is still writing it."""
+    while True:
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            if time.monotonic() >= deadline:
+                return None
+            debug(TAG, "Robot output not readable yet ({}); retrying".format(repr(e)))
+            time.sleep(min(poll_sec, max(0.0, deadline - time.monotonic())))
+
+
+class FileJobQueue:
+    """The original handoff: turn_NNNN_input.json into the inbox, turn_NNNN_output.json back."""
+
+    backend = "files"
+
+    def __init__(self, inbox_dir, outbox_dir):
+        self.inbox_dir = inbox_dir
+        self.outbox_dir = outbox_dir
+
+    def enqueue(self, job):
+        return write_job(self.inbox_dir, job)
+
+    def wait_result(self, turn_id, timeout_sec, poll_sec=0.05):
+        done_path = _output_path(self.outbox_dir, turn_id)
+        deadline = time.monotonic() + timeout_sec
+        if not get_watcher(poll_sec=poll_sec).wait_for(done_path, timeout_sec):
+            return None
+        return _read_output_file(done_path, deadline, poll_sec)
+
+    def stats(self):
+        names = os.listdir(self.inbox_dir) if os.path.isdir(self.inbox_dir) else []
+        done = os.listdir(self.outbox_dir) if os.path.isdir(self.outbox_dir) else []
+        return {
+            "backend": self.backend,
+            "enqueued": sum(1 for n in names if n.endswith("_input.json")),
+            "done": sum(1 for n in done if n.endswith("_output.json")),
+        }
+
+    def close(self):
+        pass
+
+
+class SqliteJobQueue:
+    """
+    Durable per-session robot job queue in SQLite (WAL).
+
+    Jobs are claimed oldest first. A claim is invisible to other consumers for
+    `visibility_sec`; if it is neither acked nor completed by then, the job is
+    handed out again (attempts counts deliveries). ack() confirms receipt and
+    stops redelivery; complete() stores the robot's result. Other processes
+    can open the same database and use claim/ack/complete directly.
+
+    With export_files, every job is also written as turn_NNNN_input.json and
+    results are also accepted from (and written to) turn_NNNN_output.json,
+    so file-based robots keep working.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, db_path, inbox_dir=None, outbox_dir=None, export_files=True, visibility_sec=30.0):
+        self.db_path = db_path
+        self.inbox_dir = inbox_dir
+        self.outbox_dir = outbox_dir
+        self.export_files = bool(export_files) and bool(inbox_dir and outbox_dir)
+        self.visibility_sec = float(visibility_sec)
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        # Wakes in-process claimers and result waiters; other processes are picked up by polling.
+        self._cond = threading.Condition()
+
+    def _notify(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    # ---------------------------------------------------------
+    # Producer side
+    # ---------------------------------------------------------
+    def enqueue(self, job):
+        payload = json.dumps(job, ensure_ascii=False)
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (turn_id, robot, payload, state, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+                (int(job["turn_id"]), job.get("robot"), payload, STATE_PENDING, time.time()),
+            )
+            job_id = cur.lastrowid
+        self._notify()
+        if self.export_files:
+            write_job(self.inbox_dir, job)
+        debug(TAG, "Enqueued turn {} as job {}".format(job["turn_id"], job_id))
+        return job_id
+
+    def wait_result(self, turn_id, timeout_sec, poll_sec=0.05):
+        deadline = time.monotonic() + timeout_sec
+        out_path = _output_path(self.outbox_dir, turn_id) if self.export_files else None
+        while True:
+            result = self.result(turn_id)
+            if result is not None:
+                return result
+            if out_path and os.path.exists(out_path):
+                result = _read_output_file(out_path, deadline, poll_sec)
+                if result is not None:
+                    self._complete_turn(turn_id, result, write_file=False)
+                return result
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if out_path:
+                # Completions normally write the output file too, but that export can fail after
+                # the result is stored, so the result is re-checked every poll_sec as well.
+                get_watcher(poll_sec=poll_sec).wait_for(out_path, min(poll_sec, remaining))
+            else:
+                with self._cond:
+                    self._cond.wait(min(poll_sec, remaining))
+
+    def result(self, turn_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM jobs WHERE turn_id = ? AND state = ?", (int(turn_id), STATE_DONE)
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    # ---------------------------------------------------------
+    # Consumer side
+    # ---------------------------------------------------------
+    def claim(self, consumer=None, visibility_sec=None, wait_sec=0.0):
+        """
+        Claim the oldest visible job. Returns {"job_id", "turn_id", "claim_token",
+        "attempts", "job"} or None if nothing became available within wait_sec.
+        """
+        visibility_sec = self.visibility_sec if visibility_sec is None else float(visibility_sec)
+        deadline = time.monotonic() + max(0.0, float(wait_sec))
+        while True:
+            claimed = self._try_claim(consumer, visibility_sec)
+            if claimed is not None:
+                return claimed
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            with self._cond:
+                # Short cap so jobs enqueued by another process are noticed too.
+                self._cond.wait(min(remaining, 0.05))
+
+    def _try_claim(self, consumer, visibility_sec):
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT job_id, turn_id, payload, attempts FROM jobs "
+                    "WHERE state = ? OR (state = ? AND visible_at <= ?) ORDER BY job_id LIMIT 1",
+                    (STATE_PENDING, STATE_CLAIMED, now),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                job_id, turn_id, payload, attempts = row
+                self._conn.execute(
+                    "UPDATE jobs SET state = ?, consumer = ?, claim_token = ?, visible_at = ?, "
+                    "claimed_at = ?, attempts = attempts + 1 WHERE job_id = ?",
+                    (STATE_CLAIMED, consumer, token, now + visibility_sec, now, job_id),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if attempts:
+            debug(TAG, "Redelivering turn {} (attempt {})".format(turn_id, attempts + 1))
+        return {
+            "job_id": job_id,
+            "turn_id": turn_id,
+            "claim_token": token,
+            "attempts": attempts + 1,
+            "job": json.loads(payload),
+        }
+
+    def ack(self, job_id, claim_token):
+        """Confirm receipt of a claimed job so it is not redelivered. Returns False for a stale claim."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET state = ?, acked_at = ? WHERE job_id = ? AND state = ? AND claim_token = ?",
+                (STATE_ACKED, time.time(), int(job_id), STATE_CLAIMED, claim_token),
+            )
+        return cur.rowcount == 1
+
+    def release(self, job_id, claim_token):
+        """Give a claimed job back immediately instead of waiting for its visibility timeout."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET state = ?, claim_token = NULL, visible_at = NULL "
+                "WHERE job_id = ? AND state = ? AND claim_token = ?",
+                (STATE_PENDING, int(job_id), STATE_CLAIMED, claim_token),
+            )
+        self._notify()
+        return cur.rowcount == 1
+
+    def complete(self, job_id, result, claim_token):
+        """
+        Store the robot's result for a job. Only the current claim may complete
+        it, so a job that is unclaimed, or was redelivered to another consumer,
+        is refused (False).
+        """
+        if not claim_token:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT turn_id FROM jobs WHERE job_id = ? AND state IN (?, ?) AND claim_token = ?",
+                (int(job_id), STATE_CLAIMED, STATE_ACKED, claim_token),
+            ).fetchone()
+        if row is None:
+            return False
+        return self._complete_turn(row[0], result, write_file=self.export_files)
+
+    def _complete_turn(self, turn_id, result, write_file):
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET state = ?, completed_at = ?, result = ? WHERE turn_id = ? AND state != ?",
+                (STATE_DONE, time.time(), json.dumps(result, ensure_ascii=False), int(turn_id), STATE_DONE),
+            )
+        if cur.rowcount != 1:
+            return False
+        self._notify()
+        if write_file:
+            try:
+                write_job_result(self.outbox_dir, turn_id, result)
+            except Exception as e:
+                error(TAG, "Failed to export output for turn {}: {}".format(turn_id, repr(e)))
+        return True
+
+    # ---------------------------------------------------------
+    # Introspection
+    # ---------------------------------------------------------
+    def pending(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, turn_id, state, attempts, visible_at FROM jobs WHERE state != ? ORDER BY job_id",
+                (STATE_DONE,),
+            ).fetchall()
+        return [
+            {"job_id": r[0], "turn_id": r[1], "state": r[2], "attempts": r[3], "visible_at": r[4]}
+            for r in rows
+        ]
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            lat = self._conn.execute(
+                "SELECT AVG(claimed_at - enqueued_at), MAX(claimed_at - enqueued_at) FROM jobs WHERE claimed_at IS NOT NULL"
+            ).fetchone()
+        return {
+            "backend": self.backend,
+            "export_files": self.export_files,
+            "states": counts,
+            "enqueue_to_claim_sec_avg": lat[0],
+            "enqueue_to_claim_sec_max": lat[1],
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_job_queue(backend, session_dir, inbox_dir, outbox_dir, export_files=True, visibility_sec=30.0):
+    if backend == "sqlite":
+        return SqliteJobQueue(
+            os.path.join(session_dir, QUEUE_DB_NAME),
+            inbox_dir=inbox_dir,
+            outbox_dir=outbox_dir,
+            export_files=export_files,
+            visibility_sec=visibility_sec,
+        )
+    return FileJobQueue(inbox_dir, outbox_dir)
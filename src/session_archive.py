@@ -0,0 +1,491 @@
+import argparse
+import io
+import json
+import mmap
+import os
+import re
+import shutil
+import socket
+import struct
+import sys
+import wave
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from config import SESSIONS_DIR, SESSION_ARCHIVE_AFTER_DAYS, SESSION_OWNER_FILENAME
+from src.logger import debug, error, info
+
+TAG = "ARCHIVE"
+
+ARCHIVE_EXT = ".vlcarc"
+ARCHIVE_DIRNAME = "archive"
+
+# Layout: header | entry blobs (aligned) | JSON index
+#   header = magic(8) + index_offset(u64) + index_length(u64)
+_MAGIC = b"VLCARC01"
+_HEADER = struct.Struct("<8sQQ")
+_ALIGN = 64
+
+_AUDIO_RE = re.compile(
+    r"^(?:(?P<io>input|output)_turn_(?P<turn>\d+)|watchdog_(?P<wturn>\d+)_(?P<wseq>\d+))\.(?:wav|aiff)$"
+)
+
+
+# ---------------------------------------------------------
+# Audio parsing (PCM payload + format, no resampling)
+# ---------------------------------------------------------
+def _read_wav_pcm(path):
+    with wave.open(path, "rb") as wf:
+        fmt = {
+            "sample_rate": wf.getframerate(),
+            "channels": wf.getnchannels(),
+            "sample_width": wf.getsampwidth(),
+            "byte_order": "<",
+            "frames": wf.getnframes(),
+        }
+        return fmt, wf.readframes(wf.getnframes())
+
+
+def _ieee_extended(raw):
+    exponent = ((raw[0] & 0x7F) << 8) | raw[1]
+    mantissa = int.from_bytes(raw[2:10], "big")
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    sign = -1.0 if raw[0] & 0x80 else 1.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+
+def _read_aiff_pcm(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != b"FORM" or data[8:12] not in (b"AIFF", b"AIFC"):
+        raise ValueError("not an AIFF file")
+
+    fmt = None
+    pcm = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        size = struct.unpack(">I", data[pos + 4:pos + 8])[0]
+        body = data[pos + 8:pos + 8 + size]
+        if chunk_id == b"COMM":
+            channels, frames, bits = struct.unpack(">hIh", body[:8])
+            byte_order = ">"
+            if data[8:12] == b"AIFC":
+                compression = body[18:22]
+                if compression == b"sowt":
+                    byte_order = "<"
+                elif compression != b"NONE":
+                    raise ValueError("compressed AIFF-C ({})".format(compression.decode("latin-1")))
+            fmt = {
+                "sample_rate": int(round(_ieee_extended(body[8:18]))),
+                "channels": channels,
+                "sample_width": (bits + 7) // 8,
+                "byte_order": byte_order,
+                "frames": frames,
+            }
+        elif chunk_id == b"SSND":
+            offset = struct.unpack(">I", body[:4])[0]
+            pcm = body[8 + offset:]
+        pos += 8 + size + (size & 1)
+
+    if fmt is None or pcm is None:
+        raise ValueError("missing COMM or SSND chunk")
+    return fmt, pcm[:fmt["frames"] * fmt["channels"] * fmt["sample_width"]]
+
+
+def _decode_pcm(buf, fmt, unsigned=False):
+    """
+    PCM bytes -> NumPy samples. 16/32-bit (and 8-bit) data is a zero-copy
+    view; 8-bit WAV is unsigned (silence at 128). 24-bit has no NumPy dtype,
+    so it is widened to int32 (same scale, one copy).
+    """
+    width = fmt["sample_width"]
+    if width == 3:
+        raw = np.frombuffer(buf, dtype=np.uint8).reshape(-1, 3)
+        wide = np.zeros((len(raw), 4), dtype=np.uint8)
+        # Into the top three bytes of a little-endian int32, then an arithmetic shift sign-extends.
+        wide[:, 1:] = raw if fmt["byte_order"] == "<" else raw[:, ::-1]
+        return wide.view("<i4").reshape(-1) >> 8
+    if width == 1:
+        return np.frombuffer(buf, dtype=np.uint8 if unsigned else np.int8)
+    if width not in (2, 4):
+        raise ValueError("unsupported PCM sample width: {} bytes".format(width))
+    return np.frombuffer(buf, dtype=np.dtype("{}i{}".format(fmt["byte_order"], width)))
+
+
+def _encode_pcm(samples, width):
+    """NumPy samples -> big-endian signed PCM bytes, as AIFF stores them."""
+    samples = np.asarray(samples).reshape(-1)
+    if width == 1:
+        if samples.dtype == np.uint8:
+            samples = samples.astype(np.int16) - 128
+        return samples.astype(np.int8).tobytes()
+    if width == 3:
+        wide = samples.astype("<i4").view(np.uint8).reshape(-1, 4)
+        return np.ascontiguousarray(wide[:, 2::-1]).tobytes()
+    if width not in (2, 4):
+        raise ValueError("unsupported PCM sample width: {} bytes".format(width))
+    return samples.astype(np.dtype(">i{}".format(width)), copy=False).tobytes()
+
+
+def _audio_meta(name):
+    m = _AUDIO_RE.match(name)
+    if not m:
+        return None
+    if m.group("io"):
+        return int(m.group("turn")), m.group("io")
+    return int(m.group("wturn")), "watchdog_{}".format(int(m.group("wseq")))
+
+
+# ---------------------------------------------------------
+# Writing
+# ---------------------------------------------------------
+def _collect_entries(session_dir):
+    audio = []
+    files = []
+    for root, _dirs, names in os.walk(session_dir):
+        for name in sorted(names):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, session_dir).replace(os.sep, "/")
+            meta = _audio_meta(name) if root == session_dir else None
+            if meta is None:
+                files.append((rel, path, None))
+            else:
+                audio.append((meta, rel, path))
+
+    # Sort so each turn's input, output and watchdog audio sit next to each other.
+    audio.sort(key=lambda item: (item[0][0], item[0][1]))
+    return [(rel, path, meta) for meta, rel, path in audio] + files
+
+
+def pack_session(session_dir, out_path=None, compress=False, remove_source=False):
+    session_dir = os.path.abspath(session_dir)
+    session_name = os.path.basename(session_dir.rstrip(os.sep))
+    if out_path is None:
+        out_dir = os.path.join(os.path.dirname(session_dir), ARCHIVE_DIRNAME)
+        os.makedirs(out_dir, exist_ok=True)
+        out_path = os.path.join(out_dir, session_name + ARCHIVE_EXT)
+
+    index = {
+        "version": 1,
+        "session": session_name,
+        "archived_at": datetime.now().isoformat(timespec="seconds"),
+        "entries": [],
+    }
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(_HEADER.pack(_MAGIC, 0, 0))
+        for rel, path, meta in _collect_entries(session_dir):
+            entry = {"name": rel}
+            payload = None
+            if meta is not None:
+                try:
+                    reader = _read_wav_pcm if rel.endswith(".wav") else _read_aiff_pcm
+                    fmt, payload = reader(path)
+                    if fmt["sample_width"] not in (1, 2, 3, 4):
+                        raise ValueError("unsupported PCM sample width: {} bytes".format(fmt["sample_width"]))
+                    entry.update({"kind": "audio", "turn": meta[0], "role": meta[1], "audio": fmt})
+                except Exception as e:
+                    debug(TAG, "Storing {} as raw file ({})".format(rel, e))
+                    payload = None
+            if payload is None:
+                with open(path, "rb") as f:
+                    payload = f.read()
+                entry["kind"] = "file"
+
+            entry["raw_length"] = len(payload)
+            entry["crc32"] = zlib.crc32(payload)
+            if compress:
+                packed = zlib.compress(payload, 6)
+                if len(packed) < len(payload):
+                    payload = packed
+                    entry["compression"] = "zlib"
+
+            pad = (-out.tell()) % _ALIGN
+            out.write(b"\0" * pad)
+            entry["offset"] = out.tell()
+            entry["length"] = len(payload)
+            out.write(payload)
+            index["entries"].append(entry)
+
+        index_bytes = json.dumps(index, ensure_ascii=False).encode("utf-8")
+        index_offset = out.tell()
+        out.write(index_bytes)
+        out.seek(0)
+        out.write(_HEADER.pack(_MAGIC, index_offset, len(index_bytes)))
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, out_path)
+
+    with SessionArchive(out_path) as archive:
+        archive.verify()
+
+    info(TAG, "Packed {} ({} entries) -> {}".format(session_name, len(index["entries"]), out_path))
+    if remove_source:
+        shutil.rmtree(session_dir)
+        debug(TAG, "Removed {}".format(session_dir))
+    return out_path
+
+
+# ---------------------------------------------------------
+# Reading
+# ---------------------------------------------------------
+class SessionArchive:
+    """Memory-mapped reader; uncompressed audio is returned as zero-copy NumPy views."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, index_offset, index_length = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            self.close()
+            raise ValueError("{} is not a session archive".format(path))
+        self.index = json.loads(bytes(self._mm[index_offset:index_offset + index_length]).decode("utf-8"))
+        self.session = self.index.get("session")
+        self._entries = {e["name"]: e for e in self.index["entries"]}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        mm, self._mm = getattr(self, "_mm", None), None
+        if mm is not None:
+            try:
+                mm.close()
+            except BufferError:
+                # NumPy views still reference the map; it is released when they are.
+                pass
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def names(self):
+        return list(self._entries)
+
+    def turns(self):
+        return sorted({e["turn"] for e in self._entries.values() if e.get("kind") == "audio"})
+
+    def entry(self, name):
+        try:
+            return self._entries[name]
+        except KeyError:
+            raise KeyError("{} not in archive {}".format(name, self.path))
+
+    def _buffer(self, entry):
+        view = memoryview(self._mm)[entry["offset"]:entry["offset"] + entry["length"]]
+        if entry.get("compression") == "zlib":
+            return zlib.decompress(view)
+        return view
+
+    def read_bytes(self, name):
+        return bytes(self._buffer(self.entry(name)))
+
+    def read_jsonl(self, name="conversation_log.jsonl"):
+        records = []
+        for line in io.StringIO(self.read_bytes(name).decode("utf-8")):
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+        return records
+
+    def audio(self, name):
+        entry = self.entry(name)
+        fmt = entry.get("audio")
+        if fmt is None:
+            raise ValueError("{} is not stored as PCM audio".format(name))
+        samples = _decode_pcm(self._buffer(entry), fmt, unsigned=name.endswith(".wav"))
+        if fmt["channels"] > 1:
+            samples = samples.reshape(-1, fmt["channels"])
+        return samples, fmt["sample_rate"]
+
+    def turn_audio(self, turn_id, role="input"):
+        for entry in self._entries.values():
+            if entry.get("kind") == "audio" and entry["turn"] == int(turn_id) and entry["role"] == role:
+                return self.audio(entry["name"])
+        return None
+
+    def verify(self):
+        for entry in self._entries.values():
+            if zlib.crc32(self._buffer(entry)) != entry["crc32"]:
+                raise ValueError("CRC mismatch for {} in {}".format(entry["name"], self.path))
+        return True
+
+    def extract(self, dest_dir):
+        """Unpack every entry back into the original session directory layout."""
+        for entry in self._entries.values():
+            target = os.path.join(dest_dir, *entry["name"].split("/"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fmt = entry.get("audio")
+            if fmt is not None and entry["name"].endswith(".wav"):
+                with wave.open(target, "wb") as wf:
+                    wf.setnchannels(fmt["channels"])
+                    wf.setsampwidth(fmt["sample_width"])
+                    wf.setframerate(fmt["sample_rate"])
+                    wf.writeframes(bytes(self._buffer(entry)))
+            elif fmt is not None:
+                samples, rate = self.audio(entry["name"])
+                _write_aiff(target, samples, rate, fmt)
+            else:
+                with open(target, "wb") as f:
+                    f.write(self._buffer(entry))
+
+
+def _write_aiff(path, samples, rate, fmt):
+    pcm = _encode_pcm(samples, fmt["sample_width"])
+    exponent = 16383 + 63
+    mantissa = int(rate)
+    while mantissa and not mantissa & (1 << 63):
+        mantissa <<= 1
+        exponent -= 1
+    rate_bytes = struct.pack(">HQ", exponent, mantissa)
+    comm = struct.pack(">hIh", fmt["channels"], fmt["frames"], fmt["sample_width"] * 8) + rate_bytes
+    ssnd = struct.pack(">II", 0, 0) + pcm
+    body = b"AIFF" + b"COMM" + struct.pack(">I", len(comm)) + comm + b"SSND" + struct.pack(">I", len(ssnd)) + ssnd
+    if len(ssnd) & 1:
+        body += b"\0"
+    with open(path, "wb") as f:
+        f.write(b"FORM" + struct.pack(">I", len(body)) + body)
+
+
+# ---------------------------------------------------------
+# Retention
+# ---------------------------------------------------------
+def _last_modified(session_dir):
+    """Newest mtime of the directory or anything in it: a session is only as old as its last write."""
+    latest = os.path.getmtime(session_dir)
+    for root, dirs, files in os.walk(session_dir):
+        for name in dirs + files:
+            try:
+                latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+            except OSError:
+                pass
+    return datetime.fromtimestamp(latest)
+
+
+def session_in_use(session_dir):
+    """True if the session's owner marker names a process on this host that is still running."""
+    try:
+        with open(os.path.join(session_dir, SESSION_OWNER_FILENAME), "r", encoding="utf-8") as f:
+            owner = json.load(f)
+        pid = int(owner.get("pid") or 0)
+    except (OSError, ValueError, TypeError, AttributeError):
+        return False
+    if pid <= 0 or owner.get("host") != socket.gethostname():
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _current_session(sessions_dir):
+    path = os.path.join(sessions_dir, "CURRENT_SESSION.txt")
+    try:
+        with open(path, "r") as f:
+            return os.path.realpath(f.read().strip())
+    except OSError:
+        return None
+
+
+def apply_retention(days=None, sessions_dir=None, compress=True, remove_source=True):
+    """
+    Archive every closed session not written to for `days`; returns archive
+    paths. The current session and sessions whose owning process is still
+    running (see session_in_use) are skipped, however old they are.
+    """
+    days = SESSION_ARCHIVE_AFTER_DAYS if days is None else days
+    if days is None:
+        return []
+    sessions_dir = sessions_dir or SESSIONS_DIR
+    if not os.path.isdir(sessions_dir):
+        return []
+
+    cutoff = datetime.now() - timedelta(days=float(days))
+    current = _current_session(sessions_dir)
+    archive_dir = os.path.join(sessions_dir, ARCHIVE_DIRNAME)
+    packed = []
+    for name in sorted(os.listdir(sessions_dir)):
+        session_dir = os.path.join(sessions_dir, name)
+        if not name.startswith("session_") or not os.path.isdir(session_dir):
+            continue
+        if current and os.path.realpath(session_dir) == current:
+            continue
+        if _last_modified(session_dir) >= cutoff:
+            continue
+        if session_in_use(session_dir):
+            debug(TAG, "Skipping {} (still open in a running process)".format(name))
+            continue
+        out_path = os.path.join(archive_dir, name + ARCHIVE_EXT)
+        if os.path.exists(out_path):
+            continue
+        os.makedirs(archive_dir, exist_ok=True)
+        try:
+            packed.append(pack_session(session_dir, out_path, compress=compress, remove_source=remove_source))
+        except Exception as e:
+            error(TAG, "Could not archive {}: {}".format(session_dir, repr(e)))
+    return packed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python3 -m src.session_archive")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_pack = sub.add_parser("pack", help="pack one closed session directory")
+    p_pack.add_argument("session_dir")
+    p_pack.add_argument("-o", "--output")
+    p_pack.add_argument("--compress", action="store_true")
+    p_pack.add_argument("--remove", action="store_true", help="delete the directory after verifying the archive")
+
+    p_ret = sub.add_parser("retention", help="archive sessions older than N days")
+    p_ret.add_argument("--days", type=float, default=SESSION_ARCHIVE_AFTER_DAYS)
+    p_ret.add_argument("--sessions-dir", default=SESSIONS_DIR)
+    p_ret.add_argument("--no-compress", action="store_true")
+    p_ret.add_argument("--keep", action="store_true", help="keep session directories after archiving")
+
+    p_list = sub.add_parser("list", help="show an archive's index")
+    p_list.add_argument("archive")
+
+    p_extract = sub.add_parser("extract", help="unpack an archive into a directory")
+    p_extract.add_argument("archive")
+    p_extract.add_argument("dest_dir")
+
+    args = parser.parse_args(argv)
+    if args.cmd == "pack":
+        if session_in_use(args.session_dir):
+            parser.error("{} is still open in a running process".format(args.session_dir))
+        print(pack_session(args.session_dir, args.output, compress=args.compress, remove_source=args.remove))
+    elif args.cmd == "retention":
+        if args.days is None:
+            parser.error("--days is required when VOICE_LLM_CHAT_SESSION_ARCHIVE_AFTER_DAYS is unset")
+        for path in apply_retention(args.days, args.sessions_dir, compress=not args.no_compress, remove_source=not args.keep):
+            print(path)
+    elif args.cmd == "list":
+        with SessionArchive(args.archive) as archive:
+            for e in archive.index["entries"]:
+                print("{:<40} {:>6} {:>10} {}".format(
+                    e["name"], e["kind"], e["raw_length"], e.get("compression") or "-"
+                ))
+    elif args.cmd == "extract":
+        with SessionArchive(args.archive) as archive:
+            archive.extract(args.dest_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
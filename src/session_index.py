@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+
+from config import ROBOT_INBOX_DIRNAME, SESSIONS_DIR
+from src.logger import debug, error, info
+
+TAG = "INDEX"
+
+DEFAULT_DB_PATH = os.path.join(SESSIONS_DIR, "sessions_index.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    session_dir TEXT NOT NULL,
+    condition TEXT,
+    robot TEXT,
+    first_seen_at REAL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL,
+    turn INTEGER NOT NULL,
+    user_text TEXT,
+    ai_text TEXT,
+    participant_duration_sec REAL,
+    ai_duration_sec REAL,
+    record_json TEXT,
+    PRIMARY KEY (session_id, turn)
+);
+CREATE TABLE IF NOT EXISTS bridge_events (
+    session_id TEXT NOT NULL,
+    byte_offset INTEGER NOT NULL,
+    ts TEXT,
+    event TEXT,
+    turn_id INTEGER,
+    robot TEXT,
+    transcript_nonempty INTEGER,
+    record_json TEXT,
+    PRIMARY KEY (session_id, byte_offset)
+);
+CREATE TABLE IF NOT EXISTS ingested_files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    byte_offset INTEGER NOT NULL,
+    inode INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_bridge_events_event ON bridge_events (event);
+"""
+
+_LOG_FILES = ("conversation_log.jsonl", "bridge_events.jsonl")
+
+
+def connect(db_path=None):
+    db_path = db_path or DEFAULT_DB_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    if "inode" not in {row[1] for row in conn.execute("PRAGMA table_info(ingested_files)")}:
+        conn.execute("ALTER TABLE ingested_files ADD COLUMN inode INTEGER")
+    return conn
+
+
+def _read_appended_lines(path, offset):
+    """Parse complete lines after offset; returns ([(line_offset, record)], new_offset)."""
+    records = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n")
+    if end < 0:
+        return records, offset
+    pos = 0
+    for raw in data[:end + 1].splitlines(keepends=True):
+        line_offset = offset + pos
+        pos += len(raw)
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            records.append((line_offset, json.loads(raw)))
+        except ValueError:
+            error(TAG, "Skipping malformed line at {}:{}".format(path, line_offset))
+    return records, offset + end + 1
+
+
+def _session_condition(session_dir):
+    return "robot" if os.path.isdir(os.path.join(session_dir, ROBOT_INBOX_DIRNAME)) else "computer"
+
+
+def _ensure_session(conn, session_id, session_dir):
+    conn.execute(
+        "INSERT OR IGNORE INTO sessions (session_id, session_dir, condition, first_seen_at) VALUES (?, ?, ?, ?)",
+        (session_id, session_dir, _session_condition(session_dir), os.path.getmtime(session_dir)),
+    )
+
+
+def _ingest_conversation(conn, session_id, records):
+    for _offset, r in records:
+        if r.get("turn") is None:
+            continue
+        conn.execute(
+            "INSERT OR REPLACE INTO turns VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                session_id,
+                int(r["turn"]),
+                r.get("user"),
+                r.get("ai_text"),
+                r.get("participant_duration_sec"),
+                r.get("ai_duration_sec"),
+                json.dumps(r, ensure_ascii=False),
+            ),
+        )
+
+
+def _ingest_bridge_events(conn, session_id, records):
+    for offset, r in records:
+        nonempty = r.get("transcript_nonempty")
+        conn.execute(
+            "INSERT OR REPLACE INTO bridge_events VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                session_id,
+                offset,
+                r.get("ts"),
+                r.get("event"),
+                r.get("turn_id"),
+                r.get("robot"),
+                None if nonempty is None else int(bool(nonempty)),
+                json.dumps(r, ensure_ascii=False, sort_keys=True),
+            ),
+        )
+        if r.get("robot"):
+            conn.execute(
+                "UPDATE sessions SET robot = ? WHERE session_id = ? AND robot IS NULL",
+                (r["robot"], session_id),
+            )
+
+
+def update_index(sessions_dir=None, db_path=None):
+    """Ingest bytes appended to every session log since the last run. Returns stats."""
+    sessions_dir = sessions_dir or SESSIONS_DIR
+    stats = {"sessions": 0, "files_read": 0, "bytes_read": 0, "records": 0}
+    conn = connect(db_path)
+    try:
+        known = {
+            path: (mtime, size, offset, inode)
+            for path, mtime, size, offset, inode in conn.execute(
+                "SELECT path, mtime, size, byte_offset, inode FROM ingested_files"
+            )
+        }
+        for name in sorted(os.listdir(sessions_dir)):
+            session_dir = os.path.join(sessions_dir, name)
+            if not name.startswith("session_") or not os.path.isdir(session_dir):
+                continue
+            stats["sessions"] += 1
+
+            for log_name in _LOG_FILES:
+                path = os.path.join(session_dir, log_name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+                prev_mtime, prev_size, offset, prev_inode = known.get(path, (None, None, 0, None))
+                if prev_mtime == st.st_mtime and prev_size == st.st_size and prev_inode in (None, st.st_ino):
+                    continue
+                restart = offset > 0 and (st.st_size < offset or prev_inode not in (None, st.st_ino))
+                if restart:
+                    # Truncated, or replaced by a new file (rotated): start over for this file.
+                    debug(TAG, "Re-reading {} from the start".format(path))
+                    offset = 0
+
+                records, new_offset = _read_appended_lines(path, offset)
+                with conn:
+                    _ensure_session(conn, name, session_dir)
+                    if log_name == "conversation_log.jsonl":
+                        _ingest_conversation(conn, name, records)
+                    else:
+                        if restart:
+                            # Events are keyed by byte offset, which the old file's rows no longer match.
+                            conn.execute("DELETE FROM bridge_events WHERE session_id = ?", (name,))
+                        _ingest_bridge_events(conn, name, records)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO ingested_files (path, mtime, size, byte_offset, inode) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (path, st.st_mtime, st.st_size, new_offset, st.st_ino),
+                    )
+                stats["files_read"] += 1
+                stats["bytes_read"] += new_offset - offset
+                stats["records"] += len(records)
+    finally:
+        conn.close()
+    return stats
+
+
+# ---------------------------------------------------------
+# Common aggregates
+# ---------------------------------------------------------
+def _median_by(conn, sql):
+    groups = {}
+    for key, value in conn.execute(sql):
+        if value is not None:
+            groups.setdefault(key, []).append(value)
+    return [
+        {"group": key, "n": len(values), "median": statistics.median(values)}
+        for key, values in sorted(groups.items(), key=lambda kv: str(kv[0]))
+    ]
+
+
+def query_participant_duration(conn):
+    return _median_by(
+        conn,
+        "SELECT s.condition, t.participant_duration_sec FROM turns t JOIN sessions s USING (session_id)",
+    )
+
+
+def query_ai_duration(conn):
+    return _median_by(
+        conn,
+        "SELECT s.condition, t.ai_duration_sec FROM turns t JOIN sessions s USING (session_id)",
+    )
+
+
+def query_turns_per_session(conn):
+    return [
+        {"session_id": sid, "condition": cond, "turns": n}
+        for sid, cond, n in conn.execute(
+            "SELECT s.session_id, s.condition, COUNT(t.turn) FROM sessions s "
+            "LEFT JOIN turns t USING (session_id) GROUP BY s.session_id ORDER BY s.session_id"
+        )
+    ]
+
+
+def query_empty_transcripts(conn):
+    return [
+        {"robot": robot, "stops": n, "empty": empty, "empty_rate": (float(empty) / n) if n else None}
+        for robot, n, empty in conn.execute(
+            "SELECT COALESCE(robot, '?'), COUNT(*), SUM(transcript_nonempty = 0) FROM bridge_events "
+            "WHERE event = 'recording_stopped' GROUP BY COALESCE(robot, '?')"
+        )
+    ]
+
+
+QUERIES = {
+    "participant-duration": query_participant_duration,
+    "ai-duration": query_ai_duration,
+    "turns-per-session": query_turns_per_session,
+    "empty-transcripts": query_empty_transcripts,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python3 -m src.session_index")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_update = sub.add_parser("update", help="ingest new or appended session logs")
+    p_update.add_argument("--sessions-dir", default=SESSIONS_DIR)
+
+    p_query = sub.add_parser("query", help="run a canned aggregate")
+    p_query.add_argument("name", choices=sorted(QUERIES))
+
+    p_sql = sub.add_parser("sql", help="run an ad-hoc read-only SQL statement")
+    p_sql.add_argument("statement")
+
+    args = parser.parse_args(argv)
+    if args.cmd == "update":
+        stats = update_index(args.sessions_dir, args.db)
+        info(TAG, "Indexed {sessions} sessions: {files_read} files, {bytes_read} new bytes, {records} records".format(**stats))
+        return 0
+
+    conn = connect(args.db)
+    try:
+        if args.cmd == "query":
+            for row in QUERIES[args.name](conn):
+                print(json.dumps(row, ensure_ascii=False))
+        else:
+            conn.execute("PRAGMA query_only=ON")
+            for row in conn.execute(args.statement):
+                print("\t".join("" if v is None else str(v) for v in row))
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from src.logger import debug, info
+
+TAG = "STARTUP"
+
+# Reference point for every offset: as close to process start as this module gets imported.
+_T0 = time.perf_counter()
+
+
+class StartupTrace:
+    """
+    Timeline of startup phases. Phases may run on different threads and
+    overlap; each records its start offset, duration and thread.
+    """
+
+    def __init__(self, t0=None):
+        self.t0 = _T0 if t0 is None else t0
+        self._phases = []
+        self._marks = {}
+        self._lock = threading.Lock()
+
+    def now(self):
+        return time.perf_counter() - self.t0
+
+    @contextmanager
+    def phase(self, name):
+        start = self.now()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            entry = {
+                "phase": name,
+                "start_sec": round(start, 4),
+                "duration_sec": round(self.now() - start, 4),
+                "thread": threading.current_thread().name,
+            }
+            if error is not None:
+                entry["error"] = error
+            with self._lock:
+                self._phases.append(entry)
+            debug(TAG, "{} took {:.3f}s".format(name, entry["duration_sec"]))
+
+    def mark(self, name):
+        """Record a point in time, e.g. window_ready."""
+        with self._lock:
+            self._marks[name] = round(self.now(), 4)
+
+    def report(self):
+        with self._lock:
+            phases = sorted(self._phases, key=lambda p: p["start_sec"])
+            marks = dict(self._marks)
+        return {"pid": os.getpid(), "marks": marks, "phases": phases}
+
+    def log_summary(self):
+        report = self.report()
+        info(TAG, " ".join("{}={:.3f}s".format(k, v) for k, v in sorted(report["marks"].items(), key=lambda kv: kv[1])))
+        for p in report["phases"]:
+            info(TAG, "  {:<18} +{:.3f}s  {:.3f}s  [{}]".format(p["phase"], p["start_sec"], p["duration_sec"], p["thread"]))
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+
+_trace = StartupTrace()
+
+
+def get_startup_trace():
+    return _trace
@@ -0,0 +1,193 @@
+import argparse
+import glob
+import json
+import os
+import sys
+
+from config import ROBOT_INBOX_DIRNAME, ROBOT_OUTBOX_DIRNAME
+from src.latency_report import _iter_turn_records
+from src.logger import info
+from src.tracing import iso_to_us
+from src.turn_timing import STAGE_SPANS
+
+TAG = "TRACE"
+
+# Chrome trace "processes": where each record was produced.
+PID_HOST, PID_BRIDGE, PID_ROBOT = 1, 2, 3
+_PROCESS_NAMES = {PID_HOST: "host pipeline", PID_BRIDGE: "bridge", PID_ROBOT: "robot"}
+
+# One lane per stage on the host, in turn order; "turn" holds the whole turn.
+_HOST_LANES = ["recording", "turn"] + [s for s in STAGE_SPANS if s not in ("total", "release_to_playback")]
+
+
+def _lane(name):
+    return _HOST_LANES.index(name) + 1
+
+
+def _slice(name, pid, tid, start_us, end_us, args=None, cat="turn"):
+    return {
+        "name": name,
+        "cat": cat,
+        "ph": "X",
+        "pid": pid,
+        "tid": tid,
+        "ts": start_us,
+        "dur": max(0, end_us - start_us),
+        "args": args or {},
+    }
+
+
+def _metadata():
+    events = [
+        {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}}
+        for pid, name in _PROCESS_NAMES.items()
+    ]
+    events += [
+        {"name": "thread_name", "ph": "M", "pid": PID_HOST, "tid": _lane(lane), "args": {"name": lane}}
+        for lane in _HOST_LANES
+    ]
+    events += [
+        {"name": "thread_name", "ph": "M", "pid": PID_BRIDGE, "tid": 1, "args": {"name": "events"}},
+        {"name": "thread_name", "ph": "M", "pid": PID_ROBOT, "tid": 1, "args": {"name": "robot jobs"}},
+    ]
+    return events
+
+
+def _turn_events(record):
+    """A turn record -> host slices, anchored on its button_release_at wall time."""
+    anchor = iso_to_us(record.get("button_release_at"))
+    offsets = record.get("stage_offsets_sec") or {}
+    if anchor is None or not offsets:
+        return []
+    origin = offsets.get("button_release", 0.0)
+
+    def at(mark):
+        return anchor + int((offsets[mark] - origin) * 1e6)
+
+    turn = record.get("turn")
+    args = {"turn": turn, "trace_id": record.get("trace_id"), "span_id": record.get("span_id")}
+    events = []
+    started = iso_to_us(record.get("recording_started_at"))
+    if started is not None and started <= anchor:
+        events.append(_slice("turn {} recording".format(turn), PID_HOST, _lane("recording"), started, anchor, args))
+    for stage, (start, end) in STAGE_SPANS.items():
+        if start not in offsets or end not in offsets or stage == "release_to_playback":
+            continue
+        lane = "turn" if stage == "total" else stage
+        name = "turn {}".format(turn) if stage == "total" else stage
+        stage_args = dict(args, child_span_id=(record.get("child_spans") or {}).get(stage))
+        events.append(_slice(name, PID_HOST, _lane(lane), at(start), at(end), stage_args))
+    return events
+
+
+def _bridge_events(path):
+    events = []
+    for record in _iter_turn_records([path]):
+        ts = iso_to_us(record.get("ts"))
+        if ts is None:
+            continue
+        events.append({
+            "name": record.get("event") or "event",
+            "cat": "bridge",
+            "ph": "i",
+            "s": "t",
+            "pid": PID_BRIDGE,
+            "tid": 1,
+            "ts": ts,
+            "args": record,
+        })
+    return events
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _robot_events(session_dir, turn_anchor_lane_ts):
+    """
+    Robot job slices: from the input job's created_at (or the robot's own
+    started_at) to its output's finished_at, falling back to the output
+    file's mtime. A flow arrow links each job to the host turn that wrote it.
+    """
+    events = []
+    for input_path in sorted(glob.glob(os.path.join(session_dir, ROBOT_INBOX_DIRNAME, "turn_*_input.json"))):
+        job = _read_json(input_path)
+        if not job:
+            continue
+        turn_id = job.get("turn_id")
+        created = iso_to_us(job.get("created_at"))
+        out_path = os.path.join(session_dir, ROBOT_OUTBOX_DIRNAME, "turn_{:04d}_output.json".format(int(turn_id)))
+        output = _read_json(out_path) or {}
+        end = iso_to_us(output.get("finished_at"))
+        if end is None and os.path.isfile(out_path):
+            end = int(os.path.getmtime(out_path) * 1e6)
+        start = iso_to_us(output.get("started_at")) or created
+        if start is None or end is None:
+            continue
+        args = {
+            "turn": turn_id,
+            "trace_id": job.get("trace_id"),
+            "span_id": job.get("span_id"),
+            "parent_span_id": job.get("parent_span_id"),
+            "ok": output.get("ok"),
+        }
+        events.append(_slice("turn {} robot".format(turn_id), PID_ROBOT, 1, start, end, args, cat="robot"))
+        if job.get("span_id") and created is not None and turn_id in turn_anchor_lane_ts:
+            flow_id = int(job["span_id"][:12], 16)
+            flow_args = {"trace_id": job.get("trace_id")}
+            events.append({"name": "robot_job", "cat": "flow", "ph": "s", "id": flow_id, "args": flow_args,
+                           "pid": PID_HOST, "tid": _lane("turn"), "ts": max(created, turn_anchor_lane_ts[turn_id])})
+            events.append({"name": "robot_job", "cat": "flow", "ph": "f", "bp": "e", "id": flow_id, "args": flow_args,
+                           "pid": PID_ROBOT, "tid": 1, "ts": start})
+    return events
+
+
+def export_session(session_dir, trace_id=None):
+    """Chrome/Perfetto trace (JSON object format) of one session's turns, bridge events and robot jobs."""
+    events = _metadata()
+    turn_starts = {}
+    for record in _iter_turn_records([os.path.join(session_dir, "conversation_log.jsonl")]):
+        if record.get("turn") is None or (trace_id and record.get("trace_id") != trace_id):
+            continue
+        turn_events = _turn_events(record)
+        events += turn_events
+        turn_starts.update({record["turn"]: e["ts"] for e in turn_events if e["tid"] == _lane("turn")})
+
+    bridge = _bridge_events(os.path.join(session_dir, "bridge_events.jsonl"))
+    robot = _robot_events(session_dir, turn_starts)
+    if trace_id:
+        bridge = [e for e in bridge if e["args"].get("trace_id") == trace_id]
+        robot = [e for e in robot if e["args"].get("trace_id") == trace_id]
+    events += bridge + robot
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"session_dir": session_dir, "trace_id": trace_id},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m src.trace_export",
+        description="Export a session as Chrome/Perfetto trace JSON (open in ui.perfetto.dev or chrome://tracing).",
+    )
+    parser.add_argument("session_dir")
+    parser.add_argument("--trace-id", help="only this turn's trace")
+    parser.add_argument("--out", help="default: <session_dir>/trace.json")
+    args = parser.parse_args(argv)
+
+    trace = export_session(args.session_dir, trace_id=args.trace_id)
+    out = args.out or os.path.join(args.session_dir, "trace.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(trace, f, ensure_ascii=False)
+    slices = sum(1 for e in trace["traceEvents"] if e["ph"] in ("X", "i"))
+    info(TAG, "{} events -> {}".format(slices, out))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import os
+import time
+from datetime import datetime
+
+# W3C trace context (https://www.w3.org/TR/trace-context/): 16-byte trace id,
+# 8-byte span ids, "sampled" flag set.
+TRACEPARENT_VERSION = "00"
+TRACEPARENT_FLAGS = "01"
+
+
+def new_trace_id():
+    return os.urandom(16).hex()
+
+
+def new_span_id():
+    return os.urandom(8).hex()
+
+
+def now_iso():
+    """Local wall-clock time with microseconds, for records read by other processes."""
+    return datetime.now().isoformat(timespec="microseconds")
+
+
+def wall_iso(monotonic_t):
+    """A time.monotonic() reading -> local wall-clock ISO string (microseconds)."""
+    wall = time.time() - (time.monotonic() - monotonic_t)
+    return datetime.fromtimestamp(wall).isoformat(timespec="microseconds")
+
+
+def iso_to_us(value):
+    """ISO timestamp (any precision written by this repo) -> epoch microseconds, or None."""
+    if not value:
+        return None
+    try:
+        return int(datetime.fromisoformat(str(value)).timestamp() * 1e6)
+    except ValueError:
+        return None
+
+
+class TurnTrace:
+    """
+    Trace context of one turn, created when recording starts. `span_id` is
+    the turn's root span; work handed to another process (the robot job, the
+    /converse call) gets a child span id and carries the pair as `traceparent`.
+    """
+
+    __slots__ = ("trace_id", "span_id", "started_at", "started_mono")
+
+    def __init__(self, trace_id=None, span_id=None, started_at=None):
+        self.trace_id = trace_id or new_trace_id()
+        self.span_id = span_id or new_span_id()
+        self.started_mono = time.monotonic()
+        self.started_at = started_at or now_iso()
+
+    def child(self):
+        """(span_id, traceparent) for a new span under this turn."""
+        span_id = new_span_id()
+        return span_id, self.traceparent(span_id)
+
+    def traceparent(self, span_id=None):
+        return "-".join((TRACEPARENT_VERSION, self.trace_id, span_id or self.span_id, TRACEPARENT_FLAGS))
+
+    def fields(self):
+        return {"trace_id": self.trace_id, "span_id": self.span_id}
+
+
+def start_trace():
+    return TurnTrace()
+
+
+def parse_traceparent(value):
+    """traceparent header -> (trace_id, parent_span_id), or None if malformed."""
+    parts = str(value or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
@@ -1,11 +1,21 @@
 import subprocess
 import os
 
-from config import TTS_VOICE, REQUIRE_ENTER_BEFORE_SPEAK
+from config import TTS_BACKEND, TTS_VOICE, REQUIRE_ENTER_BEFORE_SPEAK
 from src.logger import debug, error
 
 TAG = "TTS"
 
+# "say" renders with macOS say and plays with afplay; "null" skips both
+# (headless benchmarks and replays) while still reporting stage boundaries.
+_backend = TTS_BACKEND
+
+
+def configure(backend=None):
+    global _backend
+    if backend is not None:
+        _backend = backend
+
 
 def _wait_for_operator_enter():
     if not REQUIRE_ENTER_BEFORE_SPEAK:
@@ -26,37 +36,79 @@ def _wait_for_operator_enter():
         print("[operator_gate] Enter gate failed ({}); continuing.".format(e))
 
 
-def speak(text, output_path):
-    """Render TTS to a file and play it."""
+def _mark(on_stage, stage):
+    if on_stage is None:
+        return
+    try:
+        on_stage(stage)
+    except Exception as e:
+        error(TAG, f"on_stage({stage}) failed: {e!r}")
+
+
+def render(text, output_path, on_stage=None):
+    """
+    Render TTS to a file without playing it. Returns the path written (with
+    .aiff appended if needed), or None if there was nothing to render or
+    rendering failed. on_stage gets tts_render_start/end.
+    """
 
     text = (text or "").strip()
     if not text:
         debug(TAG, "Skipping: empty text")
-        return
+        return None
 
     if not output_path.endswith(".aiff"):
         output_path += ".aiff"
 
+    if _backend == "null":
+        _mark(on_stage, "tts_render_start")
+        _mark(on_stage, "tts_render_end")
+        debug(TAG, "Null backend: skipped rendering {}".format(output_path))
+        return output_path
+
     out_dir = os.path.dirname(output_path)
     if out_dir and not os.path.isdir(out_dir):
         error(TAG, f"Output directory does not exist: {out_dir}")
-        return
+        return None
 
-    debug(TAG, f"Rendering and playing: {output_path}")
+    debug(TAG, f"Rendering: {output_path}")
 
-    # Render
+    _mark(on_stage, "tts_render_start")
     try:
         subprocess.check_call(
             ["say", "-v", TTS_VOICE, "-o", output_path, text]
         )
     except subprocess.CalledProcessError as e:
         error(TAG, f"say failed: {e}")
+        return None
+    finally:
+        _mark(on_stage, "tts_render_end")
+    return output_path
+
+
+def play(path, on_stage=None):
+    """Play a rendered file. on_stage gets playback_start/end."""
+    if _backend == "null":
+        _mark(on_stage, "playback_start")
+        _mark(on_stage, "playback_end")
         return
 
-    # Play
+    _mark(on_stage, "playback_start")
     try:
-        subprocess.check_call(["afplay", output_path])
+        subprocess.check_call(["afplay", path])
     except subprocess.CalledProcessError as e:
         error(TAG, f"afplay failed: {e}")
     else:
         debug(TAG, "Complete")
+    finally:
+        _mark(on_stage, "playback_end")
+
+
+def speak(text, output_path, on_stage=None):
+    """
+    Render TTS to a file and play it.
+    on_stage, if given, is called with tts_render_start/end and playback_start/end.
+    """
+    path = render(text, output_path, on_stage=on_stage)
+    if path is not None:
+        play(path, on_stage=on_stage)
@@ -0,0 +1,260 @@
+import os
+
+from config import (
+    REQUIRE_ENTER_BEFORE_SPEAK,
+    REQUIRE_ENTER_FOR_WATCHDOG,
+    ROBOT_CHAT_ENABLED,
+    WATCHDOG_ENABLED,
+    WATCHDOG_ACTIVATE_AFTER_TURN,
+    WATCHDOG_INTERVAL_SEC,
+    WATCHDOG_MAX_CONSECUTIVE_WITHOUT_USER,
+    WATCHDOG_EPHEMERAL_SYSTEM_PROMPT,
+    OPERATOR_REPLY_DELAY_ENABLED,
+    OPERATOR_REPLY_DELAY_CPM,
+    OPERATOR_REPLY_DELAY_MIN_SEC,
+    OPERATOR_REPLY_DELAY_MAX_SEC,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_STAGE_WORKERS,
+)
+from src.logger import debug, exc
+from src.pipeline import DONE, HOLD, Pipeline, PipelineFull, Stage
+
+TAG = "FLOW"
+
+# operator_gate() result when only the operator (Return in the GUI) can release.
+GATE_MANUAL = "manual"
+
+
+# --------------------------------------
+# Operator gate
+# --------------------------------------
+def operator_reply_delay_sec(text):
+    if not OPERATOR_REPLY_DELAY_ENABLED:
+        return None
+    try:
+        cpm = float(OPERATOR_REPLY_DELAY_CPM)
+    except Exception:
+        cpm = 0.0
+    if cpm <= 0:
+        return None
+
+    char_count = len(str(text or "").strip())
+    if char_count <= 0:
+        return 0.0
+
+    delay = (float(char_count) / cpm) * 60.0
+    delay = max(float(OPERATOR_REPLY_DELAY_MIN_SEC), delay)
+    delay = min(float(OPERATOR_REPLY_DELAY_MAX_SEC), delay)
+    return max(0.0, delay)
+
+
+def operator_gate(source_label, reply_text=None):
+    """
+    How a ready reply is released: None to play it straight away, a number
+    of seconds for the typing-delay auto-release, or GATE_MANUAL.
+    """
+    if source_label == "watchdog":
+        should_wait = REQUIRE_ENTER_FOR_WATCHDOG
+    else:
+        should_wait = REQUIRE_ENTER_BEFORE_SPEAK
+    if not should_wait:
+        return None
+
+    if source_label == "turn_reply":
+        delay_sec = operator_reply_delay_sec(reply_text)
+        if delay_sec is not None:
+            return delay_sec
+    return GATE_MANUAL
+
+
+# --------------------------------------
+# Local (computer-chat) watchdog
+# --------------------------------------
+class LocalWatchdog:
+    """
+    Bookkeeping for the computer-chat watchdog: it may fire once the
+    conversation has reached WATCHDOG_ACTIVATE_AFTER_TURN, every
+    WATCHDOG_INTERVAL_SEC of silence, at most
+    WATCHDOG_MAX_CONSECUTIVE_WITHOUT_USER times between participant turns.
+    Timing is left to the caller (Tk timers, or the headless runner's clock).
+    """
+
+    def __init__(self, enabled=None, robot_enabled=ROBOT_CHAT_ENABLED):
+        enabled = WATCHDOG_ENABLED if enabled is None else enabled
+        self.enabled = bool(enabled) and not robot_enabled
+        self.interval_sec = float(WATCHDOG_INTERVAL_SEC)
+        self.total = 0
+        self.consecutive_without_user = 0
+        self.in_flight = False
+
+    def can_fire(self, turn):
+        if not self.enabled:
+            return False
+        if (turn or 0) < WATCHDOG_ACTIVATE_AFTER_TURN:
+            return False
+        return self.consecutive_without_user < WATCHDOG_MAX_CONSECUTIVE_WITHOUT_USER
+
+    def note_participant(self, text):
+        if not (text or "").strip():
+            return False
+        self.consecutive_without_user = 0
+        debug(TAG, "Reset local watchdog consecutive count after participant speech")
+        return True
+
+    def note_fired(self):
+        self.total += 1
+        self.consecutive_without_user += 1
+        debug(TAG, "Local watchdog fired (total={}, consecutive={})".format(self.total, self.consecutive_without_user))
+
+
+# --------------------------------------
+# Turn pipeline
+# --------------------------------------
+def build_turn_pipeline(convo, response_adapter, on_progress=None, on_complete=None, dispatch=None, name="turn",
+                        queue_size=None, stage_workers=None):
+    """
+    asr -> reply -> render -> [operator gate] -> play -> finalize.
+
+    Turns are submitted with {"audio", "recording_started_at", "released_at", "trace"};
+    watchdog prompts with {"watchdog_index"}, kind="watchdog", start="reply".
+    The gate opens when the reply stage reports progress, so rendering
+    overlaps it; items with speech to play are held after render until the
+    caller resumes them.
+
+    When a reply is overdue, a pre-rendered holding phrase is submitted as a
+    kind="holding" item straight to the play stage, so it queues behind
+    speech already playing and ahead of the late reply. It is skipped when
+    the operator gates replies, since nothing may be spoken without release.
+    """
+    from src import deadline, tts_engine
+    from src.audio_io import get_audio_duration
+    from src.profiling import profile_section
+
+    if not convo.robot_enabled:
+        deadline.warm_phrases_async()
+    queue_size = PIPELINE_QUEUE_SIZE if queue_size is None else queue_size
+    stage_workers = PIPELINE_STAGE_WORKERS if stage_workers is None else stage_workers
+
+    def profiled(label, fn):
+        def run(item):
+            if item.kind != "turn":
+                return fn(item)
+            turn_no = item.data.get("turn_id") or convo.turn + 1
+            with profile_section(convo.session_dir, "turn_{:03d}_{}".format(turn_no, label)):
+                return fn(item)
+
+        return run
+
+    def stage_asr(item):
+        d = item.data
+        d["turn_id"], d["text"] = convo.transcribe_only(
+            d.pop("audio"),
+            recording_started_at=d.get("recording_started_at"),
+            released_at=d.get("released_at"),
+            trace=d.get("trace"),
+        )
+
+    def hold(turn_id):
+        """The reply is overdue: queue a pre-rendered holding phrase on the play stage."""
+        if operator_gate("turn_reply") is not None:
+            debug(TAG, "Reply overdue for turn {}; operator gate is on, no holding phrase", turn_id)
+            return
+        phrase = deadline.get_phrase_cache().holding()
+        if phrase is None:
+            return
+        text, path = phrase
+        debug(TAG, "Reply overdue for turn {}; holding phrase {!r}", turn_id, text)
+        try:
+            pipeline.submit({"turn_id": turn_id, "text": text, "audio_path": path}, kind="holding", start="play")
+        except PipelineFull:
+            debug(TAG, "Play stage full; no holding phrase for turn {}", turn_id)
+            return
+        convo.note_degraded(turn_id, "holding_phrase")
+
+    def stage_reply(item):
+        d = item.data
+        if item.kind == "watchdog":
+            d["reply"] = convo.generate_watchdog_reply(ephemeral_system=WATCHDOG_EPHEMERAL_SYSTEM_PROMPT)
+            d["outpath"] = os.path.join(
+                convo.session_dir,
+                "watchdog_{:03d}_{:03d}.aiff".format(int(convo.turn or 0), d["watchdog_index"]),
+            )
+            return None if d["reply"] else DONE
+
+        turn_id = d["turn_id"]
+        d["reply"], d["outpath"] = response_adapter.prepare_reply(
+            convo, turn_id, d["text"], on_late=lambda: hold(turn_id)
+        )
+        if d["outpath"]:
+            convo.mark_stage(d["turn_id"], "gate_start")
+        return None
+
+    def stage_render(item):
+        # Runs while the operator gate / typing delay is still open; the item
+        # is held afterwards so release only has to start playback.
+        d = item.data
+        if item.kind == "watchdog":
+            d["audio_path"] = tts_engine.render(d["reply"], d["outpath"])
+        else:
+            d["audio_path"] = response_adapter.render_reply(convo, d["turn_id"], d["reply"], d["outpath"])
+        return HOLD if d["outpath"] else None
+
+    def stage_play(item):
+        d = item.data
+        if not d.get("audio_path"):
+            return
+        if item.kind == "watchdog":
+            tts_engine.play(d["audio_path"])
+        elif item.kind == "holding":
+            convo.mark_stage(d["turn_id"], "holding_start")
+            tts_engine.play(d["audio_path"])
+            convo.mark_stage(d["turn_id"], "holding_end")
+        else:
+            response_adapter.play_reply(convo, d["turn_id"], d["audio_path"])
+
+    def stage_finalize(item):
+        d = item.data
+        if item.kind == "holding":
+            return
+        if item.kind == "watchdog":
+            if not d.get("audio_path"):
+                return
+            try:
+                ai_duration = get_audio_duration(d["audio_path"])
+                if ai_duration is not None:
+                    debug(TAG, f"Local watchdog audio duration: {ai_duration:.3f} sec")
+            except Exception as e:
+                exc(TAG, e, msg="Could not get local watchdog audio duration")
+            return
+
+        # A turn that failed before it had a reply has nothing to finalize,
+        # but must not hold later turns back from the log.
+        if "reply" not in d:
+            if d.get("turn_id") is not None:
+                convo.discard_turn(d["turn_id"])
+            return
+        response_adapter.finalize_turn(convo, d["turn_id"], d.get("audio_path"))
+
+    def stage(stage_name, fn, always=False):
+        return Stage(
+            stage_name,
+            profiled(stage_name, fn),
+            workers=stage_workers.get(stage_name, 1),
+            queue_size=queue_size,
+            always=always,
+        )
+
+    pipeline = Pipeline(
+        name,
+        [
+            stage("asr", stage_asr),
+            stage("reply", stage_reply),
+            stage("render", stage_render),
+            stage("play", stage_play),
+            stage("finalize", stage_finalize, always=True),
+        ],
+        on_progress=on_progress,
+        on_complete=on_complete,
+        dispatch=dispatch,
+    )
+    return pipeline
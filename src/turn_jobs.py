@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+
+from src.logger import exc
+from src.pipeline import Pipeline, Stage
+
+TAG = "JOBS"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_ERROR = "error"
+
+
+class TurnJob:
+    def __init__(self, turn_id):
+        self.turn_id = int(turn_id)
+        self.status = STATUS_QUEUED
+        self.result = None
+        self.error = None
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def describe(self):
+        out = {"turn_id": self.turn_id, "status": self.status}
+        if self.started_at is not None:
+            out["queue_wait_sec"] = round(self.started_at - self.queued_at, 4)
+        if self.finished_at is not None:
+            out["job_sec"] = round(self.finished_at - self.queued_at, 4)
+        if self.error is not None:
+            out["error"] = self.error
+        if self.result is not None:
+            out.update(self.result)
+        return out
+
+
+class TurnJobTable:
+    """
+    Per-session transcription jobs: a one-stage turn pipeline whose single
+    worker runs them in submission order, so input jobs reach the robot
+    inbox in turn order. Only the most recent `keep` jobs are retained for
+    polling.
+    """
+
+    def __init__(self, name="turn-jobs", keep=256):
+        self.keep = int(keep)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        # Unbounded: the bridge's admission control already bounds how many /stop calls get here.
+        self._pipeline = Pipeline(name, [Stage("transcribe", self._run_item, workers=1, queue_size=0)])
+
+    def submit(self, turn_id, fn):
+        job = TurnJob(turn_id)
+        with self._lock:
+            self._jobs[job.turn_id] = job
+            while len(self._jobs) > self.keep:
+                self._jobs.popitem(last=False)
+        self._pipeline.submit({"job": job, "fn": fn}, key=job.turn_id, block=True)
+        return job
+
+    def get(self, turn_id):
+        with self._lock:
+            return self._jobs.get(int(turn_id))
+
+    def pending(self):
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j.status in (STATUS_QUEUED, STATUS_RUNNING))
+
+    def stats(self):
+        return self._pipeline.stats()
+
+    def _run_item(self, item):
+        self._run(item.data["job"], item.data["fn"])
+
+    def _run(self, job, fn):
+        job.started_at = time.monotonic()
+        job.status = STATUS_RUNNING
+        try:
+            job.result = fn()
+            job.status = STATUS_DONE
+        except Exception as e:
+            exc(TAG, e, "Turn job {} failed".format(job.turn_id))
+            job.error = repr(e)
+            job.status = STATUS_ERROR
+        finally:
+            job.finished_at = time.monotonic()
+            job._done.set()
+
+    def shutdown(self, wait=True):
+        self._pipeline.close(wait=wait)
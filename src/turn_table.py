@@ -0,0 +1,141 @@
+import threading
+
+from src.logger import debug
+
+TAG = "TURNS"
+
+# Turns left open this long (e.g. bridge turns, which are never finalised)
+# are dropped oldest first so the table stays bounded.
+MAX_OPEN_TURNS = 32
+
+
+class TurnRecord:
+    """
+    One in-flight turn, from transcription until its log row is written.
+    Private state (stage marks, deadline, trace) never reaches the log.
+    """
+
+    __slots__ = (
+        "turn",
+        "user",
+        "ai_text",
+        "participant_duration_sec",
+        "ai_duration_sec",
+        "trace_id",
+        "span_id",
+        "recording_started_at",
+        "button_release_at",
+        "child_spans",
+        "stage_marks",
+        "deadline",
+        "trace",
+        "finished",
+    )
+
+    def __init__(self, turn, user="", ai_text=None, participant_duration_sec=None, trace=None,
+                 recording_started_at=None, button_release_at=None, stage_marks=None, deadline=None):
+        self.turn = int(turn)
+        self.user = user
+        self.ai_text = ai_text
+        self.participant_duration_sec = participant_duration_sec
+        self.ai_duration_sec = None
+        self.trace = trace
+        self.trace_id = trace.trace_id if trace is not None else None
+        self.span_id = trace.span_id if trace is not None else None
+        self.recording_started_at = recording_started_at
+        self.button_release_at = button_release_at
+        self.child_spans = {}
+        self.stage_marks = {} if stage_marks is None else stage_marks
+        self.deadline = deadline
+        self.finished = False
+
+    def as_record(self):
+        """The conversation_log.jsonl row (without stage timings, which finalisation adds)."""
+        record = {
+            "turn": self.turn,
+            "user": self.user,
+            "ai_text": self.ai_text,
+            "participant_duration_sec": self.participant_duration_sec,
+            "ai_duration_sec": self.ai_duration_sec,
+        }
+        if self.trace_id is not None:
+            record.update({
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "recording_started_at": self.recording_started_at,
+                # Wall-clock anchor for stage_offsets_sec, so other processes' records line up.
+                "button_release_at": self.button_release_at,
+                "child_spans": dict(self.child_spans),
+            })
+        return record
+
+
+class TurnTable:
+    """
+    Turns in flight for one conversation, keyed by turn id. Ids are handed
+    out under a lock; finished turns are released in id order, so turn N+1
+    finishing before turn N is held until N finishes or is discarded.
+    """
+
+    def __init__(self, max_open=MAX_OPEN_TURNS):
+        self.max_open = max_open
+        self.last_id = 0
+        self._turns = {}
+        self._lock = threading.Lock()
+
+    def allocate(self):
+        with self._lock:
+            self.last_id += 1
+            return self.last_id
+
+    def open(self, record):
+        """
+        Track `record`, replacing any earlier record for the same turn id.
+        Past max_open the oldest unfinished turn is dropped; returns the
+        finished records that were waiting on it, in turn order (usually empty).
+        """
+        with self._lock:
+            self._turns[record.turn] = record
+            if len(self._turns) <= self.max_open:
+                return []
+            while len(self._turns) > self.max_open:
+                stale = min(t for t, r in self._turns.items() if not r.finished)
+                del self._turns[stale]
+                debug(TAG, "Dropped turn {} (never finalised)".format(stale))
+            return self._pop_ready()
+
+    def get(self, turn_id):
+        with self._lock:
+            return self._turns.get(turn_id)
+
+    def finish(self, turn_id):
+        """
+        Mark a turn finished. Returns the records now ready to log, in turn
+        order (possibly empty while an earlier turn is still open), or None if
+        the turn is not in the table.
+        """
+        with self._lock:
+            record = self._turns.get(turn_id)
+            if record is None:
+                return None
+            record.finished = True
+            return self._pop_ready()
+
+    def discard(self, turn_id):
+        """Forget a turn that will never be finished; returns records it was holding back."""
+        with self._lock:
+            self._turns.pop(turn_id, None)
+            return self._pop_ready()
+
+    def _pop_ready(self):
+        ready = []
+        while self._turns:
+            first = min(self._turns)
+            if not self._turns[first].finished:
+                break
+            ready.append(self._turns.pop(first))
+        return ready
+
+    def __len__(self):
+        with self._lock:
+            return len(self._turns)
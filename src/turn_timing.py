@@ -0,0 +1,75 @@
+import time
+
+# Stage boundaries captured with time.monotonic() during a turn. Offsets are
+# stored relative to the first mark (normally button_release), so they are
+# comparable across turns and sessions.
+STAGE_MARKS = (
+    "button_release",
+    "wav_saved",
+    "asr_start",
+    "asr_end",
+    "converse_start",
+    "holding_start",
+    "holding_end",
+    "converse_end",
+    "gate_start",
+    "gate_end",
+    "tts_render_start",
+    "tts_render_end",
+    "playback_start",
+    "playback_end",
+    "finalized",
+)
+
+# stage name -> (start mark, end mark)
+STAGE_SPANS = {
+    "capture_save": ("button_release", "wav_saved"),
+    "asr": ("asr_start", "asr_end"),
+    "converse": ("converse_start", "converse_end"),
+    "holding": ("holding_start", "holding_end"),
+    "gate": ("gate_start", "gate_end"),
+    "tts_render": ("tts_render_start", "tts_render_end"),
+    "playback": ("playback_start", "playback_end"),
+    "release_to_playback": ("button_release", "playback_start"),
+    "total": ("button_release", "finalized"),
+}
+
+
+# Derived from the gate and render marks: how much of the TTS render ran while
+# the reply was held at the operator gate, and how much was left after release.
+RENDER_GATE_STAGES = ("tts_render_hidden", "tts_render_exposed")
+
+
+def now():
+    return time.monotonic()
+
+
+def offsets(marks):
+    """Monotonic marks -> {mark: seconds since the earliest mark}, rounded to 0.1 ms."""
+    if not marks:
+        return {}
+    origin = min(marks.values())
+    return {name: round(t - origin, 4) for name, t in sorted(marks.items(), key=lambda kv: kv[1])}
+
+
+def render_gate_overlap(marks):
+    """(hidden, exposed) render seconds relative to the operator gate, or None without both spans."""
+    try:
+        gate_start, gate_end = marks["gate_start"], marks["gate_end"]
+        render_start, render_end = marks["tts_render_start"], marks["tts_render_end"]
+    except KeyError:
+        return None
+    hidden = max(0.0, min(render_end, gate_end) - max(render_start, gate_start))
+    exposed = max(0.0, render_end - max(render_start, gate_end))
+    return round(hidden, 4), round(exposed, 4)
+
+
+def durations(marks):
+    out = {}
+    for stage, (start, end) in STAGE_SPANS.items():
+        if start in marks and end in marks:
+            out[stage] = round(marks[end] - marks[start], 4)
+    overlap = render_gate_overlap(marks)
+    if overlap is not None:
+        out.update(zip(RENDER_GATE_STAGES, overlap))
+    return out
@@ -0,0 +1,141 @@
+import time
+
+import numpy as np
+import pytest
+
+from src import bridge_server
+from src.audio_upload import AudioUpload, ChunkOffsetMismatch, UploadDiscarded, UploadTooLarge
+
+ROBOT = "r1"
+
+
+def _pcm(n_samples):
+    return np.arange(n_samples, dtype="<i2").tobytes()
+
+
+# ---------------------------------------------------------
+# AudioUpload
+# ---------------------------------------------------------
+def test_offset_must_match_the_bytes_received():
+    upload = AudioUpload("u", fmt="s16le", sample_rate=16000)
+    upload.append(_pcm(4), offset=0)
+    with pytest.raises(ChunkOffsetMismatch) as duplicate:
+        upload.append(_pcm(4), offset=0)
+    assert (duplicate.value.offset, duplicate.value.expected) == (0, 8)
+    with pytest.raises(ChunkOffsetMismatch):
+        upload.append(_pcm(4), offset=16)
+    # Refused chunks leave the upload untouched.
+    assert upload.bytes_received == 8 and upload.samples == 4
+    upload.append(_pcm(4), offset=8)
+    assert upload.samples == 8
+
+
+def test_size_cap():
+    upload = AudioUpload("u", fmt="s16le", sample_rate=1000, max_sec=0.01, initial_sec=0.001)
+    upload.append(_pcm(10))
+    with pytest.raises(UploadTooLarge):
+        upload.append(_pcm(1))
+
+
+def test_finish_after_discard_raises():
+    for fmt in ("s16le", "wav"):
+        upload = AudioUpload("u", fmt=fmt, sample_rate=16000)
+        upload.append(_pcm(4))
+        upload.discard()
+        with pytest.raises(UploadDiscarded):
+            upload.finish()
+
+
+# ---------------------------------------------------------
+# HTTP endpoints
+# ---------------------------------------------------------
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(bridge_server, "_sessions_dir", str(tmp_path))
+    monkeypatch.setattr(bridge_server, "_robots", {ROBOT})
+    monkeypatch.setattr(bridge_server, "_max_robots", 2)
+    yield bridge_server.app.test_client()
+    with bridge_server._sessions_lock:
+        sessions = list(bridge_server._sessions.values())
+        bridge_server._sessions.clear()
+    for session in sessions:
+        session.shutdown()
+
+
+def _open(client):
+    resp = client.post("/robots/{}/uploads".format(ROBOT), json={"format": "s16le", "sample_rate": 16000})
+    assert resp.status_code == 201
+    return resp.get_json()["upload_id"]
+
+
+def _chunks(client, upload_id, data, offset=None):
+    url = "/robots/{}/uploads/{}/chunks".format(ROBOT, upload_id)
+    if offset is not None:
+        url += "?offset={}".format(offset)
+    return client.post(url, data=data)
+
+
+def _status(client, upload_id):
+    return client.get("/robots/{}/uploads/{}".format(ROBOT, upload_id))
+
+
+def test_duplicate_and_out_of_order_chunks_get_409(client):
+    upload_id = _open(client)
+    assert _chunks(client, upload_id, _pcm(4), offset=0).status_code == 200
+
+    for offset in (0, 16):
+        resp = _chunks(client, upload_id, _pcm(4), offset=offset)
+        assert resp.status_code == 409
+        body = resp.get_json()
+        assert body["error"] == "offset_mismatch"
+        assert (body["offset"], body["expected_offset"]) == (offset, 8)
+
+    resp = _chunks(client, upload_id, _pcm(4), offset=8)
+    assert resp.status_code == 200
+    assert resp.get_json()["bytes_received"] == 16
+
+
+def test_oversized_upload_gets_413_and_is_dropped(client, monkeypatch):
+    monkeypatch.setattr(bridge_server, "BRIDGE_UPLOAD_MAX_SEC", 0.001)
+    upload_id = _open(client)
+    resp = _chunks(client, upload_id, _pcm(1000))
+    assert resp.status_code == 413
+    assert resp.get_json()["error"] == "upload_too_large"
+    assert _status(client, upload_id).status_code == 404
+
+
+def test_uploads_per_robot_are_capped(client, monkeypatch):
+    monkeypatch.setattr(bridge_server, "BRIDGE_MAX_UPLOADS_PER_ROBOT", 2)
+    opened = sorted([_open(client), _open(client)])
+    resp = client.post("/robots/{}/uploads".format(ROBOT), json={"format": "s16le"})
+    assert resp.status_code == 429
+    assert resp.get_json()["open_uploads"] == opened
+
+
+def test_idle_uploads_expire(client, monkeypatch):
+    monkeypatch.setattr(bridge_server, "BRIDGE_UPLOAD_IDLE_TTL_SEC", 30.0)
+    stale, fresh = _open(client), _open(client)
+    session = bridge_server._sessions[ROBOT]
+    session.uploads[fresh].last_activity_at += 20.0
+
+    bridge_server._sweep_idle_uploads(now=time.monotonic() + 35.0)
+    assert _status(client, stale).status_code == 404
+    assert _status(client, fresh).status_code == 200
+
+
+def test_finish_after_discard_queues_nothing(client):
+    upload_id = _open(client)
+    _chunks(client, upload_id, _pcm(16))
+    assert client.delete("/robots/{}/uploads/{}".format(ROBOT, upload_id)).status_code == 200
+    assert client.post("/robots/{}/uploads/{}/finish".format(ROBOT, upload_id)).status_code == 404
+
+    # Discarded after the finish request looked the upload up.
+    upload_id = _open(client)
+    session = bridge_server._sessions[ROBOT]
+    upload = session.uploads[upload_id]
+    bridge_server._discard_upload(session, upload, "expired")
+    turn = session.convo.turn
+    with bridge_server.app.test_request_context():
+        resp, status = bridge_server._finish_upload(session, upload, time.monotonic())
+    assert status == 404
+    assert session.convo.turn == turn
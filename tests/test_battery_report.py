@@ -0,0 +1,25 @@
+import numpy as np
+
+from src.battery_report import SPEECH_CHARS_PER_SEC, _join_turn_stats
+
+
+def test_join_with_no_csv_rows_returns_empty_arrays():
+    stats = _join_turn_stats([], [("session_a", 3, 12.0, 0)])
+    assert stats["turns"].size == 0
+    assert stats["speech_sec"].size == 0
+    assert stats["has_log"].size == 0
+
+
+def test_join_matches_every_row_of_a_repeated_session():
+    ids = ["session_b", "session_a", "session_b", "session_c"]
+    rows = [
+        ("session_a", 2, 10.0, 0),
+        ("session_b", 4, 5.0, 30),
+        ("session_b", 4, 5.0, 30),
+        ("session_x", 9, 99.0, 0),
+    ]
+    stats = _join_turn_stats(ids, rows)
+    b_speech = 5.0 + 30 / SPEECH_CHARS_PER_SEC
+    assert stats["turns"].tolist() == [4, 2, 4, 0]
+    assert np.allclose(stats["speech_sec"], [b_speech, 10.0, b_speech, 0.0])
+    assert stats["has_log"].tolist() == [True, True, True, False]
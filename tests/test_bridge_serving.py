@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+
+from src.bridge_serving import AdmissionController
+
+
+class _Body:
+    def __init__(self):
+        self.closed = False
+
+    def __iter__(self):
+        return iter([b"ok"])
+
+    def close(self):
+        self.closed = True
+
+
+def _environ(path="/robots/a/start", method="POST", query=""):
+    return {"PATH_INFO": path, "REQUEST_METHOD": method, "QUERY_STRING": query}
+
+
+def _call(controller, environ=None):
+    seen = {}
+
+    def start_response(status, headers):
+        seen["status"] = status
+        seen["headers"] = dict(headers)
+
+    body = b"".join(controller(environ or _environ(), start_response))
+    return seen["status"], seen["headers"], body
+
+
+def _blocking_app(release, entered):
+    def app(environ, start_response):
+        entered.release()
+        release.wait(5.0)
+        start_response("200 OK", [])
+        return [b"ok"]
+    return app
+
+
+def _occupy(controller, n, entered):
+    threads = [threading.Thread(target=_call, args=(controller,)) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for _ in range(n):
+        assert entered.acquire(timeout=2.0)
+    return threads
+
+
+def test_response_iterable_is_closed():
+    body = _Body()
+
+    def app(environ, start_response):
+        start_response("200 OK", [])
+        return body
+
+    status, _, data = _call(AdmissionController(app))
+    assert status.startswith("200") and data == b"ok"
+    assert body.closed
+
+
+def test_full_queue_gets_429_with_retry_after():
+    release, entered = threading.Event(), threading.Semaphore(0)
+    controller = AdmissionController(_blocking_app(release, entered), max_active=1, max_queue=0, retry_after_sec=3)
+    threads = _occupy(controller, 1, entered)
+    status, headers, body = _call(controller)
+    release.set()
+    for t in threads:
+        t.join()
+    assert status.startswith("429")
+    assert headers["Retry-After"] == "3"
+    assert json.loads(body)["reason"] == "queue_full"
+    assert controller.stats()["rejected"]["queue_full"] == 1
+
+
+def test_queue_timeout_gets_503_with_retry_after():
+    release, entered = threading.Event(), threading.Semaphore(0)
+    controller = AdmissionController(_blocking_app(release, entered), max_active=1, max_queue=1,
+                                     queue_timeout_sec=0.05)
+    threads = _occupy(controller, 1, entered)
+    t0 = time.monotonic()
+    status, headers, body = _call(controller)
+    release.set()
+    for t in threads:
+        t.join()
+    assert time.monotonic() - t0 < 1.0
+    assert status.startswith("503")
+    assert "Retry-After" in headers
+    assert json.loads(body)["reason"] == "queue_timeout"
+
+
+def test_draining_gets_503_but_exempt_paths_pass():
+    def app(environ, start_response):
+        start_response("200 OK", [])
+        return [b"ok"]
+
+    controller = AdmissionController(app, exempt_paths=("/metrics",))
+    controller.begin_drain()
+    status, headers, body = _call(controller)
+    assert status.startswith("503") and "Retry-After" in headers
+    assert json.loads(body)["error"] == "draining"
+    assert _call(controller, _environ("/metrics", "GET"))[0].startswith("200")
+
+
+def test_long_polls_use_their_own_pool():
+    release, entered = threading.Event(), threading.Semaphore(0)
+
+    def is_long_poll(environ):
+        return "wait=" in environ.get("QUERY_STRING", "")
+
+    blocking = _blocking_app(release, entered)
+
+    def app(environ, start_response):
+        if is_long_poll(environ):
+            return blocking(environ, start_response)
+        start_response("200 OK", [])
+        return [b"ok"]
+
+    controller = AdmissionController(app, max_active=1, max_queue=0, is_long_poll=is_long_poll, max_long_polls=2)
+    polls = [threading.Thread(target=_call, args=(controller, _environ("/robots/a/jobs/claim", query="wait=5")))
+             for _ in range(2)]
+    for t in polls:
+        t.start()
+    for _ in polls:
+        assert entered.acquire(timeout=2.0)
+
+    # Worker slots are free for ordinary requests while both long-polls wait.
+    assert _call(controller)[0].startswith("200")
+    status, headers, body = _call(controller, _environ("/robots/a/jobs/claim", query="wait=5"))
+    release.set()
+    for t in polls:
+        t.join()
+    assert status.startswith("429") and "Retry-After" in headers
+    assert json.loads(body)["reason"] == "long_polls_full"
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from src.deadline import CallPool, DeadlineExceeded, call_with_deadline
+
+
+def test_without_budget_calls_inline():
+    assert call_with_deadline(threading.current_thread, None) == (threading.current_thread(), False)
+
+
+def test_on_time_result():
+    late_calls = []
+    assert call_with_deadline(lambda: 42, 1.0, on_late=lambda: late_calls.append(1)) == (42, False)
+    assert late_calls == []
+
+
+def test_late_result_within_grace_is_returned():
+    late_calls = []
+
+    def slow():
+        time.sleep(0.1)
+        return "reply"
+
+    result = call_with_deadline(slow, 0.02, on_late=lambda: late_calls.append(1), grace_sec=1.0)
+    assert result == ("reply", True)
+    assert late_calls == [1]
+
+
+def test_call_past_cutoff_is_abandoned():
+    release = threading.Event()
+    t0 = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        call_with_deadline(lambda: release.wait(5.0), 0.02, grace_sec=0.05)
+    assert time.monotonic() - t0 < 1.0
+    release.set()
+
+
+def test_errors_are_reraised():
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        call_with_deadline(fail, 1.0)
+
+
+def test_pool_reuses_idle_workers():
+    pool = CallPool(max_workers=2, name="test-call")
+    names = set()
+    for _ in range(5):
+        call = pool.submit(lambda: names.add(threading.current_thread().name))
+        assert call.done.wait(1.0)
+    assert len(names) == 1
+
+
+def test_abandoned_calls_do_not_starve_later_calls():
+    pool = CallPool(max_workers=4, name="test-call")
+    release = threading.Event()
+    for _ in range(4):
+        with pytest.raises(DeadlineExceeded):
+            call_with_deadline(lambda: release.wait(5.0), 0.01, grace_sec=0.01, pool=pool)
+
+    t0 = time.monotonic()
+    assert call_with_deadline(lambda: "fast", 0.5, grace_sec=0.0, pool=pool) == ("fast", False)
+    assert time.monotonic() - t0 < 0.5
+    release.set()
+
+
+def test_call_abandoned_while_queued_is_skipped():
+    pool = CallPool(max_workers=1, name="test-call")
+    release = threading.Event()
+    ran = []
+    busy = pool.submit(lambda: release.wait(5.0))
+    queued = pool.submit(lambda: ran.append("queued"))
+    assert pool.abandon(queued)
+    release.set()
+    assert busy.done.wait(1.0)
+    assert pool.submit(lambda: ran.append("next")).done.wait(1.0)
+    assert ran == ["next"]
@@ -0,0 +1,55 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from src.file_watch import InotifyWatcher
+
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+
+
+@pytest.fixture
+def watcher():
+    w = InotifyWatcher()
+    yield w
+    w.close()
+
+
+def test_wait_for_in_missing_directory_polls_instead_of_raising(watcher, tmp_path):
+    out_dir = tmp_path / "outbox"
+    target = out_dir / "turn_0001_output.json"
+
+    def create_later():
+        time.sleep(0.1)
+        out_dir.mkdir()
+        target.write_text("{}")
+
+    t = threading.Thread(target=create_later)
+    t.start()
+    assert watcher.wait_for(str(target), 2.0)
+    t.join()
+    assert watcher._waiters == {} and watcher._dir_refs == {}
+
+
+def test_wait_for_under_a_file_times_out(watcher, tmp_path):
+    not_a_dir = tmp_path / "plain"
+    not_a_dir.write_text("")
+    assert not watcher.wait_for(os.path.join(str(not_a_dir), "x.json"), 0.05)
+
+
+def test_wait_for_wakes_on_rename(watcher, tmp_path):
+    target = tmp_path / "done.json"
+
+    def rename_later():
+        time.sleep(0.05)
+        (tmp_path / "done.tmp").write_text("{}")
+        os.replace(str(tmp_path / "done.tmp"), str(target))
+
+    t = threading.Thread(target=rename_later)
+    t.start()
+    assert watcher.wait_for(str(target), 2.0)
+    t.join()
+    assert watcher._wd_by_dir == {}
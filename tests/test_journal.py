@@ -0,0 +1,39 @@
+import json
+
+from src.journal import DURABILITY_RECORD, Journal
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_least_recently_written_handle_is_closed_past_max_open(tmp_path):
+    journal = Journal(durability=DURABILITY_RECORD, max_open=2)
+    paths = [str(tmp_path / "log_{}.jsonl".format(i)) for i in range(3)]
+    try:
+        for i, path in enumerate(paths):
+            journal.append(path, {"n": i})
+        assert journal.flush()
+        assert list(journal._handles) == paths[1:]
+        # Writing to an evicted path reopens it and appends.
+        journal.append(paths[0], {"n": 3})
+        assert journal.flush()
+        assert list(journal._handles) == [paths[2], paths[0]]
+        assert _lines(paths[0]) == [{"n": 0}, {"n": 3}]
+    finally:
+        journal.close()
+
+
+def test_close_path_releases_the_handle_after_queued_records(tmp_path):
+    journal = Journal(durability=DURABILITY_RECORD)
+    path = str(tmp_path / "conversation_log.jsonl")
+    try:
+        journal.append(path, {"turn": 1})
+        journal.close_path(path)
+        assert journal.flush()
+        assert path not in journal._handles
+        assert _lines(path) == [{"turn": 1}]
+        assert journal.stats()["write_errors"] == 0
+    finally:
+        journal.close()
@@ -0,0 +1,74 @@
+import contextlib
+import threading
+import time
+
+import pytest
+
+from src import logger
+
+
+@pytest.fixture
+def small_queue(monkeypatch):
+    logger.flush()
+    monkeypatch.setattr(logger, "_queue_max", logger._queue_max)
+    monkeypatch.setattr(logger, "_level", logger.INFO)
+    logger.configure(queue_max=4)
+    yield
+    logger.flush()
+
+
+@contextlib.contextmanager
+def stalled_writer():
+    """Hold the write lock, as a writer blocked on stdout would, so nothing is drained meanwhile."""
+    stalled = threading.Event()
+    release = threading.Event()
+
+    def stall():
+        with logger._write_lock:
+            stalled.set()
+            release.wait(5.0)
+
+    t = threading.Thread(target=stall)
+    t.start()
+    assert stalled.wait(2.0)
+    try:
+        yield
+    finally:
+        release.set()
+        t.join()
+
+
+def test_nowait_never_blocks_when_the_queue_is_full(small_queue, capsys):
+    with stalled_writer():
+        t0 = time.monotonic()
+        for i in range(1000):
+            logger.nowait("RT", "callback {}", i)
+        elapsed = time.monotonic() - t0
+        assert len(logger._queue) == 4
+        assert logger._dropped == 996
+    assert elapsed < 0.5
+
+    logger.flush()
+    out = capsys.readouterr().out
+    assert "Dropped 996 messages (queue full)" in out
+    assert "callback 3" in out and "callback 4" not in out
+    assert logger._dropped == 0
+
+
+def test_nowait_defers_formatting_and_respects_the_level(small_queue, capsys):
+    formatted = []
+
+    class Arg:
+        def __format__(self, spec):
+            formatted.append(spec)
+            return "arg"
+
+    with stalled_writer():
+        logger.nowait("RT", "value {}", Arg())
+        logger.nowait("RT", "hidden", level=logger.DEBUG)
+        assert formatted == []
+        assert len(logger._queue) == 1
+
+    logger.flush()
+    assert "value arg" in capsys.readouterr().out
+    assert len(formatted) == 1
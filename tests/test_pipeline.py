@@ -0,0 +1,127 @@
+import threading
+import time
+
+from src.pipeline import (
+    HOLD,
+    STATUS_CANCELLED,
+    STATUS_DONE,
+    STATUS_ERROR,
+    STATUS_HELD,
+    Pipeline,
+    Stage,
+)
+
+
+def _wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met within {}s".format(timeout))
+        time.sleep(0.005)
+
+
+def _recorder(name, ran, result=None):
+    def fn(item):
+        ran.append((name, item.key))
+        return result
+    return fn
+
+
+def _three_stage(ran, first):
+    return Pipeline("test", [
+        Stage("first", first),
+        Stage("second", _recorder("second", ran)),
+        Stage("finalize", _recorder("finalize", ran), always=True),
+    ])
+
+
+def test_resume_before_hold_lands_is_not_lost():
+    ran = []
+    holder = {}
+
+    def first(item):
+        # The gate opens (resume) before the stage has returned HOLD.
+        holder["pipeline"].resume(item.key)
+        return HOLD
+
+    pipeline = holder["pipeline"] = _three_stage(ran, first)
+    item = pipeline.submit(key=1)
+    assert item.wait(2.0)
+    assert item.status == STATUS_DONE
+    assert ran == [("second", 1), ("finalize", 1)]
+    pipeline.close()
+
+
+def test_cancel_while_held_runs_only_always_stages():
+    ran = []
+    pipeline = _three_stage(ran, lambda item: HOLD)
+    item = pipeline.submit(key=1)
+    _wait_until(lambda: item.status == STATUS_HELD)
+
+    assert pipeline.cancel(1)
+    assert item.wait(2.0)
+    assert item.status == STATUS_CANCELLED
+    assert ran == [("finalize", 1)]
+    assert pipeline.pending() == 0
+    pipeline.close()
+
+
+def test_failed_item_skips_to_always_stage():
+    ran = []
+
+    def first(item):
+        raise RuntimeError("boom")
+
+    pipeline = _three_stage(ran, first)
+    item = pipeline.submit(key=1)
+    assert item.wait(2.0)
+    assert item.status == STATUS_ERROR
+    assert "boom" in item.error
+    assert ran == [("finalize", 1)]
+    assert pipeline.stats()["stages"]["first"]["errors"] == 1
+    pipeline.close()
+
+
+def test_close_cancels_held_items_and_finalizes_them():
+    ran = []
+    pipeline = _three_stage(ran, lambda item: HOLD)
+    items = [pipeline.submit(key=k) for k in (1, 2)]
+    _wait_until(lambda: all(item.status == STATUS_HELD for item in items))
+
+    pipeline.close(wait=True, timeout=2.0)
+    for item in items:
+        assert item.wait(0)
+        assert item.status == STATUS_CANCELLED
+    assert sorted(ran) == [("finalize", 1), ("finalize", 2)]
+
+
+def test_resume_does_not_block_when_next_stage_is_full():
+    release = threading.Event()
+    ran = []
+
+    def second(item):
+        release.wait(5.0)
+        ran.append(item.key)
+
+    pipeline = Pipeline("test", [
+        Stage("gate", lambda item: HOLD if item.key == "held" else None),
+        Stage("second", second, queue_size=1),
+    ])
+    held = pipeline.submit(key="held")
+    _wait_until(lambda: held.status == STATUS_HELD)
+    # One item busy in "second", one filling its queue.
+    busy = pipeline.submit(key="busy")
+    _wait_until(lambda: busy.stage == "second")
+    queued = pipeline.submit(key="queued")
+    _wait_until(lambda: pipeline.stats()["stages"]["second"]["queue_depth"] == 1)
+
+    t0 = time.monotonic()
+    assert pipeline.resume("held")
+    assert time.monotonic() - t0 < 0.5
+
+    release.set()
+    for item in (busy, queued, held):
+        assert item.wait(2.0)
+        assert item.status == STATUS_DONE
+    assert sorted(ran) == ["busy", "held", "queued"]
+    pipeline.close()
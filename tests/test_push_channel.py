@@ -0,0 +1,59 @@
+import threading
+
+from src.push_channel import PushChannel
+
+
+def _publish(channel, n):
+    return [channel.publish("input_job", {"turn_id": i}) for i in range(1, n + 1)]
+
+
+def test_reconnect_after_ack_replays_only_unacked_events_in_order():
+    channel = PushChannel(replay=16)
+    _publish(channel, 10)
+
+    acked = channel.ack(4)
+    assert [ev.seq for ev in acked] == [1, 2, 3, 4]
+
+    # A reconnect without Last-Event-ID resumes from the acked sequence.
+    events, missed = channel.events_after(channel.acked_seq, timeout=0)
+    assert missed is None
+    assert [ev.seq for ev in events] == [5, 6, 7, 8, 9, 10]
+    assert [ev.data["turn_id"] for ev in events] == [5, 6, 7, 8, 9, 10]
+
+    # With Last-Event-ID the robot skips what it already received.
+    events, missed = channel.events_after(7, timeout=0)
+    assert missed is None
+    assert [ev.seq for ev in events] == [8, 9, 10]
+
+
+def test_acks_are_cumulative_and_clamped():
+    channel = PushChannel()
+    _publish(channel, 3)
+    assert [ev.seq for ev in channel.ack(2)] == [1, 2]
+    assert channel.ack(1) == []
+    assert [ev.seq for ev in channel.ack(99)] == [3]
+    assert channel.acked_seq == 3
+    assert channel.events_after(channel.acked_seq, timeout=0) == ([], None)
+
+
+def test_events_past_the_replay_bound_are_reported_as_a_gap():
+    channel = PushChannel(replay=5)
+    _publish(channel, 12)
+    channel.ack(3)
+
+    events, missed = channel.events_after(channel.acked_seq, timeout=0)
+    assert missed == (4, 7)
+    assert [ev.seq for ev in events] == [8, 9, 10, 11, 12]
+    # Every un-acked event is either replayed or inside the reported gap.
+    covered = list(range(missed[0], missed[1] + 1)) + [ev.seq for ev in events]
+    assert covered == list(range(4, 13))
+    assert channel.stats()["oldest_replayable_seq"] == 8
+
+
+def test_waiting_subscriber_wakes_on_publish():
+    channel = PushChannel()
+    _publish(channel, 2)
+    threading.Timer(0.05, channel.publish, args=("input_job", {"turn_id": 3})).start()
+    events, missed = channel.events_after(2, timeout=2.0)
+    assert missed is None
+    assert [ev.seq for ev in events] == [3]
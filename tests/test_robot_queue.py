@@ -0,0 +1,44 @@
+import threading
+import time
+
+import pytest
+
+from src import robot_queue
+from src.robot_queue import SqliteJobQueue
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    inbox, outbox = tmp_path / "inbox", tmp_path / "outbox"
+    inbox.mkdir()
+    outbox.mkdir()
+    q = SqliteJobQueue(str(tmp_path / "queue.sqlite3"), inbox_dir=str(inbox), outbox_dir=str(outbox))
+    q.enqueue({"turn_id": 1, "robot": "r"})
+    return q
+
+
+def test_wait_result_sees_a_result_whose_export_failed(job_queue, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(robot_queue, "write_job_result", fail)
+    claimed = job_queue.claim()
+    threading.Timer(0.05, job_queue.complete, args=(claimed["job_id"], {"ok": True}, claimed["claim_token"])).start()
+
+    t0 = time.monotonic()
+    assert job_queue.wait_result(1, timeout_sec=5.0) == {"ok": True}
+    assert time.monotonic() - t0 < 1.0
+
+
+def test_complete_requires_the_current_claim(job_queue):
+    job_id = job_queue.pending()[0]["job_id"]
+    assert not job_queue.complete(job_id, {"ok": True}, None)
+    assert not job_queue.complete(job_id, {"ok": True}, "not-a-claim")
+
+    first = job_queue.claim(visibility_sec=0.0)
+    # The claim expired and the job went to another consumer.
+    second = job_queue.claim()
+    assert second["job_id"] == job_id
+    assert not job_queue.complete(job_id, {"ok": True}, first["claim_token"])
+    assert job_queue.complete(job_id, {"ok": True}, second["claim_token"])
+    assert job_queue.result(1) == {"ok": True}
@@ -0,0 +1,73 @@
+import wave
+
+import numpy as np
+import pytest
+
+from src.session_archive import SessionArchive, _read_aiff_pcm, _decode_pcm, _write_aiff, pack_session
+
+
+def _write_wav(path, frames, width, rate=16000):
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(width)
+        wf.setframerate(rate)
+        wf.writeframes(frames)
+
+
+@pytest.fixture
+def session(tmp_path):
+    session_dir = tmp_path / "session_x"
+    session_dir.mkdir()
+    (session_dir / "conversation_log.jsonl").write_text("{}\n")
+    return session_dir
+
+
+def _pack(session_dir, tmp_path):
+    return pack_session(str(session_dir), out_path=str(tmp_path / "x.vlcarc"))
+
+
+def test_8bit_wav_is_unsigned(session, tmp_path):
+    pcm = bytes([0, 128, 255, 129])
+    _write_wav(session / "input_turn_0001.wav", pcm, 1)
+    with SessionArchive(_pack(session, tmp_path)) as archive:
+        samples, rate = archive.turn_audio(1)
+        assert rate == 16000
+        assert samples.dtype == np.uint8
+        assert samples.tolist() == [0, 128, 255, 129]
+
+        # AIFF stores 8-bit signed, centred on 0.
+        aiff = tmp_path / "out.aiff"
+        _write_aiff(str(aiff), samples, rate, archive.entry("input_turn_0001.wav")["audio"])
+    fmt, raw = _read_aiff_pcm(str(aiff))
+    assert _decode_pcm(raw, fmt).tolist() == [-128, 0, 127, 1]
+
+
+def test_24bit_wav_round_trips(session, tmp_path):
+    values = [0, 1, -1, 8388607, -8388608, 123456, -654321]
+    pcm = b"".join(v.to_bytes(3, "little", signed=True) for v in values)
+    _write_wav(session / "output_turn_0002.wav", pcm, 3)
+    out = _pack(session, tmp_path)
+    with SessionArchive(out) as archive:
+        samples, _rate = archive.turn_audio(2, role="output")
+        assert samples.tolist() == values
+
+        fmt = archive.entry("output_turn_0002.wav")["audio"]
+        aiff = tmp_path / "out.aiff"
+        _write_aiff(str(aiff), samples, 16000, fmt)
+        archive.extract(str(tmp_path / "restored"))
+
+    fmt, raw = _read_aiff_pcm(str(aiff))
+    assert fmt["byte_order"] == ">" and fmt["sample_width"] == 3
+    assert _decode_pcm(raw, fmt).tolist() == values
+    with wave.open(str(tmp_path / "restored" / "output_turn_0002.wav"), "rb") as wf:
+        assert wf.getsampwidth() == 3
+        assert wf.readframes(wf.getnframes()) == pcm
+
+
+def test_16bit_audio_is_a_view(session, tmp_path):
+    values = np.array([0, 1000, -1000, 32767], dtype="<i2")
+    _write_wav(session / "input_turn_0003.wav", values.tobytes(), 2)
+    with SessionArchive(_pack(session, tmp_path)) as archive:
+        samples, _rate = archive.turn_audio(3)
+        assert samples.tolist() == values.tolist()
+        assert not samples.flags.owndata
@@ -0,0 +1,73 @@
+import json
+import os
+
+import pytest
+
+from src import session_index
+
+
+@pytest.fixture
+def session(tmp_path):
+    sessions_dir = tmp_path / "sessions"
+    session_dir = sessions_dir / "session_0001"
+    session_dir.mkdir(parents=True)
+    return sessions_dir, session_dir / "bridge_events.jsonl", str(tmp_path / "index.sqlite3")
+
+
+def _line(n):
+    return (json.dumps({"event": "e{}".format(n), "turn_id": n}) + "\n").encode("utf-8")
+
+
+def _events(db_path):
+    conn = session_index.connect(db_path)
+    try:
+        return [row[0] for row in conn.execute("SELECT event FROM bridge_events ORDER BY byte_offset")]
+    finally:
+        conn.close()
+
+
+def test_only_complete_new_lines_are_indexed(session):
+    sessions_dir, log, db = session
+    torn = _line(3)
+    log.write_bytes(_line(1) + _line(2) + torn[:7])
+
+    stats = session_index.update_index(str(sessions_dir), db)
+    assert stats["records"] == 2
+    assert _events(db) == ["e1", "e2"]
+
+    with open(str(log), "ab") as f:
+        f.write(torn[7:] + _line(4))
+    stats = session_index.update_index(str(sessions_dir), db)
+    assert stats["records"] == 2
+    assert stats["bytes_read"] == len(torn) + len(_line(4))
+    assert _events(db) == ["e1", "e2", "e3", "e4"]
+
+    # Nothing appended: the file is skipped.
+    assert session_index.update_index(str(sessions_dir), db)["files_read"] == 0
+
+
+def test_truncated_file_is_reread_from_the_start(session):
+    sessions_dir, log, db = session
+    log.write_bytes(_line(1) + _line(2) + _line(3))
+    session_index.update_index(str(sessions_dir), db)
+
+    log.write_bytes(_line(9))
+    stats = session_index.update_index(str(sessions_dir), db)
+    assert stats["records"] == 1
+    assert _events(db) == ["e9"]
+
+
+def test_rotated_file_is_reread_from_the_start(session):
+    sessions_dir, log, db = session
+    log.write_bytes(_line(1) + _line(2))
+    session_index.update_index(str(sessions_dir), db)
+
+    # A new file at least as large as the old offset: only the inode shows it was replaced.
+    fresh = log.with_name("bridge_events.jsonl.new")
+    fresh.write_bytes(_line(5) + _line(6) + _line(7))
+    os.replace(str(log), str(log) + ".1")
+    os.replace(str(fresh), str(log))
+
+    stats = session_index.update_index(str(sessions_dir), db)
+    assert stats["records"] == 3
+    assert _events(db) == ["e5", "e6", "e7"]
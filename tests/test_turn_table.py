@@ -0,0 +1,52 @@
+from src.turn_table import TurnRecord, TurnTable
+
+
+def _open(table, *turn_ids):
+    released = []
+    for turn_id in turn_ids:
+        released.extend(table.open(TurnRecord(turn_id)))
+    return released
+
+
+def _turns(records):
+    return [r.turn for r in records]
+
+
+def test_out_of_order_finish_is_held_until_earlier_turn_finishes():
+    table = TurnTable()
+    _open(table, 1, 2, 3)
+    assert table.finish(2) == []
+    assert table.finish(3) == []
+    assert _turns(table.finish(1)) == [1, 2, 3]
+    assert len(table) == 0
+
+
+def test_finish_unknown_turn_returns_none():
+    assert TurnTable().finish(7) is None
+
+
+def test_discard_releases_turns_it_was_holding_back():
+    table = TurnTable()
+    _open(table, 1, 2, 3)
+    table.finish(2)
+    assert _turns(table.discard(1)) == [2]
+    assert _turns(table.finish(3)) == [3]
+
+
+def test_eviction_releases_finished_turns_behind_the_dropped_one():
+    table = TurnTable(max_open=3)
+    assert _open(table, 1, 2, 3) == []
+    table.finish(2)
+    table.finish(3)
+    # Turn 1 never finishes; opening a fourth evicts it and frees 2 and 3.
+    assert _turns(_open(table, 4)) == [2, 3]
+    assert table.get(1) is None
+    assert _turns(table.finish(4)) == [4]
+
+
+def test_eviction_drops_oldest_unfinished_turn():
+    table = TurnTable(max_open=2)
+    _open(table, 1, 2)
+    assert _open(table, 3) == []
+    assert table.get(1) is None
+    assert table.get(2) is not None